@@ -0,0 +1,785 @@
+"""End-to-end benchmarks of the tagging and search backends.
+
+Measures
+- analyze_file: throughput in segments/s across model precisions, TFLite threads and batch sizes,
+- run_model_on_audio_bytes: end-to-end latency of the audio tagging Lambda, cold and warm,
+- run_detection: YOLO throughput per image and per video frame,
+- embeddings: ingestion rate into a fresh embeddings database,
+- search: latency of a search query against databases of growing size.
+
+Fixtures are synthetic and seeded, so runs are reproducible. Recorded fixtures can be passed with
+--audio, --images and --videos. Results are written as JSON, together with the environment they were
+measured in. With --baseline, the results are compared with an earlier JSON file and the script exits
+with status 1 if a benchmark got slower than --max_regression allows.
+
+Every parameter combination runs in a fresh process, so the reported peak memory (max_rss_mb)
+is that of the combination alone and model loads are cold for each of them.
+
+Usage:
+    python benchmark.py --output results.json
+    python benchmark.py --suites analyze search --baseline results.json --output new.json
+"""
+
+import argparse
+import copy
+import datetime
+import json
+import math
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.abspath(os.path.dirname(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARK_DIR)
+
+# birdnet_analyzer and run_birdnet of the audio tagging Lambda, yolo_detector of the search Lambda
+sys.path.insert(0, os.path.join(BACKEND_DIR, "project_4.2", "lambda_tag_audio"))
+sys.path.append(os.path.join(BACKEND_DIR, "lambda", "search-by-file"))
+
+SUITES = ("analyze", "audio_bytes", "yolo", "embeddings", "search")
+
+# Format version of the JSON output
+RESULTS_VERSION = 1
+
+# Main metric of every suite and whether higher values are better
+PRIMARY_METRICS = {
+    "analyze": ("segments_per_s", True),
+    "audio_bytes": ("warm_median_s", False),
+    "yolo": ("items_per_s", True),
+    "embeddings": ("embeddings_per_s", True),
+    "search": ("warm_median_s", False),
+}
+
+# Embedding dimension of the BirdNET model
+EMBEDDING_DIM = 1024
+
+
+class Timer:
+    """Context manager measuring the wall time of a block in seconds."""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.seconds = time.perf_counter() - self.start
+
+
+def get_max_rss_mb():
+    """Returns the peak resident memory of this process in MB.
+
+    Only meaningful in the fresh process of a single benchmark, see run_in_subprocess.
+    """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Bytes on macOS, kilobytes everywhere else
+    return max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def summarize(times: list[float]):
+    """Returns min, median and mean of repeated measurements."""
+    return {
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "mean_s": statistics.mean(times),
+        "repeats": len(times),
+    }
+
+
+def get_environment():
+    """Returns the machine, interpreter, package versions and commit the benchmarks run on."""
+    from importlib import metadata
+
+    packages = {}
+
+    for name in ("numpy", "librosa", "soundfile", "tflite-runtime", "tensorflow", "ultralytics", "perch-hoplite"):
+        try:
+            packages[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            pass
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "packages": packages,
+        "commit": commit,
+    }
+
+
+#################
+# Fixtures      #
+#################
+
+
+def make_audio_fixture(path: str, duration: float, seed: int, sample_rate: int = 48000):
+    """Writes a mono wav file with bird-like chirps over noise.
+
+    Args:
+        path: Path of the wav file.
+        duration: Duration in seconds.
+        seed: Random seed.
+        sample_rate: Sample rate in Hz.
+
+    Returns:
+        The path.
+    """
+    import numpy as np
+    import soundfile as sf
+
+    rng = np.random.default_rng(seed)
+    sig = rng.normal(0, 0.02, int(duration * sample_rate)).astype(np.float32)
+
+    # Short frequency sweeps between 2 and 8 kHz, about one per second
+    for _ in range(int(duration)):
+        length = rng.uniform(0.1, 0.6)
+        t = np.arange(int(length * sample_rate)) / sample_rate
+        f0, f1 = rng.uniform(2000, 8000, 2)
+        chirp = np.sin(2 * np.pi * (f0 * t + (f1 - f0) * t**2 / (2 * length))) * np.hanning(len(t))
+        start = rng.integers(0, len(sig) - len(t))
+        sig[start : start + len(t)] += rng.uniform(0.1, 0.5) * chirp.astype(np.float32)
+
+    sf.write(path, np.clip(sig, -1, 1), sample_rate, subtype="PCM_16")
+
+    return path
+
+
+def make_image_fixture(path: str, seed: int, size=(640, 480)):
+    """Writes a jpg image with random shapes over noise."""
+    import cv2 as cv
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+
+    for _ in range(5):
+        center = (int(rng.integers(0, size[0])), int(rng.integers(0, size[1])))
+        axes = (int(rng.integers(10, 80)), int(rng.integers(10, 80)))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv.ellipse(image, center, axes, float(rng.uniform(0, 180)), 0, 360, color, -1)
+
+    cv.imwrite(path, image)
+
+    return path
+
+
+def make_video_fixture(path: str, seed: int, frames: int = 30, size=(640, 480), fps: int = 30):
+    """Writes an mp4 video of moving random shapes over noise."""
+    import cv2 as cv
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    writer = cv.VideoWriter(path, cv.VideoWriter_fourcc(*"mp4v"), fps, size)
+    background = rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+
+    for i in range(frames):
+        frame = background.copy()
+        cv.circle(frame, ((i * 10) % size[0], size[1] // 2), 40, (40, 80, 160), -1)
+        writer.write(frame)
+
+    writer.release()
+
+    return path
+
+
+#################
+# Suites        #
+#################
+
+
+def setup_birdnet():
+    """Loads the labels and the default settings of the BirdNET analyzer."""
+    import birdnet_analyzer.config as cfg
+    from birdnet_analyzer.analyze.utils import load_codes
+    from birdnet_analyzer.utils import ensure_model_exists, read_lines
+
+    ensure_model_exists()
+
+    cfg.CODES = load_codes()
+    cfg.LABELS = read_lines(cfg.LABELS_FILE)
+    cfg.TRANSLATED_LABELS = cfg.LABELS
+    cfg.SPECIES_LIST = []
+    cfg.CUSTOM_CLASSIFIER = None
+    cfg.SKIP_EXISTING_RESULTS = False
+
+
+def reset_model():
+    """Forces the next prediction to load the model again, e.g. with other settings."""
+    import birdnet_analyzer.model as model
+
+    model.INTERPRETER = None
+    model.PBMODEL = None
+
+
+def get_precision(model_path: str):
+    """Returns the precision of a model from its file name, e.g. 'FP32'."""
+    return os.path.basename(model_path).rsplit("_", 1)[-1].split(".")[0]
+
+
+def bench_analyze(args, fixtures, workdir):
+    """Measures analyze_file throughput across model precisions, TFLite threads and batch sizes."""
+    from birdnet_analyzer.analyze.utils import analyze_file
+    import birdnet_analyzer.audio as audio
+    import birdnet_analyzer.config as cfg
+
+    setup_birdnet()
+    results = []
+    default_model_path = cfg.MODEL_PATH
+
+    cfg.MIN_CONFIDENCE = 0.1
+    cfg.RESULT_TYPES = ["csv"]
+    cfg.OUTPUT_PATH = os.path.join(workdir, "analyze")
+
+    for model_path in args.model_paths or [default_model_path]:
+        for threads in args.threads:
+            cfg.MODEL_PATH = model_path
+            cfg.TFLITE_THREADS = threads
+            reset_model()
+
+            for batch_size in args.batch_sizes:
+                cfg.BATCH_SIZE = batch_size
+
+                for fixture in fixtures:
+                    cfg.INPUT_PATH = os.path.dirname(fixture)
+
+                    with audio.AudioSource(fixture) as source:
+                        duration = source.duration
+
+                    segments = math.ceil(duration / (cfg.SIG_LENGTH - cfg.SIG_OVERLAP))
+
+                    # Warm up, the first call also loads the model
+                    analyze_file((fixture, None))
+                    times = []
+
+                    for _ in range(args.repeats):
+                        with Timer() as t:
+                            analyze_file((fixture, None))
+
+                        times.append(t.seconds)
+
+                    summary = summarize(times)
+                    results.append(
+                        {
+                            "suite": "analyze",
+                            "name": "analyze_file",
+                            "params": {
+                                "precision": get_precision(model_path),
+                                "threads": threads,
+                                "batch_size": batch_size,
+                            },
+                            "fixture": os.path.basename(fixture),
+                            "metrics": {
+                                **summary,
+                                "segments": segments,
+                                "segments_per_s": segments / summary["median_s"],
+                                "realtime_factor": duration / summary["median_s"],
+                                "max_rss_mb": get_max_rss_mb(),
+                            },
+                        }
+                    )
+
+    cfg.MODEL_PATH = default_model_path
+    reset_model()
+
+    return results
+
+
+def bench_audio_bytes(args, fixtures, workdir):
+    """Measures the end-to-end latency of run_model_on_audio_bytes, the first call loads the model."""
+    from run_birdnet import run_model_on_audio_bytes
+
+    reset_model()
+    results = []
+
+    for fixture in fixtures:
+        with open(fixture, "rb") as f:
+            audio_bytes = f.read()
+
+        file_format = fixture.rsplit(".", 1)[-1].lower()
+
+        with Timer() as cold:
+            run_model_on_audio_bytes(audio_bytes, file_format)
+
+        times = []
+
+        for _ in range(args.repeats):
+            with Timer() as t:
+                run_model_on_audio_bytes(audio_bytes, file_format)
+
+            times.append(t.seconds)
+
+        summary = summarize(times)
+        results.append(
+            {
+                "suite": "audio_bytes",
+                "name": "run_model_on_audio_bytes",
+                "params": {"format": file_format},
+                "fixture": os.path.basename(fixture),
+                "metrics": {
+                    "cold_s": cold.seconds,
+                    **{f"warm_{k}" if k.endswith("_s") else k: v for k, v in summary.items()},
+                    "bytes": len(audio_bytes),
+                    "max_rss_mb": get_max_rss_mb(),
+                },
+            }
+        )
+
+    reset_model()
+
+    return results
+
+
+def bench_yolo(args, workdir):
+    """Measures run_detection throughput per image and per video frame."""
+    import yolo_detector
+
+    if args.yolo_model:
+        yolo_detector.model_path = args.yolo_model
+
+    images = args.images or [
+        make_image_fixture(os.path.join(workdir, f"image_{i}.jpg"), args.seed + i) for i in range(args.num_images)
+    ]
+    videos = args.videos or [make_video_fixture(os.path.join(workdir, "video.mp4"), args.seed)]
+
+    with Timer() as load:
+        yolo_detector.load_model()
+
+    # Warm up
+    yolo_detector.run_detection(images[0], "image")
+
+    results = []
+    times = []
+
+    for _ in range(args.repeats):
+        with Timer() as t:
+            for image in images:
+                yolo_detector.run_detection(image, "image")
+
+        times.append(t.seconds / len(images))
+
+    summary = summarize(times)
+    results.append(
+        {
+            "suite": "yolo",
+            "name": "run_detection",
+            "params": {"file_type": "image"},
+            "fixture": f"{len(images)} images",
+            "metrics": {
+                **summary,
+                "model_load_s": load.seconds,
+                "items_per_s": 1 / summary["median_s"],
+                "max_rss_mb": get_max_rss_mb(),
+            },
+        }
+    )
+
+    for video in videos:
+        times = []
+
+        for _ in range(args.repeats):
+            with Timer() as t:
+                frames = yolo_detector.run_detection(video, "video")["processedFrames"]
+
+            times.append(t.seconds / max(1, frames))
+
+        summary = summarize(times)
+        results.append(
+            {
+                "suite": "yolo",
+                "name": "run_detection",
+                "params": {"file_type": "video"},
+                "fixture": os.path.basename(video),
+                "metrics": {
+                    **summary,
+                    "frames": frames,
+                    "items_per_s": 1 / summary["median_s"],
+                    "max_rss_mb": get_max_rss_mb(),
+                },
+            }
+        )
+
+    return results
+
+
+def bench_embeddings(args, fixtures, workdir):
+    """Measures the ingestion rate of embeddings into a fresh database."""
+    import birdnet_analyzer.config as cfg
+    from birdnet_analyzer.embeddings.core import get_database
+    from birdnet_analyzer.embeddings.utils import run
+
+    setup_birdnet()
+    results = []
+
+    input_dir = os.path.join(workdir, "embeddings_input")
+    os.makedirs(input_dir, exist_ok=True)
+
+    for fixture in fixtures:
+        shutil.copy(fixture, input_dir)
+
+    for threads in args.threads:
+        times, count = [], 0
+
+        for i in range(args.repeats):
+            database = os.path.join(workdir, f"embeddings_{threads}_{i}")
+            reset_model()
+
+            with Timer() as t:
+                run(input_dir, database, 0.0, 1.0, cfg.SIG_FMIN, cfg.SIG_FMAX, threads, args.batch_sizes[-1])
+
+            times.append(t.seconds)
+            db = get_database(database)
+            count = db.count_embeddings()
+            db.db.close()
+            shutil.rmtree(database, ignore_errors=True)
+
+        summary = summarize(times)
+        results.append(
+            {
+                "suite": "embeddings",
+                "name": "ingestion",
+                "params": {"threads": threads, "batch_size": args.batch_sizes[-1]},
+                "fixture": f"{len(fixtures)} files",
+                "metrics": {
+                    **summary,
+                    "embeddings": count,
+                    "embeddings_per_s": count / summary["median_s"],
+                    "max_rss_mb": get_max_rss_mb(),
+                },
+            }
+        )
+
+    reset_model()
+
+    return results
+
+
+def bench_search(args, fixtures, workdir):
+    """Measures search latency against databases of growing size filled with random embeddings."""
+    import numpy as np
+
+    from birdnet_analyzer.embeddings.core import get_database
+    from birdnet_analyzer.embeddings.utils import insert_embeddings
+    from birdnet_analyzer.search.utils import get_search_results
+
+    setup_birdnet()
+    reset_model()
+
+    rng = np.random.default_rng(args.seed)
+    db = get_database(os.path.join(workdir, "search_db"))
+    results = []
+    size = 0
+
+    for target in sorted(args.db_sizes):
+        # Grow the database in files of 1000 embeddings
+        while size < target:
+            n = min(1000, target - size)
+            offsets = np.stack([np.arange(n) * 3.0, np.arange(n) * 3.0 + 3.0], axis=1).astype(np.float32)
+            embeddings = rng.normal(size=(n, EMBEDDING_DIM)).astype(np.float32)
+            insert_embeddings(db, f"source_{size}.wav", offsets, embeddings)
+            size += n
+
+        db.commit()
+
+        def search():
+            return get_search_results(fixtures[0], db, args.n_results, 1.0, 0, 15000, "cosine", "center", 0.0)
+
+        # The first search also writes the embedding snapshot
+        with Timer() as cold:
+            search()
+
+        times = []
+
+        for _ in range(args.repeats):
+            with Timer() as t:
+                search()
+
+            times.append(t.seconds)
+
+        summary = summarize(times)
+        results.append(
+            {
+                "suite": "search",
+                "name": "get_search_results",
+                "params": {"db_size": size, "n_results": args.n_results},
+                "fixture": os.path.basename(fixtures[0]),
+                "metrics": {
+                    "cold_s": cold.seconds,
+                    **{f"warm_{k}" if k.endswith("_s") else k: v for k, v in summary.items()},
+                    "max_rss_mb": get_max_rss_mb(),
+                },
+            }
+        )
+
+    db.db.close()
+    reset_model()
+
+    return results
+
+
+def run_suite(suite: str, args, fixtures, workdir):
+    """Runs the benchmarks of a suite and returns their results."""
+    if suite == "analyze":
+        return bench_analyze(args, fixtures, workdir)
+    if suite == "audio_bytes":
+        return bench_audio_bytes(args, fixtures, workdir)
+    if suite == "yolo":
+        return bench_yolo(args, workdir)
+    if suite == "embeddings":
+        return bench_embeddings(args, fixtures, workdir)
+    if suite == "search":
+        return bench_search(args, fixtures, workdir)
+
+    raise ValueError(f"Unknown suite: {suite}")
+
+
+def get_suite_jobs(suite: str, args, fixtures):
+    """Splits a suite into its parameter combinations.
+
+    Args:
+        suite: Name of the suite.
+        args: Parsed command line arguments.
+        fixtures: Audio fixtures.
+
+    Returns:
+        A list of (args, fixtures), each narrowed down to a single combination. Search keeps all
+        database sizes in one job, since the database grows from one size to the next.
+    """
+    jobs = []
+
+    def narrow(**overrides):
+        job_args = copy.copy(args)
+        vars(job_args).update(overrides)
+
+        return job_args
+
+    if suite == "analyze":
+        for model_path in args.model_paths or [None]:
+            for threads in args.threads:
+                for batch_size in args.batch_sizes:
+                    job_args = narrow(
+                        model_paths=[model_path] if model_path else None, threads=[threads], batch_sizes=[batch_size]
+                    )
+                    jobs.extend((job_args, [fixture]) for fixture in fixtures)
+    elif suite == "audio_bytes":
+        jobs.extend((args, [fixture]) for fixture in fixtures)
+    elif suite == "embeddings":
+        jobs.extend((narrow(threads=[threads]), fixtures) for threads in args.threads)
+    else:
+        jobs.append((args, fixtures))
+
+    return jobs
+
+
+def _run_suite_in_child(suite: str, args, fixtures, workdir, messages):
+    """Runs a suite in a child process and sends ("results", results) or ("skipped", reason) back."""
+    try:
+        messages.put(("results", run_suite(suite, args, fixtures, workdir)))
+    except ImportError as ex:
+        messages.put(("skipped", str(ex)))
+    except BaseException as ex:
+        messages.put(("error", f"{type(ex).__name__}: {ex}"))
+        raise
+
+
+def run_in_subprocess(suite: str, args, fixtures, workdir):
+    """Runs a suite in a fresh process, so its peak memory and cold starts are not affected by earlier runs.
+
+    Args:
+        suite: Name of the suite.
+        args: Parsed command line arguments.
+        fixtures: Audio fixtures.
+        workdir: Directory for temporary files.
+
+    Returns:
+        The results of the suite.
+
+    Raises:
+        ImportError: If the dependencies of the suite are not installed.
+        RuntimeError: If the suite failed.
+    """
+    # Spawn instead of fork, a forked child would start with the memory of this process
+    ctx = multiprocessing.get_context("spawn")
+    messages = ctx.Queue()
+    process = ctx.Process(target=_run_suite_in_child, args=(suite, args, fixtures, workdir, messages))
+    process.start()
+
+    # Read before joining, a child with a full queue cannot exit
+    while True:
+        try:
+            status, value = messages.get(timeout=1)
+            break
+        except queue.Empty:
+            # The child died without a message, e.g. in a native crash
+            if not process.is_alive():
+                status, value = "error", None
+                break
+
+    process.join()
+
+    if status == "results":
+        return value
+    if status == "skipped":
+        raise ImportError(value)
+
+    raise RuntimeError(f"The {suite} benchmarks failed: {value or f'exit code {process.exitcode}'}")
+
+
+#################
+# Regressions   #
+#################
+
+
+def get_result_key(result: dict):
+    """Returns the key that identifies a result across runs."""
+    return result["suite"], result["name"], json.dumps(result["params"], sort_keys=True), result["fixture"]
+
+
+def compare_results(results: list[dict], baseline: list[dict], max_regression: float):
+    """Compares results with a baseline by the primary metric of each suite.
+
+    Args:
+        results: The new results.
+        baseline: The results of an earlier run.
+        max_regression: Relative slowdown that is still accepted, e.g. 0.1 for 10%.
+
+    Returns:
+        A list of comparisons, one per result that is also in the baseline.
+    """
+    baseline = {get_result_key(r): r for r in baseline if "metrics" in r}
+    comparisons = []
+
+    for result in results:
+        key = get_result_key(result)
+
+        if "metrics" not in result or key not in baseline:
+            continue
+
+        metric, higher_is_better = PRIMARY_METRICS[result["suite"]]
+        new, old = result["metrics"][metric], baseline[key]["metrics"][metric]
+
+        if not old:
+            continue
+
+        # Positive change means slower
+        change = (old - new) / old if higher_is_better else (new - old) / old
+
+        comparisons.append(
+            {
+                "suite": result["suite"],
+                "name": result["name"],
+                "params": result["params"],
+                "fixture": result["fixture"],
+                "metric": metric,
+                "baseline": old,
+                "value": new,
+                "slowdown": change,
+                "regression": change > max_regression,
+            }
+        )
+
+    return comparisons
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="End-to-end benchmarks of the tagging and search backends.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="Path of the JSON results.")
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES), help="Suites to run.")
+    parser.add_argument("--audio", nargs="+", help="Recorded audio fixtures. Defaults to a synthetic recording.")
+    parser.add_argument("--images", nargs="+", help="Recorded image fixtures. Defaults to synthetic images.")
+    parser.add_argument("--videos", nargs="+", help="Recorded video fixtures. Defaults to a synthetic video.")
+    parser.add_argument("--duration", type=float, default=60.0, help="Duration of the synthetic recording in seconds.")
+    parser.add_argument("--num_images", type=int, default=10, help="Number of synthetic images.")
+    parser.add_argument(
+        "--model_paths", nargs="+", help="BirdNET TFLite models to compare, e.g. FP32, FP16 and INT8 versions."
+    )
+    parser.add_argument("--yolo_model", help="Path to the YOLO model. Defaults to the one of yolo_detector.")
+    parser.add_argument("--batch_sizes", nargs="+", type=int, default=[1, 4, 16], help="Batch sizes to compare.")
+    parser.add_argument("--threads", nargs="+", type=int, default=[1, 4], help="Thread counts to compare.")
+    parser.add_argument(
+        "--db_sizes", nargs="+", type=int, default=[1000, 10000, 100000], help="Database sizes for the search suite."
+    )
+    parser.add_argument("--n_results", type=int, default=10, help="Number of search results.")
+    parser.add_argument("--repeats", type=int, default=3, help="Measurements per benchmark after a warm-up.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the synthetic fixtures.")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with.")
+    parser.add_argument(
+        "--max_regression", type=float, default=0.1, help="Accepted relative slowdown compared to the baseline."
+    )
+
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="birdtag_benchmark_")
+    audio_fixtures = args.audio or [
+        make_audio_fixture(os.path.join(workdir, "synthetic.wav"), args.duration, args.seed)
+    ]
+
+    results = []
+
+    try:
+        for suite in args.suites:
+            print(f"Running {suite} benchmarks...", flush=True)
+
+            try:
+                for job_args, fixtures in get_suite_jobs(suite, args, audio_fixtures):
+                    results.extend(run_in_subprocess(suite, job_args, fixtures, workdir))
+            except ImportError as ex:
+                # Suites whose dependencies are not installed are recorded as skipped
+                print(f"Skipping {suite} benchmarks: {ex}", flush=True)
+                results.append({"suite": suite, "skipped": str(ex)})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = {
+        "version": RESULTS_VERSION,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "environment": get_environment(),
+        "args": vars(args),
+        "results": results,
+    }
+
+    regressions = []
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            comparisons = compare_results(results, json.load(f)["results"], args.max_regression)
+
+        output["comparisons"] = comparisons
+        regressions = [c for c in comparisons if c["regression"]]
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2)
+
+    print(f"Results written to {args.output}", flush=True)
+
+    for c in regressions:
+        print(
+            f"Regression in {c['suite']}/{c['name']} {c['params']} on {c['fixture']}: "
+            f"{c['metric']} {c['baseline']:.4g} -> {c['value']:.4g} ({c['slowdown']:+.1%})",
+            flush=True,
+        )
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -19,14 +19,16 @@ def analyze(
     audio_speed: float = 1.0,
     batch_size: int = 1,
     combine_results: bool = False,
-    rtype: Literal["table", "audacity", "kaleidoscope", "csv"]
-    | List[Literal["table", "audacity", "kaleidoscope", "csv"]] = "table",
+    rtype: Literal["table", "audacity", "kaleidoscope", "csv", "parquet"]
+    | List[Literal["table", "audacity", "kaleidoscope", "csv", "parquet"]] = "table",
     skip_existing_results: bool = False,
     sf_thresh: float = 0.03,
     top_n: int | None = None,
     merge_consecutive: int = 1,
     threads: int = 8,
     locale: str = "en",
+    directory_index: str | None = None,
+    manifest: bool = False,
 ):
     """
     Analyzes audio files for bird species detection using the BirdNET-Analyzer.
@@ -46,7 +48,7 @@ def analyze(
         audio_speed (float, optional): Speed factor for audio playback during analysis. Defaults to 1.0.
         batch_size (int, optional): Batch size for processing. Defaults to 1.
         combine_results (bool, optional): Whether to combine results into a single file. Defaults to False.
-        rtype (Literal["table", "audacity", "kaleidoscope", "csv"] | List[Literal["table", "audacity", "kaleidoscope", "csv"]], optional):
+        rtype (Literal["table", "audacity", "kaleidoscope", "csv", "parquet"] | List[Literal["table", "audacity", "kaleidoscope", "csv", "parquet"]], optional):
             Output format(s) for results. Defaults to "table".
         skip_existing_results (bool, optional): Whether to skip analysis for files with existing results. Defaults to False.
         sf_thresh (float, optional): Threshold for species filtering. Defaults to 0.03.
@@ -54,6 +56,10 @@ def analyze(
         merge_consecutive (int, optional): Merge consecutive detections within this time window in seconds. Defaults to 1.
         threads (int, optional): Number of CPU threads to use for analysis. Defaults to 8.
         locale (str, optional): Locale for species names and output. Defaults to "en".
+        directory_index (str | None, optional): Path to a directory index file, so folders that did not change
+            since the last run are not listed again. Defaults to None.
+        manifest (bool, optional): Whether to keep track of analyzed files in a manifest in the output directory,
+            so skip_existing_results only skips files that did not change. Defaults to False.
     Returns:
         None
     Raises:
@@ -63,10 +69,8 @@ def analyze(
         - Results can be combined into a single file if `combine_results` is True.
         - Analysis parameters are saved to a file in the output directory.
     """
-    from multiprocessing import Pool
-
     import birdnet_analyzer.config as cfg
-    from birdnet_analyzer.analyze.utils import analyze_file, save_analysis_params
+    from birdnet_analyzer.analyze.utils import analyze_file, analyze_files, save_analysis_params
     from birdnet_analyzer.analyze.utils import combine_results as combine
     from birdnet_analyzer.utils import ensure_model_exists
 
@@ -96,9 +100,15 @@ def analyze(
         skip_existing_results=skip_existing_results,
         threads=threads,
         labels_file=cfg.LABELS_FILE,
+        directory_index=directory_index,
+        manifest=manifest,
     )
 
-    print(f"Found {len(cfg.FILE_LIST)} files to analyze")
+    # Folders analyzed in parallel are scanned while the first files are analyzed already
+    stream_files = os.path.isdir(cfg.INPUT_PATH) and cfg.CPU_THREADS >= 2
+
+    if not stream_files:
+        print(f"Found {len(cfg.FILE_LIST)} files to analyze")
 
     if not cfg.SPECIES_LIST:
         print(f"Species list contains {len(cfg.LABELS)} species")
@@ -108,16 +118,24 @@ def analyze(
     result_files = []
 
     # Analyze files
-    if cfg.CPU_THREADS < 2 or len(flist) < 2:
+    if stream_files:
+        print(f"Analyzing files in {cfg.INPUT_PATH} as they are found", flush=True)
+        results = dict(analyze_files(_discover_files(), cfg.CPU_THREADS))
+        print(f"Found {len(cfg.FILE_LIST)} files to analyze", flush=True)
+
+        # Collect results in the order of the sorted file list
+        order = sorted(range(len(cfg.FILE_LIST)), key=cfg.FILE_LIST.__getitem__)
+        cfg.FILE_LIST = [cfg.FILE_LIST[i] for i in order]
+        result_files = [results[i] for i in order]
+    elif cfg.CPU_THREADS < 2 or len(flist) < 2:
         for entry in flist:
             result_files.append(analyze_file(entry))
     else:
-        with Pool(cfg.CPU_THREADS) as p:
-            # Map analyzeFile function to each entry in flist
-            results = p.map_async(analyze_file, flist)
-            # Wait for all tasks to complete
-            results.wait()
-            result_files = results.get()
+        result_files = [None] * len(flist)
+
+        # Collect results as files finish, in the order of the file list
+        for i, result in analyze_files([entry[0] for entry in flist], cfg.CPU_THREADS):
+            result_files[i] = result
 
     # Combine results?
     if cfg.COMBINE_RESULTS:
@@ -127,6 +145,22 @@ def analyze(
 
     save_analysis_params(os.path.join(cfg.OUTPUT_PATH, cfg.ANALYSIS_PARAMS_FILENAME))
 
+    if cfg.ANALYSIS_MANIFEST_FILENAME:
+        from birdnet_analyzer.analyze.manifest import close as close_manifest
+
+        close_manifest()
+
+
+def _discover_files():
+    """Yields the audio files of the input folder as they are found and adds them to cfg.FILE_LIST."""
+    import birdnet_analyzer.config as cfg
+    from birdnet_analyzer.discovery import iter_audio_files
+
+    for fpath in iter_audio_files(cfg.INPUT_PATH, index_path=cfg.DIRECTORY_INDEX_PATH):
+        cfg.FILE_LIST.append(fpath)
+
+        yield fpath
+
 
 def _set_params(
     input,
@@ -152,6 +186,8 @@ def _set_params(
     merge_consecutive,
     threads,
     labels_file=None,
+    directory_index=None,
+    manifest=False,
 ):
     import birdnet_analyzer.config as cfg
     from birdnet_analyzer.analyze.utils import load_codes  # noqa: E402
@@ -174,6 +210,8 @@ def _set_params(
     cfg.RESULT_TYPES = rtype
     cfg.COMBINE_RESULTS = combine_results
     cfg.BATCH_SIZE = bs
+    cfg.DIRECTORY_INDEX_PATH = directory_index
+    cfg.ANALYSIS_MANIFEST_FILENAME = cfg.DEFAULT_ANALYSIS_MANIFEST_FILENAME if manifest else None
 
     if not output:
         if os.path.isfile(cfg.INPUT_PATH):
@@ -183,11 +221,6 @@ def _set_params(
     else:
         cfg.OUTPUT_PATH = output
 
-    if os.path.isdir(cfg.INPUT_PATH):
-        cfg.FILE_LIST = collect_audio_files(cfg.INPUT_PATH)
-    else:
-        cfg.FILE_LIST = [cfg.INPUT_PATH]
-
     if os.path.isdir(cfg.INPUT_PATH):
         cfg.CPU_THREADS = threads
         cfg.TFLITE_THREADS = 1
@@ -195,6 +228,14 @@ def _set_params(
         cfg.CPU_THREADS = 1
         cfg.TFLITE_THREADS = threads
 
+    if not os.path.isdir(cfg.INPUT_PATH):
+        cfg.FILE_LIST = [cfg.INPUT_PATH]
+    elif cfg.CPU_THREADS < 2:
+        cfg.FILE_LIST = collect_audio_files(cfg.INPUT_PATH, index_path=cfg.DIRECTORY_INDEX_PATH)
+    else:
+        # Filled by analyze while the workers already analyze the first files
+        cfg.FILE_LIST = []
+
     if custom_classifier is not None:
         cfg.CUSTOM_CLASSIFIER = custom_classifier  # we treat this as absolute path, so no need to join with dirname
 
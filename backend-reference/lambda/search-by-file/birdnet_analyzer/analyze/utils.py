@@ -1,9 +1,12 @@
 """Module to analyze audio samples."""
 
 import datetime
+import heapq
 import json
-import operator
 import os
+import sqlite3
+from collections.abc import Iterable
+from multiprocessing import Pool
 
 import numpy as np
 
@@ -11,6 +14,7 @@ import birdnet_analyzer.audio as audio
 import birdnet_analyzer.config as cfg
 import birdnet_analyzer.model as model
 import birdnet_analyzer.utils as utils
+from birdnet_analyzer.analyze import manifest
 
 #                    0       1      2           3             4              5               6                7           8             9           10         11
 RAVEN_TABLE_HEADER = "Selection\tView\tChannel\tBegin Time (s)\tEnd Time (s)\tLow Freq (Hz)\tHigh Freq (Hz)\tCommon Name\tSpecies Code\tConfidence\tBegin Path\tFile Offset (s)\n"
@@ -19,6 +23,10 @@ KALEIDOSCOPE_HEADER = (
     "INDIR,FOLDER,IN FILE,OFFSET,DURATION,scientific_name,common_name,confidence,lat,lon,week,overlap,sensitivity\n"
 )
 CSV_HEADER = "Start (s),End (s),Scientific name,Common name,Confidence,File\n"
+# Buffer size of the result file handles
+WRITE_BUFFER_SIZE = 1024 * 1024
+# Number of rows per row group in Parquet result files
+PARQUET_ROW_GROUP_SIZE = 65536
 SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))
 
 
@@ -64,172 +72,436 @@ def load_codes():
     return codes
 
 
-def generate_raven_table(timestamps: list[str], result: dict[str, list], afile_path: str, result_path: str):
+class Detections:
+    """Columnar container for the detections of a single audio file.
+
+    Each detection is one row across four parallel arrays, so result writers can work
+    with numbers and label ids instead of parsing "start-end" strings.
+
+    Attributes:
+        start (np.ndarray): Start times in seconds (float64).
+        end (np.ndarray): End times in seconds (float64).
+        label_id (np.ndarray): Indices into cfg.LABELS (int32).
+        score (np.ndarray): Confidence scores (float32).
     """
-    Generates a Raven selection table from the given timestamps and prediction results.
+
+    __slots__ = ("start", "end", "label_id", "score")
+
+    def __init__(self, start=(), end=(), label_id=(), score=()):
+        self.start = np.asarray(start, dtype=np.float64)
+        self.end = np.asarray(end, dtype=np.float64)
+        self.label_id = np.asarray(label_id, dtype=np.int32)
+        self.score = np.asarray(score, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.label_id)
+
+    def take(self, indices):
+        """Returns a new container with the rows at the given indices."""
+        return Detections(self.start[indices], self.end[indices], self.label_id[indices], self.score[indices])
+
+    def rows(self, block_size: int = 4096):
+        """Iterates over (start, end, label_id, score) tuples of Python scalars.
+
+        Rows are converted in blocks, so memory use does not grow with the number of detections.
+        """
+        for i in range(0, len(self), block_size):
+            yield from zip(
+                self.start[i : i + block_size].tolist(),
+                self.end[i : i + block_size].tolist(),
+                self.label_id[i : i + block_size].tolist(),
+                self.score[i : i + block_size].tolist(),
+                strict=True,
+            )
+
+    @staticmethod
+    def concatenate(parts: list["Detections"]):
+        """Concatenates a list of containers into one."""
+        if not parts:
+            return Detections()
+
+        return Detections(
+            np.concatenate([d.start for d in parts]),
+            np.concatenate([d.end for d in parts]),
+            np.concatenate([d.label_id for d in parts]),
+            np.concatenate([d.score for d in parts]),
+        )
+
+
+class LabelTable:
+    """Lookup tables from label id to the names and codes used by the result writers.
+
+    Attributes:
+        scientific (list[str]): Translated scientific names.
+        common (list[str]): Translated common names.
+        codes (list[str]): eBird species codes, or the original label if no code is known.
+        audacity (list[str]): Labels formatted for Audacity ("Scientific, Common").
+    """
+
+    __slots__ = ("scientific", "common", "codes", "audacity")
+
+    def __init__(self, labels: list[str], translated_labels: list[str], codes: dict[str, str]):
+        split_labels = [label.split("_", 1) for label in translated_labels]
+
+        self.scientific = [parts[0] for parts in split_labels]
+        self.common = [parts[-1] for parts in split_labels]
+        self.codes = [codes.get(label, label) for label in labels]
+        self.audacity = [label.replace("_", ", ") for label in translated_labels]
+
+
+_LABEL_TABLE: LabelTable = None
+_LABEL_TABLE_SOURCES: tuple = None
+
+
+def get_label_table():
+    """Returns the label lookup table for the current configuration.
+
+    The table is rebuilt only if cfg.LABELS, cfg.TRANSLATED_LABELS or cfg.CODES were replaced.
+
+    Returns:
+        LabelTable: The lookup table.
+    """
+    global _LABEL_TABLE
+    global _LABEL_TABLE_SOURCES
+
+    sources = (cfg.LABELS, cfg.TRANSLATED_LABELS, cfg.CODES)
+
+    if _LABEL_TABLE is None or any(a is not b for a, b in zip(sources, _LABEL_TABLE_SOURCES)):
+        _LABEL_TABLE = LabelTable(*sources)
+        _LABEL_TABLE_SOURCES = sources
+
+    return _LABEL_TABLE
+
+
+class ResultWriter:
+    """Streams detections of one audio file into a result file of a single type.
+
+    Rows are written to a buffered file handle as they arrive instead of being collected in one string.
+    Writers can be used as context managers.
+
+    Args:
+        result_path (str): Path of the result file.
+        afile_path (str, optional): Path to the audio file being analyzed.
+    """
+
+    header = ""
+
+    def __init__(self, result_path: str, afile_path: str = ""):
+        self.afile_path = afile_path
+        self.labels = get_label_table()
+        self.rows = 0
+
+        # Make directory if it doesn't exist
+        os.makedirs(os.path.dirname(result_path), exist_ok=True)
+
+        self.file = self.open(result_path)
+
+    def open(self, result_path: str):
+        """Opens the result file and writes the header."""
+        rfile = open(result_path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE)
+        rfile.write(self.header)
+
+        return rfile
+
+    def write(self, start: float, end: float, label_id: int, score: float):
+        """Writes a single detection."""
+        self.rows += 1
+        self.file.write(self.format_row(start, end, label_id, score))
+
+    def format_row(self, start: float, end: float, label_id: int, score: float) -> str:
+        raise NotImplementedError
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RavenTableWriter(ResultWriter):
+    """Writes a Raven selection table.
 
     Args:
-        timestamps (list[str]): List of timestamp strings in the format "start-end".
-        result (dict[str, list]): Dictionary where keys are timestamp strings and values are lists of predictions.
+        result_path (str): Path of the result file.
         afile_path (str): Path to the audio file being analyzed.
-        result_path (str): Path where the resulting Raven selection table will be saved.
+        sample_rate (int, optional): Native sample rate of the audio file. Read from the file if not given.
+    """
+
+    header = RAVEN_TABLE_HEADER
+
+    def __init__(self, result_path: str, afile_path: str, sample_rate: int | None = None):
+        super().__init__(result_path, afile_path)
+
+        # Read native sample rate
+        high_freq = (sample_rate or audio.get_sample_rate(afile_path)) / 2
+
+        if high_freq > int(cfg.SIG_FMAX / cfg.AUDIO_SPEED):
+            high_freq = int(cfg.SIG_FMAX / cfg.AUDIO_SPEED)
+
+        self.high_freq = min(high_freq, int(cfg.BANDPASS_FMAX / cfg.AUDIO_SPEED))
+        self.low_freq = max(cfg.SIG_FMIN, int(cfg.BANDPASS_FMIN / cfg.AUDIO_SPEED))
+
+    def format_row(self, start, end, label_id, score):
+        return f"{self.rows}\tSpectrogram 1\t1\t{start}\t{end}\t{self.low_freq}\t{self.high_freq}\t{self.labels.common[label_id]}\t{self.labels.codes[label_id]}\t{score:.4f}\t{self.afile_path}\t{start}\n"
+
+    def close(self):
+        # If we don't have any valid predictions, we still need to add a line to the selection table in case we want to combine results
+        # TODO: That's a weird way to do it, but it works for now. It would be better to keep track of file durations during the analysis.
+        if self.rows == 0 and cfg.OUTPUT_PATH is not None:
+            self.file.write(
+                f"1\tSpectrogram 1\t1\t0\t3\t{self.low_freq}\t{self.high_freq}\tnocall\tnocall\t1.0\t{self.afile_path}\t0\n"
+            )
+
+        super().close()
+
+
+class AudacityWriter(ResultWriter):
+    """Writes an Audacity timeline label file."""
+
+    def format_row(self, start, end, label_id, score):
+        return f"{start}\t{end}\t{self.labels.audacity[label_id]}\t{score:.4f}\n"
+
+
+class KaleidoscopeWriter(ResultWriter):
+    """Writes a Kaleidoscope-compatible CSV file."""
+
+    header = KALEIDOSCOPE_HEADER
+
+    def __init__(self, result_path: str, afile_path: str):
+        super().__init__(result_path, afile_path)
+
+        folder_path, filename = os.path.split(afile_path)
+        parent_folder, folder_name = os.path.split(folder_path)
+
+        self.file_columns = f"{parent_folder.rstrip('/')},{folder_name},{filename}"
+        self.param_columns = "{:.4f},{:.4f},{},{},{}".format(
+            cfg.LATITUDE, cfg.LONGITUDE, cfg.WEEK, cfg.SIG_OVERLAP, cfg.SIGMOID_SENSITIVITY
+        )
+
+    def format_row(self, start, end, label_id, score):
+        return f"{self.file_columns},{start},{end - start},{self.labels.scientific[label_id]},{self.labels.common[label_id]},{score:.4f},{self.param_columns}\n"
+
+
+class CsvWriter(ResultWriter):
+    """Writes a generic CSV file."""
+
+    header = CSV_HEADER
+
+    def format_row(self, start, end, label_id, score):
+        return f"{start},{end},{self.labels.scientific[label_id]},{self.labels.common[label_id]},{score:.4f},{self.afile_path}\n"
+
+
+def get_parquet_schema():
+    """Returns the Arrow schema of Parquet result files.
 
     Returns:
-        None
+        pyarrow.Schema: The schema.
+    """
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("file", pa.string()),
+            ("start", pa.float64()),
+            ("end", pa.float64()),
+            ("label_id", pa.int32()),
+            ("scientific", pa.string()),
+            ("common", pa.string()),
+            ("confidence", pa.float32()),
+        ]
+    )
+
+
+class ParquetWriter(ResultWriter):
+    """Writes detections to a Parquet file with a typed schema.
+
+    Rows are buffered and written as row groups of PARQUET_ROW_GROUP_SIZE rows. Requires pyarrow.
     """
-    selection_id = 0
-    out_string = RAVEN_TABLE_HEADER
 
-    # Read native sample rate
-    high_freq = audio.get_sample_rate(afile_path) / 2
+    def __init__(self, result_path: str, afile_path: str):
+        self.starts, self.ends, self.label_ids, self.scores = [], [], [], []
 
-    if high_freq > int(cfg.SIG_FMAX / cfg.AUDIO_SPEED):
-        high_freq = int(cfg.SIG_FMAX / cfg.AUDIO_SPEED)
+        super().__init__(result_path, afile_path)
 
-    high_freq = min(high_freq, int(cfg.BANDPASS_FMAX / cfg.AUDIO_SPEED))
-    low_freq = max(cfg.SIG_FMIN, int(cfg.BANDPASS_FMIN / cfg.AUDIO_SPEED))
+    def open(self, result_path: str):
+        import pyarrow.parquet as pq
 
-    # Extract valid predictions for every timestamp
-    for timestamp in timestamps:
-        rstring = ""
-        start, end = timestamp.split("-", 1)
+        self.schema = get_parquet_schema()
 
-        for c in result[timestamp]:
-            selection_id += 1
-            label = cfg.TRANSLATED_LABELS[cfg.LABELS.index(c[0])]
-            code = cfg.CODES[c[0]] if c[0] in cfg.CODES else c[0]
-            rstring += f"{selection_id}\tSpectrogram 1\t1\t{start}\t{end}\t{low_freq}\t{high_freq}\t{label.split('_', 1)[-1]}\t{code}\t{c[1]:.4f}\t{afile_path}\t{start}\n"
+        return pq.ParquetWriter(result_path, self.schema)
 
-        # Write result string to file
-        out_string += rstring
+    def write(self, start, end, label_id, score):
+        self.rows += 1
+        self.starts.append(start)
+        self.ends.append(end)
+        self.label_ids.append(label_id)
+        self.scores.append(score)
 
-    # If we don't have any valid predictions, we still need to add a line to the selection table in case we want to combine results
-    # TODO: That's a weird way to do it, but it works for now. It would be better to keep track of file durations during the analysis.
-    if len(out_string) == len(RAVEN_TABLE_HEADER) and cfg.OUTPUT_PATH is not None:
-        selection_id += 1
-        out_string += (
-            f"{selection_id}\tSpectrogram 1\t1\t0\t3\t{low_freq}\t{high_freq}\tnocall\tnocall\t1.0\t{afile_path}\t0\n"
-        )
+        if len(self.label_ids) >= PARQUET_ROW_GROUP_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered rows as one row group."""
+        import pyarrow as pa
 
-    utils.save_result_file(result_path, out_string)
+        if not self.label_ids:
+            return
 
+        columns = [
+            [self.afile_path] * len(self.label_ids),
+            self.starts,
+            self.ends,
+            self.label_ids,
+            [self.labels.scientific[i] for i in self.label_ids],
+            [self.labels.common[i] for i in self.label_ids],
+            self.scores,
+        ]
+        self.file.write_table(pa.Table.from_arrays(columns, schema=self.schema))
+        self.starts, self.ends, self.label_ids, self.scores = [], [], [], []
 
-def generate_audacity(timestamps: list[str], result: dict[str, list], result_path: str):
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            super().close()
+
+
+def write_results(detections: Detections, writers: list[ResultWriter]):
     """
-    Generates an Audacity timeline label file from the given timestamps and results.
+    Writes the detections to all given writers in a single pass and closes them.
 
     Args:
-        timestamps (list[str]): A list of timestamp strings.
-        result (dict[str, list]): A dictionary where keys are timestamps and values are lists of tuples,
-                                  each containing a label and a confidence score.
-        result_path (str): The file path where the result string will be saved.
+        detections (Detections): The sorted detections of the audio file.
+        writers (list[ResultWriter]): The writers to emit each detection to.
 
     Returns:
         None
     """
-    out_string = ""
+    try:
+        for row in detections.rows():
+            for writer in writers:
+                writer.write(*row)
+    finally:
+        for writer in writers:
+            writer.close()
 
-    # Audacity timeline labels
-    for timestamp in timestamps:
-        rstring = ""
 
-        for c in result[timestamp]:
-            label = cfg.TRANSLATED_LABELS[cfg.LABELS.index(c[0])]
-            ts = timestamp.replace("-", "\t")
-            lbl = label.replace("_", ", ")
-            rstring += f"{ts}\t{lbl}\t{c[1]:.4f}\n"
+def generate_raven_table(detections: Detections, afile_path: str, result_path: str, sample_rate: int | None = None):
+    """
+    Generates a Raven selection table from the given detections.
 
-        # Write result string to file
-        out_string += rstring
+    Args:
+        detections (Detections): The sorted detections of the audio file.
+        afile_path (str): Path to the audio file being analyzed.
+        result_path (str): Path where the resulting Raven selection table will be saved.
+        sample_rate (int, optional): Native sample rate of the audio file. Read from the file if not given.
 
-    utils.save_result_file(result_path, out_string)
+    Returns:
+        None
+    """
+    write_results(detections, [RavenTableWriter(result_path, afile_path, sample_rate)])
 
 
-def generate_kaleidoscope(timestamps: list[str], result: dict[str, list], afile_path: str, result_path: str):
+def generate_audacity(detections: Detections, result_path: str):
     """
-    Generates a Kaleidoscope-compatible CSV string from the given timestamps and results, and saves it to a file.
+    Generates an Audacity timeline label file from the given detections.
 
     Args:
-        timestamps (list[str]): List of timestamp strings in the format "start-end".
-        result (dict[str, list]): Dictionary where keys are timestamp strings and values are lists of tuples containing
-                                  species label and confidence score.
-        afile_path (str): Path to the audio file being analyzed.
-        result_path (str): Path where the resulting CSV file will be saved.
+        detections (Detections): The sorted detections of the audio file.
+        result_path (str): The file path where the result string will be saved.
 
     Returns:
         None
     """
-    out_string = KALEIDOSCOPE_HEADER
-
-    folder_path, filename = os.path.split(afile_path)
-    parent_folder, folder_name = os.path.split(folder_path)
-
-    for timestamp in timestamps:
-        rstring = ""
-        start, end = timestamp.split("-", 1)
-
-        for c in result[timestamp]:
-            label = cfg.TRANSLATED_LABELS[cfg.LABELS.index(c[0])]
-            rstring += "{},{},{},{},{},{},{},{:.4f},{:.4f},{:.4f},{},{},{}\n".format(
-                parent_folder.rstrip("/"),
-                folder_name,
-                filename,
-                start,
-                float(end) - float(start),
-                label.split("_", 1)[0],
-                label.split("_", 1)[-1],
-                c[1],
-                cfg.LATITUDE,
-                cfg.LONGITUDE,
-                cfg.WEEK,
-                cfg.SIG_OVERLAP,
-                cfg.SIGMOID_SENSITIVITY,
-            )
+    write_results(detections, [AudacityWriter(result_path)])
+
+
+def generate_kaleidoscope(detections: Detections, afile_path: str, result_path: str):
+    """
+    Generates a Kaleidoscope-compatible CSV file from the given detections.
 
-        # Write result string to file
-        out_string += rstring
+    Args:
+        detections (Detections): The sorted detections of the audio file.
+        afile_path (str): Path to the audio file being analyzed.
+        result_path (str): Path where the resulting CSV file will be saved.
 
-    utils.save_result_file(result_path, out_string)
+    Returns:
+        None
+    """
+    write_results(detections, [KaleidoscopeWriter(result_path, afile_path)])
 
 
-def generate_csv(timestamps: list[str], result: dict[str, list], afile_path: str, result_path: str):
+def generate_csv(detections: Detections, afile_path: str, result_path: str):
     """
-    Generates a CSV file from the given timestamps and results.
+    Generates a CSV file from the given detections.
 
     Args:
-        timestamps (list[str]): A list of timestamp strings in the format "start-end".
-        result (dict[str, list]): A dictionary where keys are timestamp strings and values are lists of tuples.
-                                  Each tuple contains a label and a confidence score.
+        detections (Detections): The sorted detections of the audio file.
         afile_path (str): The file path of the audio file being analyzed.
         result_path (str): The file path where the resulting CSV file will be saved.
 
     Returns:
         None
     """
-    out_string = CSV_HEADER
+    write_results(detections, [CsvWriter(result_path, afile_path)])
 
-    for timestamp in timestamps:
-        rstring = ""
 
-        for c in result[timestamp]:
-            start, end = timestamp.split("-", 1)
-            label = cfg.TRANSLATED_LABELS[cfg.LABELS.index(c[0])]
-            rstring += f"{start},{end},{label.split('_', 1)[0]},{label.split('_', 1)[-1]},{c[1]:.4f},{afile_path}\n"
+def get_result_writers(result_files: dict[str, str], afile_path: str, sample_rate: int | None = None):
+    """
+    Opens a writer for every requested result type.
 
-        # Write result string to file
-        out_string += rstring
+    Args:
+        result_files (dict[str, str]): A dictionary mapping result types to their respective file paths.
+        afile_path (str): The path to the audio file being analyzed.
+        sample_rate (int, optional): Native sample rate of the audio file, used for the Raven table.
 
-    utils.save_result_file(result_path, out_string)
+    Returns:
+        list[ResultWriter]: The opened writers.
+    """
+    writers = []
 
+    try:
+        if "table" in result_files:
+            writers.append(RavenTableWriter(result_files["table"], afile_path, sample_rate))
 
-def save_result_files(r: dict[str, list], result_files: dict[str, str], afile_path: str):
+        if "audacity" in cfg.RESULT_TYPES:
+            writers.append(AudacityWriter(result_files["audacity"]))
+
+        # if "r" in cfg.RESULT_TYPES:
+        #     writers.append(RTableWriter(result_files["r"], afile_path))
+
+        if "kaleidoscope" in cfg.RESULT_TYPES:
+            writers.append(KaleidoscopeWriter(result_files["kaleidoscope"], afile_path))
+
+        if "csv" in cfg.RESULT_TYPES:
+            writers.append(CsvWriter(result_files["csv"], afile_path))
+
+        if "parquet" in cfg.RESULT_TYPES:
+            writers.append(ParquetWriter(result_files["parquet"], afile_path))
+    except Exception:
+        for writer in writers:
+            writer.close()
+        raise
+
+    return writers
+
+
+def save_result_files(
+    detections: Detections, result_files: dict[str, str], afile_path: str, sample_rate: int | None = None
+):
     """
     Saves the result files in various formats based on the provided configuration.
 
+    All result types are written in a single pass over the detections.
+
     Args:
-        r (dict[str, list]): A dictionary containing the analysis results with timestamps as keys.
+        detections (Detections): The detections of the analyzed file.
         result_files (dict[str, str]): A dictionary mapping result types to their respective file paths.
         afile_path (str): The path to the audio file being analyzed.
+        sample_rate (int, optional): Native sample rate of the audio file. Read from the file if not given.
 
     Returns:
         None
@@ -238,25 +510,12 @@ def save_result_files(r: dict[str, list], result_files: dict[str, str], afile_pa
     os.makedirs(cfg.OUTPUT_PATH, exist_ok=True)
 
     # Merge consecutive detections of the same species
-    r_merged = merge_consecutive_detections(r, cfg.MERGE_CONSECUTIVE)
+    merged = merge_consecutive_detections(detections, cfg.MERGE_CONSECUTIVE)
 
     # Selection table
-    timestamps = get_sorted_timestamps(r_merged)
-
-    if "table" in result_files:
-        generate_raven_table(timestamps, r_merged, afile_path, result_files["table"])
+    merged = sort_detections(merged)
 
-    if "audacity" in cfg.RESULT_TYPES:
-        generate_audacity(timestamps, r_merged, result_files["audacity"])
-
-    # if "r" in cfg.RESULT_TYPES:
-    #     generate_rtable(timestamps, r, afile_path, result_files["r"])
-
-    if "kaleidoscope" in cfg.RESULT_TYPES:
-        generate_kaleidoscope(timestamps, r_merged, afile_path, result_files["kaleidoscope"])
-
-    if "csv" in cfg.RESULT_TYPES:
-        generate_csv(timestamps, r_merged, afile_path, result_files["csv"])
+    write_results(merged, get_result_writers(result_files, afile_path, sample_rate))
 
 
 def combine_raven_tables(saved_results: list[str]):
@@ -390,6 +649,30 @@ def combine_csv_files(saved_results: list[str]):
                     utils.write_error_log(ex)
 
 
+def combine_parquet_files(saved_results: list[str]):
+    """
+    Combines multiple Parquet result files into a single Parquet file.
+
+    Row groups are appended as they are, without converting the results to text and back.
+
+    Args:
+        saved_results (list[str]): A list of file paths to the Parquet files to be combined.
+    """
+    import pyarrow.parquet as pq
+
+    with pq.ParquetWriter(os.path.join(cfg.OUTPUT_PATH, cfg.OUTPUT_PARQUET_FILENAME), get_parquet_schema()) as writer:
+        for rfile in saved_results:
+            try:
+                pfile = pq.ParquetFile(rfile)
+
+                for i in range(pfile.num_row_groups):
+                    writer.write_table(pfile.read_row_group(i))
+
+            except Exception as ex:
+                print(f"Error: Cannot combine results from {rfile}.\n", flush=True)
+                utils.write_error_log(ex)
+
+
 def combine_results(saved_results: list[dict[str, str]]):
     """
     Combines various types of result files based on the configuration settings.
@@ -416,110 +699,110 @@ def combine_results(saved_results: list[dict[str, str]]):
     if "csv" in cfg.RESULT_TYPES:
         combine_csv_files([f["csv"] for f in saved_results if f])
 
+    if "parquet" in cfg.RESULT_TYPES:
+        combine_parquet_files([f["parquet"] for f in saved_results if f])
 
-def merge_consecutive_detections(results: dict[str, list], max_consecutive: int = None):
+
+def merge_consecutive_detections(detections: Detections, max_consecutive: int = None):
     """Merges consecutive detections of the same species.
     Uses the mean of the top-3 highest scoring predictions as
     confidence score for the merged detection.
 
     Args:
-        results: The dictionary with {segment: scores}.
+        detections: The detections of a file, in the order they were predicted.
         max_consecutive: The maximum number of consecutive detections to merge. If None, merge all consecutive detections.
 
     Returns:
-        The dictionary with merged detections.
+        The merged detections.
     """
 
     # If max_consecutive is 0 or 1, return original results
-    if max_consecutive is not None and max_consecutive <= 1:
-        return results
-
-    # For each species, make list of timestamps and scores
-    species = {}
-    for timestamp, scores in results.items():
-        for label, score in scores:
-            if label not in species:
-                species[label] = []
-            species[label].append((timestamp, score))
-
-    # Sort timestamps by start time for each species
-    for label, timestamps in species.items():
-        species[label] = sorted(timestamps, key=lambda t: float(t[0].split("-", 1)[0]))
-
-    # Merge consecutive detections
-    merged_results = {}
-    for label in species:
-        timestamps = species[label]
+    if (max_consecutive is not None and max_consecutive <= 1) or len(detections) == 0:
+        return detections
 
-        # Check if end time of current detection is within the start time of the next detection
-        i = 0
-        while i < len(timestamps) - 1:
-            start, end = timestamps[i][0].split("-", 1)
-            next_start, next_end = timestamps[i + 1][0].split("-", 1)
+    # Rank species by first appearance and sort by species, then start time
+    labels, first_index = np.unique(detections.label_id, return_index=True)
+    rank = np.empty(labels.max() + 1, dtype=np.intp)
+    rank[labels] = np.argsort(np.argsort(first_index))
+    order = np.lexsort((detections.start, rank[detections.label_id]))
+    ordered = detections.take(order)
+    boundaries = np.flatnonzero(np.diff(ordered.label_id)) + 1
 
-            if float(end) >= float(next_start):
-                # Merge detections
-                merged_scores = [timestamps[i][1], timestamps[i + 1][1]]
-                timestamps.pop(i)
+    starts, ends, label_ids, scores = [], [], [], []
 
-                while i < len(timestamps) - 1 and float(next_end) >= float(timestamps[i + 1][0].split("-", 1)[0]):
-                    if max_consecutive and len(merged_scores) >= max_consecutive:
-                        break
-                    merged_scores.append(timestamps[i + 1][1])
-                    next_end = timestamps[i + 1][0].split("-", 1)[1]
-                    timestamps.pop(i + 1)
+    for group in np.split(np.arange(len(ordered)), boundaries):
+        label_id = int(ordered.label_id[group[0]])
+        g_start = ordered.start[group].tolist()
+        g_end = ordered.end[group].tolist()
+        g_score = ordered.score[group].tolist()
 
-                # Calculate mean of top 3 scores
-                top_3_scores = sorted(merged_scores, reverse=True)[:3]
-                merged_score = sum(top_3_scores) / len(top_3_scores)
+        # Check if end time of current detection is within the start time of the next detection
+        i = 0
+        while i < len(group):
+            end = g_end[i]
+            merged_scores = [g_score[i]]
+            j = i + 1
+
+            while j < len(group) and end >= g_start[j]:
+                if max_consecutive and len(merged_scores) >= max_consecutive:
+                    break
+                merged_scores.append(g_score[j])
+                end = g_end[j]
+                j += 1
 
-                timestamps[i] = (f"{start}-{next_end}", merged_score)
+            # Calculate mean of top 3 scores
+            top_3_scores = sorted(merged_scores, reverse=True)[:3]
 
-            i += 1
+            starts.append(g_start[i])
+            ends.append(end)
+            label_ids.append(label_id)
+            scores.append(sum(top_3_scores) / len(top_3_scores))
+            i = j
 
-        merged_results[label] = timestamps
+    # Segments that share start and end are kept together, in order of first appearance
+    segment_ids = {}
+    segment_order = [segment_ids.setdefault(segment, len(segment_ids)) for segment in zip(starts, ends)]
+    order = np.lexsort((np.arange(len(starts)), segment_order, starts))
 
-    # Restore original format
-    results = {}
-    for label, timestamps in merged_results.items():
-        for timestamp, score in timestamps:
-            if timestamp not in results:
-                results[timestamp] = []
-            results[timestamp].append((label, score))
+    return Detections(starts, ends, label_ids, scores).take(order)
 
-    return results
 
+def sort_detections(detections: Detections):
+    """Sorts the detections by start time.
 
-def get_sorted_timestamps(results: dict[str, list]):
-    """Sorts the results based on the segments.
+    Detections with equal start times keep their relative order.
 
     Args:
-        results: The dictionary with {segment: scores}.
+        detections: The detections of a file.
 
     Returns:
-        Returns the sorted list of segments and their scores.
+        The sorted detections.
     """
-    return sorted(results, key=lambda t: float(t.split("-", 1)[0]))
+    return detections.take(np.argsort(detections.start, kind="stable"))
 
 
-def get_raw_audio_from_file(fpath: str, offset, duration):
-    """Reads an audio file and splits the signal into chunks.
+def get_raw_audio_batches_from_file(fpath: str | audio.AudioSource, offset, duration, batch_size):
+    """Reads an audio file and yields the signal split into batches of chunks.
 
     Args:
-        fpath: Path to the audio file.
+        fpath: Path to the audio file, or an open audio source to read consecutive windows without decoding twice.
+        batch_size: Maximum number of chunks per batch.
 
     Returns:
-        The signal split into a list of chunks.
+        An iterator over float32 arrays of chunks. The arrays share one buffer.
     """
     # Open file
-    sig, rate = audio.open_audio_file(
-        fpath, cfg.SAMPLE_RATE, offset, duration, cfg.BANDPASS_FMIN, cfg.BANDPASS_FMAX, cfg.AUDIO_SPEED
-    )
-
-    # Split into raw audio chunks
-    chunks = audio.split_signal(sig, rate, cfg.SIG_LENGTH, cfg.SIG_OVERLAP, cfg.SIG_MINLEN)
+    if isinstance(fpath, audio.AudioSource):
+        sig, rate = fpath.read_signal(
+            offset, duration, cfg.SAMPLE_RATE, cfg.BANDPASS_FMIN, cfg.BANDPASS_FMAX, cfg.AUDIO_SPEED
+        )
+    else:
+        sig, rate = audio.open_audio_file(
+            fpath, cfg.SAMPLE_RATE, offset, duration, cfg.BANDPASS_FMIN, cfg.BANDPASS_FMAX, cfg.AUDIO_SPEED
+        )
 
-    return chunks
+    # Split into batches of raw audio chunks
+    return audio.iter_signal_batches(sig, rate, cfg.SIG_LENGTH, cfg.SIG_OVERLAP, cfg.SIG_MINLEN, batch_size)
 
 
 def predict(samples):
@@ -532,7 +815,7 @@ def predict(samples):
         The prediction scores.
     """
     # Prepare sample and pass through model
-    data = np.array(samples, dtype="float32")
+    data = np.asarray(samples, dtype="float32")
     prediction = model.predict(data)
 
     # Logits or sigmoid activations?
@@ -550,7 +833,7 @@ def get_result_file_names(fpath: str):
         fpath (str): The file path of the input file.
 
     Returns:
-        dict: A dictionary where the keys are result types (e.g., "table", "audacity", "r", "kaleidoscope", "csv")
+        dict: A dictionary where the keys are result types (e.g., "table", "audacity", "r", "kaleidoscope", "csv", "parquet")
               and the values are the corresponding output file paths.
     """
     result_names = {}
@@ -576,6 +859,8 @@ def get_result_file_names(fpath: str):
         )
     if "csv" in cfg.RESULT_TYPES:
         result_names["csv"] = os.path.join(cfg.OUTPUT_PATH, file_shorthand + ".BirdNET.results.csv")
+    if "parquet" in cfg.RESULT_TYPES:
+        result_names["parquet"] = os.path.join(cfg.OUTPUT_PATH, file_shorthand + ".BirdNET.results.parquet")
 
     return result_names
 
@@ -585,66 +870,83 @@ def analyze_file(item):
     Analyzes an audio file and generates prediction results.
 
     Args:
-        item (tuple): A tuple containing the file path (str) and configuration settings.
+        item (tuple): A tuple containing the file path (str) and configuration settings,
+            or None to keep the current configuration.
 
     Returns:
-        dict or None: A dictionary of result file names if analysis is successful,
-                      None if the file is skipped or an error occurs.
+        dict or None: A dictionary of result file names if analysis is successful or the file
+                      is skipped because its results are up to date, None if an error occurs.
     Raises:
         Exception: If there is an error in reading the audio file or saving the results.
     """
-    # Get file path and restore cfg
+    # Get file path and restore cfg, workers of analyze_files already have it
     fpath: str = item[0]
-    cfg.set_config(item[1])
+
+    if item[1] is not None:
+        cfg.set_config(item[1])
 
     result_file_names = get_result_file_names(fpath)
 
     if cfg.SKIP_EXISTING_RESULTS:
-        if all(os.path.exists(f) for f in result_file_names.values()):
+        if cfg.ANALYSIS_MANIFEST_FILENAME:
+            skip = manifest.get_completed_results(fpath, result_file_names) is not None
+        else:
+            skip = all(os.path.exists(f) for f in result_file_names.values())
+
+        # Return the results of the last run, so they are combined as well
+        if skip:
             print(f"Skipping {fpath} as it has already been analyzed", flush=True)
-            return None  # or return path to combine later? TODO
+            return result_file_names
 
     # Start time
     start_time = datetime.datetime.now()
     offset = 0
     duration = int(cfg.FILE_SPLITTING_DURATION / cfg.AUDIO_SPEED)
     start, end = 0, cfg.SIG_LENGTH
-    results = {}
+    results = []
 
     # Status
     print(f"Analyzing {fpath}", flush=True)
+    _record_in_manifest(fpath, manifest.STATUS_RUNNING)
 
     try:
-        fileLengthSeconds = int(audio.get_audio_file_length(fpath) / cfg.AUDIO_SPEED)
+        # Open the file once, duration and sample rate come from the header
+        source = audio.AudioSource(fpath)
+        native_rate = source.sample_rate
+        fileLengthSeconds = int(source.duration / cfg.AUDIO_SPEED)
     except Exception as ex:
         # Write error log
         print(f"Error: Cannot analyze audio file {fpath}. File corrupt?\n", flush=True)
         utils.write_error_log(ex)
+        _record_in_manifest(fpath, manifest.STATUS_ERROR)
 
         return None
 
+    # Labels that may be reported at all
+    if cfg.SPECIES_LIST:
+        species_list = set(cfg.SPECIES_LIST)
+        label_mask = np.array([label in species_list for label in cfg.LABELS], dtype=bool)
+    else:
+        label_mask = np.ones(len(cfg.LABELS), dtype=bool)
+
     # Process each chunk
     try:
         while offset < fileLengthSeconds:
-            chunks = get_raw_audio_from_file(fpath, offset, duration)
-            samples = []
-            timestamps = []
-
-            for chunk_index, chunk in enumerate(chunks):
-                # Add to batch
-                samples.append(chunk)
-                timestamps.append([round(start * cfg.AUDIO_SPEED, 1), round(end * cfg.AUDIO_SPEED, 1)])
+            for samples in get_raw_audio_batches_from_file(source, offset, duration, cfg.BATCH_SIZE):
+                timestamps = []
 
-                # Advance start and end
-                start += cfg.SIG_LENGTH - cfg.SIG_OVERLAP
-                end = start + cfg.SIG_LENGTH
+                for _ in range(len(samples)):
+                    timestamps.append([round(start * cfg.AUDIO_SPEED, 1), round(end * cfg.AUDIO_SPEED, 1)])
 
-                # Check if batch is full or last chunk
-                if len(samples) < cfg.BATCH_SIZE and chunk_index < len(chunks) - 1:
-                    continue
+                    # Advance start and end
+                    start += cfg.SIG_LENGTH - cfg.SIG_OVERLAP
+                    end = start + cfg.SIG_LENGTH
 
                 # Predict
-                p = predict(samples)
+                p = np.asarray(predict(samples))
+
+                if p.shape[1] != len(label_mask):
+                    raise ValueError(f"Model returned {p.shape[1]} scores for {len(label_mask)} labels.")
 
                 # Add to results
                 for i in range(len(samples)):
@@ -655,47 +957,136 @@ def analyze_file(item):
                     pred = p[i]
 
                     # Assign scores to labels
-                    p_labels = [
-                        p
-                        for p in zip(cfg.LABELS, pred, strict=True)
-                        if (cfg.TOP_N or p[1] >= cfg.MIN_CONFIDENCE)
-                        and (not cfg.SPECIES_LIST or p[0] in cfg.SPECIES_LIST)
-                    ]
+                    if cfg.TOP_N:
+                        label_ids = np.flatnonzero(label_mask)
+                    else:
+                        label_ids = np.flatnonzero(label_mask & (pred >= cfg.MIN_CONFIDENCE))
 
                     # Sort by score
-                    p_sorted = sorted(p_labels, key=operator.itemgetter(1), reverse=True)
+                    label_ids = label_ids[np.argsort(-pred[label_ids], kind="stable")]
 
                     if cfg.TOP_N:
-                        p_sorted = p_sorted[: cfg.TOP_N]
+                        label_ids = label_ids[: cfg.TOP_N]
 
-                    # TODO hier schon top n oder min conf raussortieren
-                    # Store top 5 results and advance indices
-                    results[str(s_start) + "-" + str(s_end)] = p_sorted
+                    n = len(label_ids)
+                    results.append(Detections(np.full(n, s_start), np.full(n, s_end), label_ids, pred[label_ids]))
 
-                # Clear batch
-                samples = []
-                timestamps = []
             offset = offset + duration
 
     except Exception as ex:
         # Write error log
         print(f"Error: Cannot analyze audio file {fpath}.\n", flush=True)
         utils.write_error_log(ex)
+        _record_in_manifest(fpath, manifest.STATUS_ERROR)
 
         return None
 
+    finally:
+        source.close()
+
+    results = Detections.concatenate(results)
+
     # Save as selection table
     try:
-        save_result_files(results, result_file_names, fpath)
+        save_result_files(results, result_file_names, fpath, native_rate)
 
     except Exception as ex:
         # Write error log
         print(f"Error: Cannot save result for {fpath}.\n", flush=True)
         utils.write_error_log(ex)
+        _record_in_manifest(fpath, manifest.STATUS_ERROR)
 
         return None
 
     delta_time = (datetime.datetime.now() - start_time).total_seconds()
     print(f"Finished {fpath} in {delta_time:.2f} seconds", flush=True)
+    _record_in_manifest(fpath, manifest.STATUS_DONE, source.duration, delta_time, result_file_names)
 
     return result_file_names
+
+
+def _record_in_manifest(fpath: str, status: str, *args):
+    """Records the status of a file in the manifest, if enabled. Failing to record does not fail the analysis."""
+    if not cfg.ANALYSIS_MANIFEST_FILENAME:
+        return
+
+    try:
+        manifest.record(fpath, status, *args)
+    except (sqlite3.Error, OSError) as ex:
+        utils.write_error_log(ex)
+
+
+def _init_analysis_worker(config):
+    """Restores the config once per worker process of analyze_files.
+
+    The model is loaded by the first file of each worker and kept for the others. Loading it here
+    would make the pool respawn workers forever if it fails, in analyze_file the error is logged per file.
+    """
+    cfg.set_config(config)
+
+
+def _analyze_file_in_worker(item):
+    """Analyzes a file in a worker process of analyze_files."""
+    index, fpath = item
+
+    return index, analyze_file((fpath, None))
+
+
+def _get_file_size(fpath: str):
+    """Returns the size of a file in bytes, or 0 if it cannot be read."""
+    try:
+        return os.path.getsize(fpath)
+    except OSError:
+        return 0
+
+
+def _largest_first(file_list: Iterable[str], lookahead: int):
+    """Yields (index, path) of the files, the largest of the next lookahead files first.
+
+    Args:
+        file_list: Paths of the audio files, consumed lazily.
+        lookahead: Number of files to hold back and sort by size.
+
+    Yields:
+        Tuples (index in file_list, path).
+    """
+    heap = []
+
+    for i, fpath in enumerate(file_list):
+        heapq.heappush(heap, (-_get_file_size(fpath), i, fpath))
+
+        if len(heap) > lookahead:
+            _, j, largest = heapq.heappop(heap)
+
+            yield j, largest
+
+    while heap:
+        _, j, largest = heapq.heappop(heap)
+
+        yield j, largest
+
+
+def analyze_files(file_list: Iterable[str], processes: int, lookahead: int = 256):
+    """Analyzes files in a pool of worker processes.
+
+    Every worker receives the config and loads the model once, tasks only carry the file path.
+    The largest files are scheduled first, so one long recording does not keep the other
+    workers idle at the end of a batch. A list is sorted completely. Any other iterable is
+    scheduled while it is consumed, so analysis starts before e.g. a folder scan is finished,
+    and only the next lookahead files are sorted.
+
+    Args:
+        file_list: Paths of the audio files.
+        processes: Number of worker processes.
+        lookahead: Number of files of an iterable that are sorted by size before they are scheduled.
+
+    Yields:
+        Tuples (index in file_list, result of analyze_file) as soon as each file is done.
+    """
+    if isinstance(file_list, list):
+        items = sorted(enumerate(file_list), key=lambda item: _get_file_size(item[1]), reverse=True)
+    else:
+        items = _largest_first(file_list, max(lookahead, 0))
+
+    with Pool(processes, initializer=_init_analysis_worker, initargs=(cfg.get_config(),)) as p:
+        yield from p.imap_unordered(_analyze_file_in_worker, items)
@@ -299,10 +299,12 @@ def analyzer_parser():
     The parser also defines a custom action `UniqueSetAction` to ensure that the `--rtype`
     argument values are stored as a set of unique, lowercase strings.
     Arguments:
-        --rtype: Specifies output format. Accepts multiple values from ['table', 'audacity', 'kaleidoscope', 'csv'].
+        --rtype: Specifies output format. Accepts multiple values from ['table', 'audacity', 'kaleidoscope', 'csv', 'parquet'].
         --combine_results: Outputs a combined file for all selected result types if set.
         -c, --classifier: Path to a custom trained classifier. Overrides --lat, --lon, and --locale if set.
         --skip_existing_results: Skips files that have already been analyzed if set.
+        --manifest: Keeps track of analyzed files, so interrupted or repeated runs only analyze new or changed files.
+        --directory_index: Path to a directory index file for faster rescans of the input folder.
         --top_n: Saves only the top N predictions for each segment. Threshold will be ignored.
         --merge_consecutive: Maximum number of consecutive detections to merge for each species.
     Returns:
@@ -333,9 +335,9 @@ def analyzer_parser():
     parser.add_argument(
         "--rtype",
         default={"table"},
-        choices=["table", "audacity", "kaleidoscope", "csv"],
+        choices=["table", "audacity", "kaleidoscope", "csv", "parquet"],
         nargs="+",
-        help="Specifies output format. Values in `['table', 'audacity',  'kaleidoscope', 'csv']`.",
+        help="Specifies output format. Values in `['table', 'audacity',  'kaleidoscope', 'csv', 'parquet']`. 'parquet' requires pyarrow.",
         action=UniqueSetAction,
     )
     parser.add_argument(
@@ -357,6 +359,17 @@ def analyzer_parser():
         help="Skip files that have already been analyzed.",
     )
 
+    parser.add_argument(
+        "--manifest",
+        action="store_true",
+        help="Keep track of analyzed files in a manifest in the output folder. With --skip_existing_results, only new or changed files are analyzed again.",
+    )
+
+    parser.add_argument(
+        "--directory_index",
+        help="Path to a directory index file. Folders of the input that did not change since the last run are not listed again.",
+    )
+
     parser.add_argument(
         "--top_n",
         type=lambda a: max(1, int(a)),
@@ -684,8 +697,16 @@ def train_parser():
         choices=["replace", "append"],
         help="Model save mode. 'replace' will overwrite the original classification layer and 'append' will combine the original classification layer with the new one.",
     )
-    parser.add_argument("--cache_mode", choices=["load", "save"], help="Cache mode. Can be 'load' or 'save'.")
+    parser.add_argument(
+        "--cache_mode",
+        choices=["load", "save", "append"],
+        help="Cache mode. Can be 'load', 'save' or 'append'. 'append' adds the training data to an existing cache and trains on all of it.",
+    )
     parser.add_argument("--cache_file", default=cfg.TRAIN_CACHE_FILE, help="Path to cache file.")
+    parser.add_argument(
+        "--embedding_cache",
+        help="Folder for per-file embedding cache. Files that did not change since the last run are not re-embedded.",
+    )
     parser.add_argument(
         "--autotune",
         action="store_true",
@@ -2,6 +2,7 @@
 
 import datetime
 import os
+import sqlite3
 
 import numpy as np
 
@@ -9,42 +10,85 @@ import birdnet_analyzer.audio as audio
 import birdnet_analyzer.config as cfg
 import birdnet_analyzer.model as model
 import birdnet_analyzer.utils as utils
-from birdnet_analyzer.analyze.utils import get_raw_audio_from_file
+from birdnet_analyzer.analyze.utils import get_raw_audio_batches_from_file
 from birdnet_analyzer.embeddings.core import get_database
 
 
 from perch_hoplite.db import sqlite_usearch_impl
 from perch_hoplite.db import interface as hoplite
 from ml_collections import ConfigDict
-from functools import partial
 from tqdm import tqdm
-from multiprocessing import Pool
+from multiprocessing import Pool, Queue
+from queue import Empty
 
 
 DATASET_NAME: str = "birdnet_analyzer_dataset"
 
+# Number of inserted embeddings after which the database is committed.
+# Every commit also writes the usearch index to disk, so commits should be rare.
+COMMIT_INTERVAL: int = 10000
+
+# Maximum number of embedding batches per worker waiting for the database writer.
+QUEUE_BATCHES_PER_WORKER: int = 8
+
+# Queue the worker processes send their embeddings to
+WORKER_QUEUE = None
+# Read-only connection of a worker process to the database and its offset precision
+WORKER_CONNECTION: sqlite3.Connection | None = None
+WORKER_OFFSET_DTYPE = np.float32
 
-def analyze_file(item, db: sqlite_usearch_impl.SQLiteUsearchDB):
-    """Extracts the embeddings for a file.
+
+def get_existing_offsets(db: sqlite_usearch_impl.SQLiteUsearchDB, source_id: str):
+    """Gets the offsets of all embeddings that are already stored for a source.
 
     Args:
-        item: (filepath, config)
+        db: The database.
+        source_id: The source, i.e. the audio file path.
+
+    Returns:
+        A set of (start, end) tuples in the offset precision of the database.
     """
-    # Get file path and restore cfg
-    fpath: str = item[0]
-    cfg.set_config(item[1])
+    return _query_existing_offsets(db.db, source_id, db.offset_dtype)
+
+
+def _query_existing_offsets(connection: sqlite3.Connection, source_id: str, offset_dtype):
+    """Gets the offsets of all embeddings that are already stored for a source through an SQLite connection."""
+    rows = connection.execute(
+        "SELECT he.offsets FROM hoplite_embeddings he "
+        "JOIN hoplite_sources hs ON hs.id = he.source_idx "
+        "WHERE hs.dataset = ? AND hs.source = ?;",
+        (DATASET_NAME, source_id),
+    ).fetchall()
+
+    return {tuple(sqlite_usearch_impl.deserialize_embedding(r[0], offset_dtype)) for r in rows}
+
 
+def extract_embeddings(fpath: str, existing_offsets=frozenset(), offset_dtype=np.float32):
+    """Extracts the embeddings for all segments of a file that are not stored yet.
+
+    Errors are logged and end the extraction.
+
+    Args:
+        fpath: Path to the audio file.
+        existing_offsets: Set of (start, end) tuples of segments to skip.
+        offset_dtype: The precision in which the offsets are compared.
+
+    Yields:
+        Tuples (offsets, embeddings) with one row per segment.
+    """
     offset = 0
     duration = cfg.FILE_SPLITTING_DURATION
 
     try:
-        fileLengthSeconds = int(audio.get_audio_file_length(fpath))
+        # Open the file once, the duration comes from the header
+        source = audio.AudioSource(fpath)
+        fileLengthSeconds = int(source.duration)
     except Exception as ex:
         # Write error log
         print(f"Error: Cannot analyze audio file {fpath}. File corrupt?\n", flush=True)
         utils.write_error_log(ex)
 
-        return None
+        return
 
     # Start time
     start_time = datetime.datetime.now()
@@ -52,57 +96,27 @@ def analyze_file(item, db: sqlite_usearch_impl.SQLiteUsearchDB):
     # Status
     print(f"Analyzing {fpath}", flush=True)
 
-    source_id = fpath
-
     # Process each chunk
     try:
         while offset < fileLengthSeconds:
-            chunks = get_raw_audio_from_file(fpath, offset, duration)
-            start, end = offset, cfg.SIG_LENGTH + offset
-            samples = []
-            timestamps = []
-
-            for c in range(len(chunks)):
-                # Add to batch
-                samples.append(chunks[c])
-                timestamps.append([start, end])
-
-                # Advance start and end
-                start += cfg.SIG_LENGTH - cfg.SIG_OVERLAP
-                end = start + cfg.SIG_LENGTH
-
-                # Check if batch is full or last chunk
-                if len(samples) < cfg.BATCH_SIZE and c < len(chunks) - 1:
-                    continue
-
-                # Prepare sample and pass through model
-                data = np.array(samples, dtype="float32")
-                e = model.embeddings(data)
+            start = offset
 
-                # Add to results
-                for i in range(len(samples)):
-                    # Get timestamp
-                    s_start, s_end = timestamps[i]
+            for samples in get_raw_audio_batches_from_file(source, offset, duration, cfg.BATCH_SIZE):
+                # Get timestamps
+                starts = start + np.arange(len(samples)) * (cfg.SIG_LENGTH - cfg.SIG_OVERLAP)
+                timestamps = np.stack([starts, starts + cfg.SIG_LENGTH], axis=1)
+                start = starts[-1] + cfg.SIG_LENGTH - cfg.SIG_OVERLAP
 
-                    # Check if embedding already exists
-                    existing_embedding = db.get_embeddings_by_source(
-                        DATASET_NAME, source_id, np.array([s_start, s_end])
-                    )
+                # Skip segments that already exist
+                missing = [i for i, t in enumerate(timestamps.astype(offset_dtype)) if tuple(t) not in existing_offsets]
 
-                    if existing_embedding.size == 0:
-                        # Get prediction
-                        embeddings = e[i]
-
-                        # Store embeddings
-                        embeddings_source = hoplite.EmbeddingSource(DATASET_NAME, source_id, np.array([s_start, s_end]))
+                if not missing:
+                    continue
 
-                        # Insert into database
-                        db.insert_embedding(embeddings, embeddings_source)
-                        db.commit()
+                # Pass missing samples through model
+                e = model.embeddings(samples[missing] if len(missing) < len(samples) else samples)
 
-                # Reset batch
-                samples = []
-                timestamps = []
+                yield timestamps[missing], np.asarray(e)
 
             offset = offset + duration
 
@@ -113,10 +127,136 @@ def analyze_file(item, db: sqlite_usearch_impl.SQLiteUsearchDB):
 
         return
 
+    finally:
+        source.close()
+
     delta_time = (datetime.datetime.now() - start_time).total_seconds()
     print("Finished {} in {:.2f} seconds".format(fpath, delta_time), flush=True)
 
 
+def insert_embeddings(db: sqlite_usearch_impl.SQLiteUsearchDB, source_id: str, offsets, embeddings):
+    """Inserts embeddings into the database without committing.
+
+    Args:
+        db: The database.
+        source_id: The source, i.e. the audio file path.
+        offsets: Array of (start, end) rows.
+        embeddings: Array of embeddings, one row per offset.
+    """
+    for o, e in zip(offsets, embeddings):
+        db.insert_embedding(e, hoplite.EmbeddingSource(DATASET_NAME, source_id, o))
+
+
+def analyze_file(fpath: str, db: sqlite_usearch_impl.SQLiteUsearchDB):
+    """Extracts the embeddings for a file.
+
+    Segments that are already in the database are skipped, so an interrupted run can simply be restarted.
+    The embeddings are inserted without committing, the caller is responsible for committing the database.
+
+    Args:
+        fpath: Path to the audio file.
+        db: The database.
+
+    Returns:
+        The number of inserted embeddings.
+    """
+    inserted = 0
+
+    for offsets, e in extract_embeddings(fpath, get_existing_offsets(db, fpath), db.offset_dtype):
+        insert_embeddings(db, fpath, offsets, e)
+        inserted += len(e)
+
+    return inserted
+
+
+def _init_worker(queue, config: dict, db_file: str, offset_dtype):
+    """Initializes a worker process.
+
+    The config is sent once per worker instead of with every file. Each worker opens its own
+    read-only connection to the database to look up the stored segments of a file when it starts it.
+
+    Args:
+        queue: The queue for the database writer.
+        config: The config of the main process.
+        db_file: Path to the SQLite file of the database.
+        offset_dtype: The precision in which the offsets are stored.
+    """
+    global WORKER_QUEUE, WORKER_CONNECTION, WORKER_OFFSET_DTYPE
+
+    cfg.set_config(config)
+    WORKER_QUEUE = queue
+    WORKER_CONNECTION = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True, timeout=60)
+    WORKER_OFFSET_DTYPE = offset_dtype
+
+
+def _extract_file_worker(fpath: str):
+    """Extracts the embeddings for a file in a worker process and sends them to the database writer.
+
+    Every batch is sent as (filepath, offsets, embeddings). When the file is done,
+    (filepath, None, None) is sent, even if the extraction failed.
+
+    Args:
+        fpath: Path to the audio file.
+    """
+    try:
+        existing_offsets = _query_existing_offsets(WORKER_CONNECTION, fpath, WORKER_OFFSET_DTYPE)
+
+        for offsets, e in extract_embeddings(fpath, existing_offsets, WORKER_OFFSET_DTYPE):
+            WORKER_QUEUE.put((fpath, offsets, e))
+    finally:
+        WORKER_QUEUE.put((fpath, None, None))
+
+
+def run_parallel(file_list: list[str], db: sqlite_usearch_impl.SQLiteUsearchDB):
+    """Extracts embeddings with cfg.CPU_THREADS worker processes.
+
+    The workers decode the audio and run the model. This process is the only one writing
+    to the database. The queue between both is bounded, so workers wait if the database
+    falls behind.
+
+    Args:
+        file_list: Paths of the audio files.
+        db: The database.
+    """
+    # Path of the main database file, the workers only read from it
+    db_file = db.db.execute("PRAGMA database_list").fetchone()[2]
+    queue = Queue(maxsize=QUEUE_BATCHES_PER_WORKER * cfg.CPU_THREADS)
+    pending = 0
+    remaining = len(file_list)
+
+    with Pool(
+        cfg.CPU_THREADS,
+        initializer=_init_worker,
+        initargs=(queue, cfg.get_config(), db_file, db.offset_dtype),
+    ) as p:
+        result = p.map_async(_extract_file_worker, file_list, chunksize=1)
+
+        with tqdm(total=remaining) as progress:
+            while remaining > 0:
+                try:
+                    fpath, offsets, e = queue.get(timeout=1)
+                except Empty:
+                    # Raise worker errors, otherwise keep waiting
+                    if result.ready() and not result.successful():
+                        result.get()
+
+                    continue
+
+                # File done?
+                if offsets is None:
+                    remaining -= 1
+                    progress.update(1)
+                    continue
+
+                insert_embeddings(db, fpath, offsets, e)
+                pending += len(e)
+
+                # Commit in large transactions
+                if pending >= COMMIT_INTERVAL:
+                    db.commit()
+                    pending = 0
+
+
 def check_database_settings(db: sqlite_usearch_impl.SQLiteUsearchDB):
     try:
         settings = db.get_metadata("birdnet_analyzer_settings")
@@ -168,26 +308,26 @@ def run(input, database, overlap, audio_speed, fmin, fmax, threads, batchsize):
         cfg.CPU_THREADS = 1
         cfg.TFLITE_THREADS = max(1, int(threads))
 
-    cfg.CPU_THREADS = 1  # TODO: with the current implementation, we can't use more than 1 thread
-
     # Set batch size
     cfg.BATCH_SIZE = max(1, int(batchsize))
 
-    # Add config items to each file list entry.
-    # We have to do this for Windows which does not
-    # support fork() and thus each process has to
-    # have its own config. USE LINUX!
-    flist = [(f, cfg.get_config()) for f in cfg.FILE_LIST]
-
     db = get_database(database)
     check_database_settings(db)
 
     # Analyze files
-    if cfg.CPU_THREADS < 2:
-        for entry in tqdm(flist):
-            analyze_file(entry, db)
-    else:
-        with Pool(cfg.CPU_THREADS) as p:
-            tqdm(p.imap(partial(analyze_file, db=db), flist))
-
-    db.db.close()
+    try:
+        if cfg.CPU_THREADS < 2:
+            pending = 0
+
+            for fpath in tqdm(cfg.FILE_LIST):
+                pending += analyze_file(fpath, db)
+
+                # Commit in large transactions
+                if pending >= COMMIT_INTERVAL:
+                    db.commit()
+                    pending = 0
+        else:
+            run_parallel(cfg.FILE_LIST, db)
+    finally:
+        db.commit()
+        db.db.close()
@@ -12,6 +12,7 @@ import os
 from typing import Optional, Dict, List, Tuple
 
 from birdnet_analyzer.evaluation.preprocessing.data_processor import DataProcessor
+from birdnet_analyzer.evaluation.preprocessing.utils import get_default_cache_dir
 from birdnet_analyzer.evaluation.assessment.performance_assessor import PerformanceAssessor
 
 
@@ -29,6 +30,9 @@ def process_data(
     metrics_list: Tuple[str, ...] = ("accuracy", "precision", "recall"),
     threshold: float = 0.1,
     class_wise: bool = False,
+    num_workers: Optional[int] = None,
+    chunked: bool = False,
+    cache_dir: Optional[str] = None,
 ):
     """
     Processes data, computes metrics, and prepares the performance assessment pipeline.
@@ -47,9 +51,15 @@ def process_data(
         metrics_list (Tuple[str, ...]): Metrics to compute for performance assessment.
         threshold (float): Confidence threshold for predictions.
         class_wise (bool): Whether to calculate metrics on a per-class basis.
+        num_workers (Optional[int]): Number of worker processes for processing recordings. Defaults to all CPUs.
+        chunked (bool): Whether to stream the samples in chunks of recordings instead of loading them
+            all into memory. AP and AUROC are then approximated from score histograms.
+        cache_dir (Optional[str]): Directory for cached tables of annotation and prediction folders.
+            Defaults to None, which disables the cache.
 
     Returns:
         Tuple: Metrics DataFrame, `PerformanceAssessor` object, predictions tensor, labels tensor.
+        The tensors are None if `chunked` is True.
     """
     # Load class mapping if provided
     if mapping_path:
@@ -82,11 +92,16 @@ def process_data(
         columns_predictions=columns_predictions,
         columns_annotations=columns_annotations,
         recording_duration=recording_duration,
+        num_workers=num_workers,
+        in_memory=not chunked,
+        cache_dir=cache_dir,
     )
 
     # Get the available classes and recordings
     available_classes = processor.classes
-    available_recordings = processor.samples_df["filename"].unique().tolist()
+    available_recordings = (
+        processor.get_recording_filenames() if chunked else processor.samples_df["filename"].unique().tolist()
+    )
 
     # Default to all classes or recordings if none are specified
     if selected_classes is None:
@@ -94,8 +109,13 @@ def process_data(
     if selected_recordings is None:
         selected_recordings = available_recordings
 
-    # Retrieve predictions and labels tensors for the selected classes and recordings
-    predictions, labels, classes = processor.get_filtered_tensors(selected_classes, selected_recordings)
+    if chunked:
+        # Tensors are only produced chunk by chunk while computing the metrics
+        predictions = labels = None
+        classes = processor.select_classes(selected_classes)
+    else:
+        # Retrieve predictions and labels tensors for the selected classes and recordings
+        predictions, labels, classes = processor.get_filtered_tensors(selected_classes, selected_recordings)
 
     num_classes = len(classes)
     task = "binary" if num_classes == 1 else "multilabel"
@@ -110,7 +130,12 @@ def process_data(
     )
 
     # Compute performance metrics
-    metrics_df = pa.calculate_metrics(predictions, labels, per_class_metrics=class_wise)
+    if chunked:
+        metrics_df = pa.calculate_metrics_from_chunks(
+            processor.iter_tensor_chunks(classes, selected_recordings), per_class_metrics=class_wise
+        )
+    else:
+        metrics_df = pa.calculate_metrics(predictions, labels, per_class_metrics=class_wise)
 
     return metrics_df, pa, predictions, labels
 
@@ -138,10 +163,24 @@ def main():
     parser.add_argument("--plot_confusion_matrix", action="store_true", help="Plot confusion matrix")
     parser.add_argument("--plot_metrics_all_thresholds", action="store_true", help="Plot metrics for all thresholds")
     parser.add_argument("--output_dir", help="Directory to save plots")
+    parser.add_argument("--num_workers", type=int, help="Number of worker processes (default: all CPUs)")
+    parser.add_argument(
+        "--chunked",
+        action="store_true",
+        help="Stream samples in chunks of recordings to bound memory (plots are not available)",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help=f"Cache parsed annotation and prediction folders in {get_default_cache_dir()}",
+    )
 
     # Parse arguments
     args = parser.parse_args()
 
+    if args.chunked and (args.plot_metrics or args.plot_confusion_matrix or args.plot_metrics_all_thresholds):
+        parser.error("Plots are not available with --chunked.")
+
     # Process data and compute metrics
     metrics_df, pa, predictions, labels = process_data(
         annotation_path=args.annotation_path,
@@ -157,6 +196,9 @@ def main():
         metrics_list=args.metrics,
         threshold=args.threshold,
         class_wise=args.class_wise,
+        num_workers=args.num_workers,
+        chunked=args.chunked,
+        cache_dir=get_default_cache_dir() if args.cache else None,
     )
 
     # Display the computed metrics
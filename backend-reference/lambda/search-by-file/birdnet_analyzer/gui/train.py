@@ -321,7 +321,7 @@ def build_train_tab():
 
                 with gr.Column():
                     cache_file_name = gr.Textbox(
-                        "train_cache.npz",
+                        "train_cache.json",
                         visible=False,
                         info=loc.localize("training-tab-cache-file-name-textbox-info"),
                     )
@@ -345,10 +345,10 @@ def build_train_tab():
 
             with gr.Column(visible=False) as load_cache_file_row:
                 selected_cache_file_btn = gr.Button(loc.localize("training-tab-cache-select-file-button-label"))
-                cache_file_input = gr.File(file_types=[".npz"], visible=False, interactive=False)
+                cache_file_input = gr.File(file_types=[".json"], visible=False, interactive=False)
 
                 def on_cache_file_selection_click():
-                    file = gu.select_file(("NPZ file (*.npz)",), state_key="train_data_cache_file")
+                    file = gu.select_file(("JSON file (*.json)",), state_key="train_data_cache_file")
 
                     if file:
                         return file, gr.File(value=file, visible=True)
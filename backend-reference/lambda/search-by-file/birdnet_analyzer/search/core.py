@@ -36,9 +36,7 @@ def search(
     """
     import os
 
-    import birdnet_analyzer.audio as audio
-    import birdnet_analyzer.config as cfg
-    from birdnet_analyzer.search.utils import get_search_results
+    from birdnet_analyzer.search.utils import export_search_results, get_search_results
 
     # Create output folder
     if not os.path.exists(output):
@@ -60,16 +58,7 @@ def search(
     results = get_search_results(queryfile, db, n_results, audio_speed, fmin, fmax, score_function, crop_mode, overlap)
 
     # Save the results
-    for i, r in enumerate(results):
-        embedding_source = db.get_embedding_source(r.embedding_id)
-        file = embedding_source.source_id
-        filebasename = os.path.basename(file)
-        filebasename = os.path.splitext(filebasename)[0]
-        offset = embedding_source.offsets[0] * audio_speed
-        duration = cfg.SIG_LENGTH * audio_speed
-        sig, rate = audio.open_audio_file(file, offset=offset, duration=duration, sample_rate=None)
-        result_path = os.path.join(output, f"{file[4]:.5f}_{filebasename}_{offset}_{offset + duration}.wav")
-        audio.save_signal(sig, result_path, rate)
+    export_search_results(results, db, audio_speed, output)
 
 
 def get_database(database_path):
@@ -1,29 +1,326 @@
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
-from perch_hoplite.db import brutalism
+from perch_hoplite.db import interface as hoplite
+from perch_hoplite.db import sqlite_usearch_impl
 from perch_hoplite.db.search_results import SearchResult
-from scipy.spatial.distance import euclidean
 
 import birdnet_analyzer.audio as audio
 import birdnet_analyzer.config as cfg
 import birdnet_analyzer.model as model
 
+# Number of database embeddings scored at once
+SEARCH_BLOCK_SIZE = 8192
+
+# Number of threads scanning blocks
+SEARCH_THREADS = 8
+
+# Number of audio files exported at the same time
+EXPORT_THREADS = 8
+
+# Folder inside the database directory holding the embedding snapshot
+SNAPSHOT_DIR = "birdnet_snapshot"
+SNAPSHOT_INFO_FILENAME = "snapshot.json"
+
+
+class EmbeddingSnapshot:
+    """Read-only copy of all embeddings of a database for exact search.
+
+    The embeddings are stored as one contiguous .npy matrix that is memory-mapped,
+    next to arrays with the embedding id, source and offsets of every row.
+    Only numpy is needed to open a snapshot, not the database.
+
+    Args:
+        path: The snapshot folder.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        with open(os.path.join(path, SNAPSHOT_INFO_FILENAME), encoding="utf-8") as f:
+            self.info = json.load(f)
+
+        self.embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+        self.ids = np.load(os.path.join(path, "ids.npy"))
+        self.source_idx = np.load(os.path.join(path, "source_idx.npy"))
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        self.sources = self.info["sources"]
+
+    def count_embeddings(self):
+        return len(self.ids)
+
+    def get_metadata(self, key: str):
+        if key not in self.info["metadata"]:
+            raise KeyError(f"Metadata key not found: {key}")
+
+        return self.info["metadata"][key]
+
+    def get_embedding_source(self, embedding_id: int):
+        i = np.searchsorted(self.ids, embedding_id)
+
+        if i == len(self.ids) or self.ids[i] != embedding_id:
+            raise ValueError(f"Embedding {embedding_id} not found.")
+
+        dataset, source = self.sources[self.source_idx[i]]
+
+        return hoplite.EmbeddingSource(dataset, source, self.offsets[i])
+
+    def get_block(self, i: int, block_size: int = SEARCH_BLOCK_SIZE):
+        """Returns the ids and the memory-mapped embeddings of the i-th block."""
+        return self.ids[i * block_size : (i + 1) * block_size], self.embeddings[i * block_size : (i + 1) * block_size]
+
+    def is_current(self, db: sqlite_usearch_impl.SQLiteUsearchDB):
+        """Checks whether the database still holds exactly the embeddings of the snapshot."""
+        return get_embedding_count_and_max_id(db) == (self.info["count"], self.info["max_id"])
+
+
+def get_embedding_count_and_max_id(db: sqlite_usearch_impl.SQLiteUsearchDB):
+    """Returns the number of embeddings and the highest embedding id of a database."""
+    count, max_id = db.db.execute("SELECT COUNT(*), MAX(id) FROM hoplite_embeddings;").fetchone()
+
+    return count, max_id
+
+
+def create_snapshot(db: sqlite_usearch_impl.SQLiteUsearchDB, path: str | None = None, dtype="float16"):
+    """Exports all embeddings of a database into a snapshot.
+
+    The snapshot is written block by block into a temporary folder, which then replaces the old snapshot.
+
+    Args:
+        db: The database.
+        path: The snapshot folder. Defaults to SNAPSHOT_DIR inside the database directory.
+        dtype: Data type of the stored embeddings.
+
+    Returns:
+        The new EmbeddingSnapshot.
+    """
+    if path is None:
+        path = os.path.join(db.db_path, SNAPSHOT_DIR)
+
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    count, max_id = get_embedding_count_and_max_id(db)
+    sources = db.db.execute("SELECT id, dataset, source FROM hoplite_sources ORDER BY id;").fetchall()
+    source_positions = {source_id: i for i, (source_id, _, _) in enumerate(sources)}
+
+    ids = np.empty(count, dtype=np.int64)
+    source_idx = np.empty(count, dtype=np.int32)
+    offsets = np.empty((count, 2), dtype=np.float32)
+    embeddings = np.lib.format.open_memmap(
+        os.path.join(tmp_path, "embeddings.npy"), mode="w+", dtype=dtype, shape=(count, db.embedding_dimension())
+    )
+
+    cursor = db.db.execute("SELECT id, source_idx, offsets FROM hoplite_embeddings ORDER BY id;")
+    pos = 0
+
+    while rows := cursor.fetchmany(SEARCH_BLOCK_SIZE):
+        end = pos + len(rows)
+        ids[pos:end] = [r[0] for r in rows]
+        source_idx[pos:end] = [source_positions[r[1]] for r in rows]
+        offsets[pos:end] = [sqlite_usearch_impl.deserialize_embedding(r[2], db.offset_dtype) for r in rows]
+        embeddings[pos:end] = db.get_embeddings(ids[pos:end])[1]
+        pos = end
+
+    embeddings.flush()
+    del embeddings
+
+    np.save(os.path.join(tmp_path, "ids.npy"), ids)
+    np.save(os.path.join(tmp_path, "source_idx.npy"), source_idx)
+    np.save(os.path.join(tmp_path, "offsets.npy"), offsets)
+
+    with open(os.path.join(tmp_path, SNAPSHOT_INFO_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "count": count,
+                "max_id": max_id,
+                "dtype": str(np.dtype(dtype)),
+                "metadata": json.loads(db.get_metadata(None).to_json()),
+                "sources": [[dataset, source] for _, dataset, source in sources],
+            },
+            f,
+        )
+
+    # Replace the old snapshot, readers that still map it keep their copy
+    if os.path.exists(path):
+        old_path = path + ".old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    else:
+        os.replace(tmp_path, path)
+
+    return EmbeddingSnapshot(path)
+
+
+def refresh_snapshot(db: sqlite_usearch_impl.SQLiteUsearchDB, path: str | None = None):
+    """Returns an up to date snapshot of the database, recreating it if the database has changed.
+
+    Args:
+        db: The database.
+        path: The snapshot folder. Defaults to SNAPSHOT_DIR inside the database directory.
+
+    Returns:
+        The EmbeddingSnapshot.
+    """
+    if path is None:
+        path = os.path.join(db.db_path, SNAPSHOT_DIR)
+
+    if os.path.exists(os.path.join(path, SNAPSHOT_INFO_FILENAME)):
+        snapshot = EmbeddingSnapshot(path)
+
+        if snapshot.is_current(db):
+            return snapshot
+
+    return create_snapshot(db, path)
+
 
 def cosine_sim(a, b):
-    if a.ndim == 2:
-        return np.array([cosine_sim(a[i], b) for i in range(a.shape[0])])
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+    return np.dot(a, b) / (np.linalg.norm(a, axis=-1) * np.linalg.norm(b))
 
 
 def euclidean_scoring(a, b):
-    if a.ndim == 2:
-        return np.array([euclidean_scoring(a[i], b) for i in range(a.shape[0])])
-    return euclidean(a, b)
+    return np.linalg.norm(a - b, axis=-1)
 
 
 def euclidean_scoring_inverse(a, b):
     return -euclidean_scoring(a, b)
 
 
+def prepare_queries(queries, score_function: str):
+    """Converts the query embeddings into the form expected by score_block.
+
+    Args:
+        queries: Query embeddings, one per row.
+        score_function: "cosine", "dot" or "euclidean".
+
+    Returns:
+        The queries as float32 matrix, normalized to unit length for cosine similarity.
+    """
+    queries = np.array(queries, dtype=np.float32, ndmin=2)
+
+    if score_function == "cosine":
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), np.finfo(np.float32).tiny)
+
+    return queries
+
+
+def score_block(block, queries, score_function: str):
+    """Scores a block of embeddings against all queries with one matrix product.
+
+    Args:
+        block: Embeddings, one per row.
+        queries: Queries prepared with prepare_queries.
+        score_function: "cosine", "dot" or "euclidean".
+
+    Returns:
+        Matrix of shape (number of queries, number of embeddings), higher scores are more similar.
+        For euclidean the score is the negative distance.
+    """
+    block = np.asarray(block, dtype=np.float32)
+
+    if score_function == "cosine":
+        block = block / np.maximum(np.linalg.norm(block, axis=1, keepdims=True), np.finfo(np.float32).tiny)
+
+        return queries @ block.T
+
+    if score_function == "dot":
+        return queries @ block.T
+
+    if score_function == "euclidean":
+        sq_dist = np.einsum("ij,ij->i", queries, queries)[:, None] + np.einsum("ij,ij->i", block, block)[None, :]
+        sq_dist -= 2 * (queries @ block.T)
+
+        return -np.sqrt(np.maximum(sq_dist, 0, out=sq_dist), out=sq_dist)
+
+    raise ValueError("Invalid score function. Choose 'cosine', 'euclidean' or 'dot'.")
+
+
+def top_k(ids, scores, k: int):
+    """Selects the k highest scores of every query.
+
+    Args:
+        ids: Embedding ids, either one row for all queries or one row per query.
+        scores: Score matrix of shape (number of queries, number of embeddings).
+        k: Number of scores to keep per query.
+
+    Returns:
+        Tuple (ids, scores) of shape (number of queries, min(k, number of embeddings)), unsorted.
+    """
+    ids = np.broadcast_to(ids, scores.shape)
+
+    if scores.shape[1] <= k:
+        return ids, scores
+
+    idx = np.argpartition(scores, -k, axis=1)[:, -k:]
+
+    return np.take_along_axis(ids, idx, axis=1), np.take_along_axis(scores, idx, axis=1)
+
+
+def search_blocks(queries, load_block, num_blocks: int, n_results: int, score_function: str):
+    """Finds the best matching embeddings of every query by scanning all blocks.
+
+    The blocks are loaded and scored in SEARCH_THREADS threads.
+
+    Args:
+        queries: Query embeddings, one per row.
+        load_block: Function returning (ids, embeddings) of the block with the given index.
+        num_blocks: Number of blocks.
+        n_results: Number of results to keep per query.
+        score_function: "cosine", "dot" or "euclidean".
+
+    Returns:
+        Tuple (ids, scores) with the n_results best matches per query.
+    """
+    queries = prepare_queries(queries, score_function)
+
+    def scan(i):
+        ids, block = load_block(i)
+
+        return top_k(ids, score_block(block, queries, score_function), n_results)
+
+    best_ids = np.empty((len(queries), 0), dtype=np.int64)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+
+    with ThreadPoolExecutor(max_workers=SEARCH_THREADS) as executor:
+        for ids, scores in executor.map(scan, range(num_blocks)):
+            best_ids, best_scores = top_k(
+                np.concatenate((best_ids, ids), axis=1), np.concatenate((best_scores, scores), axis=1), n_results
+            )
+
+    return best_ids, best_scores
+
+
+def aggregate_search_results(ids, scores, n_results: int, score_function: str):
+    """Averages the per query matches over all queries.
+
+    An embedding that is not among the matches of a query counts as 0 for that query.
+
+    Args:
+        ids: Matched embedding ids, one row per query.
+        scores: Scores of the matches as returned by search_blocks.
+        n_results: Number of results to return.
+        score_function: "cosine", "dot" or "euclidean".
+
+    Returns:
+        List of SearchResult, best first. For euclidean the score is the mean distance.
+    """
+    unique_ids, inverse = np.unique(ids, return_inverse=True)
+    mean_scores = np.bincount(inverse.ravel(), weights=scores.ravel(), minlength=len(unique_ids)) / len(ids)
+    order = np.argsort(-mean_scores, kind="stable")[:n_results]
+
+    if score_function == "euclidean":
+        mean_scores = -mean_scores
+
+    return [SearchResult(int(unique_ids[i]), float(mean_scores[i])) for i in order]
+
+
 def get_query_embedding(queryfile_path):
     """
     Extracts the embedding for a query file. Reads only the first 3 seconds
@@ -66,46 +363,108 @@ def get_search_results(
     cfg.SAMPLE_CROP_MODE = crop_mode
     cfg.SIG_OVERLAP = max(0.0, min(2.9, float(crop_overlap)))
 
+    if score_function not in ("cosine", "dot", "euclidean"):
+        raise ValueError("Invalid score function. Choose 'cosine', 'euclidean' or 'dot'.")
+
     # Get query embedding
     query_embeddings = get_query_embedding(queryfile_path)
 
-    # Set score function
-    if score_function == "cosine":
-        score_fn = cosine_sim
-    elif score_function == "dot":
-        score_fn = np.dot
-    elif score_function == "euclidean":
-        score_fn = euclidean_scoring_inverse  # TODO: this is a bit hacky since the search function expects the score to be high for similar embeddings
-    else:
-        raise ValueError("Invalid score function. Choose 'cosine', 'euclidean' or 'dot'.")
-
     db_embeddings_count = db.count_embeddings()
 
     if n_results > db_embeddings_count - 1:
         n_results = db_embeddings_count - 1
 
-    scores_by_embedding_id = {}
+    if n_results < 1:
+        return []
+
+    # Scan the memory-mapped snapshot if possible
+    if isinstance(db, EmbeddingSnapshot):
+        snapshot = db
+    else:
+        try:
+            snapshot = refresh_snapshot(db)
+        except OSError as ex:
+            print(f"Cannot write embedding snapshot, searching the database instead: {ex}", flush=True)
+            snapshot = None
+
+    if snapshot is not None:
+        load_block = snapshot.get_block
+        num_blocks = -(-snapshot.count_embeddings() // SEARCH_BLOCK_SIZE)
+    else:
+        # Commit the DB, since we are about to create views in multiple threads.
+        db.commit()
+        embedding_ids = db.get_embedding_ids()
+        local = threading.local()
+
+        def load_block(i):
+            if not hasattr(local, "db"):
+                local.db = db.thread_split()
+
+            return local.db.get_embeddings(embedding_ids[i * SEARCH_BLOCK_SIZE : (i + 1) * SEARCH_BLOCK_SIZE])
+
+        num_blocks = -(-len(embedding_ids) // SEARCH_BLOCK_SIZE)
 
-    for embedding in query_embeddings:
-        results, scores = brutalism.threaded_brute_search(db, embedding, n_results, score_fn)
-        sorted_results = results.search_results
+    ids, scores = search_blocks(query_embeddings, load_block, num_blocks, n_results, score_function)
 
-        if score_function == "euclidean":
-            for result in sorted_results:
-                result.sort_score *= -1
+    return aggregate_search_results(ids, scores, n_results, score_function)
 
-        for result in sorted_results:
-            if result.embedding_id not in scores_by_embedding_id:
-                scores_by_embedding_id[result.embedding_id] = []
-            scores_by_embedding_id[result.embedding_id].append(result.sort_score)
 
-    results = []
+def export_segments(segments, output_path: str | None = None):
+    """Exports audio segments as WAV files.
 
-    for embedding_id, scores in scores_by_embedding_id.items():
-        results.append(SearchResult(embedding_id, np.sum(scores) / len(query_embeddings)))
+    Segments of the same audio file are read in one go, the files are processed in parallel.
 
-    reverse = score_function != "euclidean"
+    Args:
+        segments: List of (audio file, offset, duration, output file name) tuples.
+        output_path: Folder to write the files to. If None, the files are returned as bytes instead.
+
+    Returns:
+        A list with the path of every written file, or a (file name, WAV bytes) tuple if no output path is given.
+    """
+    segments_by_file = {}
+
+    for i, (afile, offset, duration, name) in enumerate(segments):
+        segments_by_file.setdefault(afile, []).append((i, offset, duration, name))
+
+    exported = [None] * len(segments)
+
+    def export_file(item):
+        afile, file_segments = item
+        sigs, rate = audio.read_audio_segments(afile, [(offset, duration) for _, offset, duration, _ in file_segments])
+
+        for (i, _, _, name), sig in zip(file_segments, sigs):
+            if output_path is None:
+                exported[i] = (name, audio.encode_signal(sig, rate))
+            else:
+                exported[i] = os.path.join(output_path, name)
+                audio.save_signal(sig, exported[i], rate)
+
+    with ThreadPoolExecutor(max_workers=EXPORT_THREADS) as executor:
+        list(executor.map(export_file, segments_by_file.items()))
+
+    return exported
+
+
+def export_search_results(results, db, audio_speed: float, output_path: str | None = None):
+    """Exports the audio of search results as WAV files.
+
+    Args:
+        results: List of SearchResult.
+        db: The database or snapshot the results come from.
+        audio_speed: The audio speed of the database.
+        output_path: Folder to write the files to. If None, the files are returned as bytes instead.
+
+    Returns:
+        See export_segments.
+    """
+    segments = []
 
-    results.sort(key=lambda x: x.sort_score, reverse=reverse)
+    for r in results:
+        embedding_source = db.get_embedding_source(r.embedding_id)
+        file = embedding_source.source_id
+        filebasename = os.path.splitext(os.path.basename(file))[0]
+        offset = float(embedding_source.offsets[0]) * audio_speed
+        duration = cfg.SIG_LENGTH * audio_speed
+        segments.append((file, offset, duration, f"{r.sort_score:.5f}_{filebasename}_{offset}_{offset + duration}.wav"))
 
-    return results[0:n_results]
+    return export_segments(segments, output_path)
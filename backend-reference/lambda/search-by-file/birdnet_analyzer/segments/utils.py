@@ -4,17 +4,22 @@ Can be used to save the segments of the audio files for each detection.
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
 import birdnet_analyzer.audio as audio
 import birdnet_analyzer.config as cfg
+import birdnet_analyzer.discovery as discovery
 import birdnet_analyzer.utils as utils
 
 # Set numpy random seed
 np.random.seed(cfg.RANDOM_SEED)
 SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))
 
+# Number of segment files written at the same time
+WRITE_THREADS = 4
+
 
 def detect_rtype(line: str):
     """Detects the type of result file.
@@ -64,7 +69,9 @@ def get_header_mapping(line: str) -> dict:
     return mapping
 
 
-def parse_folders(apath: str, rpath: str, allowed_result_filetypes: list[str] = ["txt", "csv"]) -> list[dict]:
+def parse_folders(
+    apath: str, rpath: str, allowed_result_filetypes: list[str] = ["txt", "csv", "parquet"]
+) -> list[dict]:
     """Read audio and result files.
 
     Reads all audio files and BirdNET output inside directory recursively.
@@ -92,21 +99,21 @@ def parse_folders(apath: str, rpath: str, allowed_result_filetypes: list[str] =
     elif os.path.exists(os.path.join(rpath, cfg.OUTPUT_KALEIDOSCOPE_FILENAME)):
         rfile = os.path.join(rpath, cfg.OUTPUT_KALEIDOSCOPE_FILENAME)
         data["combined"] = {"isCombinedFile": True, "result": rfile}
+    elif os.path.exists(os.path.join(rpath, cfg.OUTPUT_PARQUET_FILENAME)):
+        rfile = os.path.join(rpath, cfg.OUTPUT_PARQUET_FILENAME)
+        data["combined"] = {"isCombinedFile": True, "result": rfile}
     else:
-        # Get all audio files
-        for root, _, files in os.walk(apath):
-            for f in files:
-                if f.rsplit(".", 1)[-1].lower() in cfg.ALLOWED_FILETYPES and not f.startswith("."):
-                    table_key = os.path.join(root.strip(apath), f.rsplit(".", 1)[0])
-                    data[table_key] = {"audio": os.path.join(root, f), "result": ""}
+        # Get all audio files, keyed by their path relative to the audio folder without extension
+        for f in sorted(discovery.iter_audio_files(apath)):
+            table_key = os.path.relpath(f, apath).rsplit(".", 1)[0]
+            data[table_key] = {"audio": f, "result": ""}
 
         # Get all result files
-        for root, _, files in os.walk(rpath):
-            for f in files:
-                if f.rsplit(".", 1)[-1] in allowed_result_filetypes and ".BirdNET." in f:
-                    table_key = os.path.join(root.strip(rpath), f.split(".BirdNET.", 1)[0])
-                    if table_key in data:
-                        data[table_key]["result"] = os.path.join(root, f)
+        for f in discovery.iter_files(rpath, allowed_result_filetypes, pattern=".BirdNET."):
+            table_key = os.path.relpath(f, rpath).split(".BirdNET.", 1)[0]
+
+            if table_key in data:
+                data[table_key]["result"] = f
 
     # Convert to list
     flist = [f for f in data.values() if f["result"]]
@@ -192,6 +199,41 @@ def parse_files(flist: list[dict], max_segments=100):
     return flist
 
 
+def find_segments_from_parquet(rfile: str, afile: str | None = None) -> list[dict]:
+    """Extracts the segments from a Parquet result file.
+
+    Args:
+        rfile (str): Path to the result file.
+        afile (str, optional): Path to the audio file. If None, the path stored in the result file is used.
+
+    Returns:
+        list[dict]: A list of dicts in the form of
+        {"audio": afile, "start": start, "end": end, "species": species, "confidence": confidence}
+    """
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(rfile, columns=["file", "start", "end", "common", "confidence"])
+
+    # Keep detections with high enough confidence
+    table = table.filter(pc.greater_equal(table["confidence"], cfg.MIN_CONFIDENCE))
+    rows = table.to_pydict()
+
+    return [
+        {
+            "audio": afile if afile else f.replace("/", os.sep).replace("\\", os.sep),
+            "start": start,
+            "end": end,
+            "species": species,
+            "confidence": confidence,
+        }
+        for f, start, end, species, confidence in zip(
+            rows["file"], rows["start"], rows["end"], rows["common"], rows["confidence"], strict=True
+        )
+        if species.lower() != "nocall"
+    ]
+
+
 def find_segments_from_combined(rfile: str) -> list[dict]:
     """Extracts the segments from a combined results file
 
@@ -202,6 +244,9 @@ def find_segments_from_combined(rfile: str) -> list[dict]:
         list[dict]: A list of dicts in the form of
         {"audio": afile, "start": start, "end": end, "species": species, "confidence": confidence}
     """
+    if rfile.endswith(".parquet"):
+        return find_segments_from_parquet(rfile)
+
     segments: list[dict] = []
 
     # Open and parse result file
@@ -269,6 +314,9 @@ def find_segments(afile: str, rfile: str):
         A list of dicts in the form of
         {"audio": afile, "start": start, "end": end, "species": species, "confidence": confidence}
     """
+    if rfile.endswith(".parquet"):
+        return find_segments_from_parquet(rfile, afile)
+
     segments: list[dict] = []
 
     # Open and parse result file
@@ -346,49 +394,67 @@ def extract_segments(item: tuple[tuple[str, list[dict]], float, dict[str]]):
     print(f"Extracting segments from {afile}")
 
     try:
-        # Open audio file
-        sig, rate = audio.open_audio_file(afile, cfg.SAMPLE_RATE, speed=cfg.AUDIO_SPEED)
+        # Get audio file length from header
+        file_length, _ = audio.get_audio_file_info(afile)
     except Exception as ex:
         print(f"Error: Cannot open audio file {afile}", flush=True)
         utils.write_error_log(ex)
 
         return
 
-    # Extract segments
+    rate = cfg.SAMPLE_RATE
+    sig_length = int(np.ceil(file_length * rate / cfg.AUDIO_SPEED))
+    windows = []
+
+    # Get segment windows
     for seg_cnt, seg in enumerate(segments, 1):
-        try:
-            # Get start and end times
-            start = int((seg["start"] * rate) / cfg.AUDIO_SPEED)
-            end = int((seg["end"] * rate) / cfg.AUDIO_SPEED)
-
-            offset = max(0, ((seg_length * rate) - (end - start)) // 2)
-            start = max(0, start - offset)
-            end = min(len(sig), end + offset)
-
-            # Make sure segment is long enough
-            if end > start:
-                # Get segment raw audio from signal
-                seg_sig = sig[int(start) : int(end)]
-
-                # Make output path
-                outpath = os.path.join(cfg.OUTPUT_PATH, seg["species"])
-                os.makedirs(outpath, exist_ok=True)
-
-                # Save segment
-                seg_name = "{:.3f}_{}_{}_{:.1f}s_{:.1f}s.wav".format(
-                    seg["confidence"],
-                    seg_cnt,
-                    seg["audio"].rsplit(os.sep, 1)[-1].rsplit(".", 1)[0],
-                    seg["start"],
-                    seg["end"],
-                )
-                seg_path = os.path.join(outpath, seg_name)
-                audio.save_signal(seg_sig, seg_path, rate)
-
-        except Exception as ex:
-            # Write error log
-            print(f"Error: Cannot extract segments from {afile}.", flush=True)
-            utils.write_error_log(ex)
-            return False
+        # Get start and end times
+        start = int((seg["start"] * rate) / cfg.AUDIO_SPEED)
+        end = int((seg["end"] * rate) / cfg.AUDIO_SPEED)
+
+        offset = max(0, ((seg_length * rate) - (end - start)) // 2)
+        start = max(0, start - offset)
+        end = min(sig_length, end + offset)
+
+        # Make sure segment is long enough
+        if end > start:
+            windows.append((seg_cnt, seg, int(start), int(end)))
+
+    def save_segment(window, seg_sig):
+        seg_cnt, seg, _, _ = window
+
+        # Make output path
+        outpath = os.path.join(cfg.OUTPUT_PATH, seg["species"])
+        os.makedirs(outpath, exist_ok=True)
+
+        # Save segment
+        seg_name = "{:.3f}_{}_{}_{:.1f}s_{:.1f}s.wav".format(
+            seg["confidence"],
+            seg_cnt,
+            seg["audio"].rsplit(os.sep, 1)[-1].rsplit(".", 1)[0],
+            seg["start"],
+            seg["end"],
+        )
+        seg_path = os.path.join(outpath, seg_name)
+        audio.save_signal(seg_sig, seg_path, rate)
+
+    # Extract segments
+    try:
+        # Read only the segments from the audio file
+        seg_sigs, rate = audio.read_audio_segments(
+            afile,
+            [(start * cfg.AUDIO_SPEED / rate, (end - start) * cfg.AUDIO_SPEED / rate) for _, _, start, end in windows],
+            rate,
+            cfg.AUDIO_SPEED,
+        )
+
+        with ThreadPoolExecutor(max_workers=WRITE_THREADS) as executor:
+            list(executor.map(save_segment, windows, seg_sigs))
+
+    except Exception as ex:
+        # Write error log
+        print(f"Error: Cannot extract segments from {afile}.", flush=True)
+        utils.write_error_log(ex)
+        return False
 
     return True
@@ -7,6 +7,7 @@ import traceback
 from pathlib import Path
 
 import birdnet_analyzer.config as cfg
+import birdnet_analyzer.discovery as discovery
 
 SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))
 FROZEN = getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS")
@@ -103,16 +104,22 @@ def spectrogram_from_audio(s, sr, fig_num=None, fig_size=None):
     return librosa.display.specshow(S_db, ax=ax, n_fft=1024, hop_length=512).figure
 
 
-def collect_audio_files(path: str, max_files: int = None):
+def collect_audio_files(path: str, max_files: int = None, index_path: str = None):
     """Collects all audio files in the given directory.
 
     Args:
         path: The directory to be searched.
+        max_files: If set, stops after this many files were found. The directory tree is then walked
+            in os.walk order with a single thread, so the same files are returned on every call.
+            The directory index is not used in this case.
+        index_path: Path to a directory index file, see discovery.iter_files.
 
     Returns:
         A sorted list of all audio files in the directory.
     """
-    # Get all files in directory with os.walk
+    if not max_files:
+        return sorted(discovery.iter_audio_files(path, index_path=index_path))
+
     files = []
 
     for root, _, flist in os.walk(path):
@@ -120,7 +127,7 @@ def collect_audio_files(path: str, max_files: int = None):
             if not f.startswith(".") and f.rsplit(".", 1)[-1].lower() in cfg.ALLOWED_FILETYPES:
                 files.append(os.path.join(root, f))
 
-                if max_files and len(files) >= max_files:
+                if len(files) >= max_files:
                     return sorted(files)
 
     return sorted(files)
@@ -132,19 +139,12 @@ def collect_all_files(path: str, filetypes: list[str], pattern: str = ""):
     Args:
         path: The directory to be searched.
         filetypes: A list of filetypes to be collected.
+        pattern: If set, only files with this string in their name are collected.
 
     Returns:
         A sorted list of all files in the directory.
     """
-
-    files = []
-
-    for root, _, flist in os.walk(path):
-        for f in flist:
-            if not f.startswith(".") and f.rsplit(".", 1)[-1].lower() in filetypes and (pattern in f or not pattern):
-                files.append(os.path.join(root, f))
-
-    return sorted(files)
+    return sorted(discovery.iter_files(path, filetypes, pattern))
 
 
 def read_lines(path: str):
@@ -176,87 +176,244 @@ def list_subdirectories(path: str):
     return filter(lambda el: os.path.isdir(os.path.join(path, el)), os.listdir(path))
 
 
-def save_to_cache(path, x_train, y_train, x_test, y_test, labels):
+def get_preprocessing_params():
+    """Returns all settings that change the training embeddings.
+
+    Returns:
+        A dict with the bandpass, speed, cropping and model settings.
+    """
+    return {
+        "fmin": cfg.BANDPASS_FMIN,
+        "fmax": cfg.BANDPASS_FMAX,
+        "audio_speed": cfg.AUDIO_SPEED,
+        "crop_mode": cfg.SAMPLE_CROP_MODE,
+        "overlap": cfg.SIG_OVERLAP,
+        "sig_length": cfg.SIG_LENGTH,
+        "sig_minlen": cfg.SIG_MINLEN,
+        "model_version": cfg.MODEL_VERSION,
+        "model": os.path.basename(cfg.MODEL_PATH),
+    }
+
+
+def get_cache_data_dir(path):
+    """Returns the folder holding the arrays of a training cache.
+
+    Args:
+        path: Path to the JSON header of the cache.
+
+    Returns:
+        The folder next to the header, named after it.
+    """
+    return os.path.splitext(path)[0] + "_data"
+
+
+def _append_npy(path, arr):
+    """Appends rows to a .npy file without rewriting the existing data.
+
+    The row count in the header is updated in place. numpy reserves room in the
+    header for that, if it still does not fit the file is rewritten.
+
+    Args:
+        path: Path to the .npy file.
+        arr: The rows to append, must match the stored row shape.
+    """
+    import io
+
+    import numpy as np
+    from numpy.lib import format as npformat
+
+    with open(path, "r+b") as fh:
+        version = npformat.read_magic(fh)
+        read_header = npformat.read_array_header_1_0 if version == (1, 0) else npformat.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(fh)
+        data_offset = fh.tell()
+
+        arr = np.ascontiguousarray(arr, dtype=dtype)
+
+        if fortran_order or arr.shape[1:] != shape[1:]:
+            raise ValueError(f"Cannot append {arr.shape} rows to {path} with shape {shape}.")
+
+        header = {
+            "descr": npformat.dtype_to_descr(dtype),
+            "fortran_order": False,
+            "shape": (shape[0] + arr.shape[0],) + shape[1:],
+        }
+        write_header = npformat.write_array_header_1_0 if version == (1, 0) else npformat.write_array_header_2_0
+        buffer = io.BytesIO()
+        write_header(buffer, header)
+
+        if buffer.tell() == data_offset:
+            fh.seek(0, os.SEEK_END)
+            fh.write(arr.tobytes())
+            fh.seek(0)
+            fh.write(buffer.getvalue())
+            return
+
+    merged = np.concatenate([np.load(path), arr])
+    np.save(path, merged)
+
+
+def _load_cache_array(path):
+    """Opens a cache array copy-on-write memory-mapped.
+
+    Changes to the returned array stay in memory and never touch the cache.
+    Empty arrays cannot be mapped and are loaded normally.
+
+    Args:
+        path: Path to the .npy file.
+
+    Returns:
+        The array.
+    """
+    import numpy as np
+
+    try:
+        return np.load(path, mmap_mode="c")
+    except ValueError:
+        return np.load(path)
+
+
+def save_to_cache(path, x_train, y_train, x_test, y_test, labels, append=False):
     """Saves training data to cache.
 
+    The cache consists of a JSON header at `path` and one .npy file per array
+    in the folder returned by get_cache_data_dir(), so it can be memory-mapped
+    when loading. With append=True the samples are added to an existing cache
+    with the same preprocessing settings. Their labels have to be a subset
+    of the cached labels and are mapped onto the cached label order.
+
     Args:
-        path: Path to the cache file.
+        path: Path to the cache header file.
         x_train: Training samples.
         y_train: Training labels.
         x_test: Test samples.
         y_test: Test labels.
         labels: Labels.
+        append: Add to an existing cache instead of replacing it.
     """
+    import json
+
     import numpy as np
 
-    # Make directory if needed
-    directory = os.path.dirname(path)
-    if directory and not os.path.exists(directory):
-        os.makedirs(directory)
-
-    # Save cache file with training data, test data, labels and configuration
-    np.savez(
-        path,
-        x_train=x_train,
-        y_train=y_train,
-        x_test=x_test,
-        y_test=y_test,
-        labels=np.array(labels, dtype=object),
-        binary_classification=cfg.BINARY_CLASSIFICATION,
-        multi_label=cfg.MULTI_LABEL,
-        fmin=cfg.BANDPASS_FMIN,
-        fmax=cfg.BANDPASS_FMAX,
-        audio_speed=cfg.AUDIO_SPEED,
-        crop_mode=cfg.SAMPLE_CROP_MODE,
-        overlap=cfg.SIG_OVERLAP,
-    )
+    data_dir = get_cache_data_dir(path)
+    arrays = {"x_train": x_train, "y_train": y_train, "x_test": x_test, "y_test": y_test}
+
+    if append and os.path.isfile(path):
+        header = load_cache_header(path)
+        cached_labels = header["labels"]
+
+        if not set(labels) <= set(cached_labels):
+            raise ValueError(f"Cannot append labels {sorted(set(labels) - set(cached_labels))} to cache {path}.")
+
+        if cfg.MULTI_LABEL and not header["multi_label"]:
+            raise ValueError(f"Cannot append multi-label data to single-label cache {path}.")
+
+        columns = [cached_labels.index(label) for label in labels]
+
+        for name in ("y_train", "y_test"):
+            y = np.asarray(arrays[name], dtype=np.float32)
+
+            if len(y):
+                remapped = np.zeros((len(y), len(cached_labels)), dtype=np.float32)
+                remapped[:, columns] = y
+                arrays[name] = remapped
+
+        for name, arr in arrays.items():
+            arr = np.asarray(arr, dtype=np.float32)
+
+            if not len(arr):
+                continue
+
+            array_path = os.path.join(data_dir, name + ".npy")
+
+            if len(_load_cache_array(array_path)):
+                _append_npy(array_path, arr)
+            else:
+                np.save(array_path, arr)
+
+        return
+
+    os.makedirs(data_dir, exist_ok=True)
+
+    for name, arr in arrays.items():
+        np.save(os.path.join(data_dir, name + ".npy"), np.asarray(arr, dtype=np.float32))
+
+    # Header last, so a cache is only valid once all arrays are written
+    header = {
+        "labels": list(labels),
+        "binary_classification": cfg.BINARY_CLASSIFICATION,
+        "multi_label": cfg.MULTI_LABEL,
+        "params": get_preprocessing_params(),
+    }
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(header, f, indent=2)
+
+
+def load_cache_header(path):
+    """Reads the header of a training cache and checks its settings.
+
+    Args:
+        path: Path to the cache header file.
+
+    Returns:
+        The header dict.
+
+    Raises:
+        ValueError: If the file is not a cache header or was created with
+            other preprocessing settings than the current ones.
+    """
+    import json
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            header = json.load(f)
+    except UnicodeDecodeError as e:
+        raise ValueError(f"{path} is not a training cache. Old .npz caches have to be created again.") from e
+
+    params = get_preprocessing_params()
+    mismatches = [
+        f"{key}: cache={header['params'].get(key)}, current={value}"
+        for key, value in params.items()
+        if header["params"].get(key) != value
+    ]
+
+    if mismatches:
+        raise ValueError(
+            f"Cache preprocessing parameters of {path} don't match current settings ({'; '.join(mismatches)})."
+        )
+
+    return header
 
 
 def load_from_cache(path):
     """Loads training data from cache.
 
+    The arrays are memory-mapped copy-on-write, so only the parts that are
+    used are read from disk.
+
     Args:
-        path: Path to the cache file.
+        path: Path to the cache header file.
 
     Returns:
-        A tuple of (x_train, y_train, labels, binary_classification, multi_label).
+        A tuple of (x_train, y_train, x_test, y_test, labels, binary_classification, multi_label).
     """
-    import numpy as np
+    header = load_cache_header(path)
+    data_dir = get_cache_data_dir(path)
+
+    x_train, y_train, x_test, y_test = (
+        _load_cache_array(os.path.join(data_dir, name + ".npy")) for name in ("x_train", "y_train", "x_test", "y_test")
+    )
 
-    # Load cache file
-    data = np.load(path, allow_pickle=True)
-
-    # Check if cache contains needed preprocessing parameters
-    if "fmin" in data and "fmax" in data and "audio_speed" in data and "crop_mode" in data and "overlap" in data:
-        # Check if preprocessing parameters match current settings
-        if (
-            data["fmin"] != cfg.BANDPASS_FMIN
-            or data["fmax"] != cfg.BANDPASS_FMAX
-            or data["audio_speed"] != cfg.AUDIO_SPEED
-            or data["crop_mode"] != cfg.SAMPLE_CROP_MODE
-            or data["overlap"] != cfg.SIG_OVERLAP
-        ):
-            print("\t...WARNING: Cache preprocessing parameters don't match current settings!", flush=True)
-            print(f"\t   Cache: fmin={data['fmin']}, fmax={data['fmax']}, speed={data['audio_speed']}", flush=True)
-            print(f"\t   Cache: crop_mode={data['crop_mode']}, overlap={data['overlap']}", flush=True)
-            print(
-                f"\t   Current: fmin={cfg.BANDPASS_FMIN}, fmax={cfg.BANDPASS_FMAX}, speed={cfg.AUDIO_SPEED}", flush=True
-            )
-            print(f"\t   Current: crop_mode={cfg.SAMPLE_CROP_MODE}, overlap={cfg.SIG_OVERLAP}", flush=True)
-
-    # Extract and return data
-    x_train = data["x_train"]
-    y_train = data["y_train"]
-
-    # Handle test data which might not be in older cache files
-    x_test = data.get("x_test", np.array([]))
-    y_test = data.get("y_test", np.array([]))
-
-    labels = data["labels"]
-    binary_classification = bool(data.get("binary_classification", False))
-    multi_label = bool(data.get("multi_label", False))
-
-    return x_train, y_train, x_test, y_test, labels, binary_classification, multi_label
+    return (
+        x_train,
+        y_train,
+        x_test,
+        y_test,
+        header["labels"],
+        header["binary_classification"],
+        header["multi_label"],
+    )
 
 
 def clear_error_log():
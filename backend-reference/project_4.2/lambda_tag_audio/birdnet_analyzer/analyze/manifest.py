@@ -0,0 +1,202 @@
+"""Run manifest that makes batch analysis resumable.
+
+The manifest is an SQLite database in the output directory with one row per analyzed file.
+It records the size and modification time of the file, a hash of the analysis parameters,
+the status of the analysis, the audio duration, the analysis time and the result files.
+A file is only analyzed again if it changed, the parameters changed, its results are missing,
+or its last analysis did not finish.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import birdnet_analyzer.config as cfg
+
+# Settings that change the results of a file
+RESULT_PARAMS = (
+    "MODEL_PATH",
+    "CUSTOM_CLASSIFIER",
+    "LABELS",
+    "TRANSLATED_LABELS",
+    "CODES",
+    "SPECIES_LIST",
+    "APPLY_SIGMOID",
+    "SIGMOID_SENSITIVITY",
+    "MIN_CONFIDENCE",
+    "SAMPLE_RATE",
+    "SIG_LENGTH",
+    "SIG_OVERLAP",
+    "SIG_MINLEN",
+    "BANDPASS_FMIN",
+    "BANDPASS_FMAX",
+    "AUDIO_SPEED",
+    "FILE_SPLITTING_DURATION",
+    "LATITUDE",
+    "LONGITUDE",
+    "WEEK",
+    "TOP_N",
+    "MERGE_CONSECUTIVE",
+    "RESULT_TYPES",
+)
+
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_ERROR = "error"
+
+# Hash of the current settings and the values it was computed from
+_PARAMS_HASH: str | None = None
+_PARAMS_HASH_SOURCES: tuple | None = None
+
+# Open connection, keyed by the database path and the process, connections must not be shared with forked workers
+_CONNECTION: sqlite3.Connection | None = None
+_CONNECTION_KEY: tuple | None = None
+
+
+def get_params_hash():
+    """Returns a hash of all settings that change the results of a file.
+
+    The hash is computed again only if one of the settings was replaced.
+    """
+    global _PARAMS_HASH, _PARAMS_HASH_SOURCES
+
+    sources = tuple(getattr(cfg, name, None) for name in RESULT_PARAMS)
+
+    if _PARAMS_HASH is None or any(a is not b for a, b in zip(sources, _PARAMS_HASH_SOURCES)):
+        params = {
+            name: sorted(value) if isinstance(value, set) else value for name, value in zip(RESULT_PARAMS, sources)
+        }
+        _PARAMS_HASH = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        _PARAMS_HASH_SOURCES = sources
+
+    return _PARAMS_HASH
+
+
+def _get_connection():
+    """Returns the connection to the manifest of the current output path, creating the database if needed."""
+    global _CONNECTION, _CONNECTION_KEY
+
+    path = os.path.join(cfg.OUTPUT_PATH, cfg.ANALYSIS_MANIFEST_FILENAME)
+    key = (path, os.getpid())
+
+    if _CONNECTION is None or _CONNECTION_KEY != key:
+        if _CONNECTION is not None and _CONNECTION_KEY[1] == key[1]:
+            _CONNECTION.close()
+
+        os.makedirs(cfg.OUTPUT_PATH, exist_ok=True)
+
+        # Several worker processes write to the same manifest
+        _CONNECTION = sqlite3.connect(path, timeout=60)
+        _CONNECTION.execute("PRAGMA journal_mode=WAL")
+        _CONNECTION.execute(
+            """CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime_ns INTEGER,
+                params_hash TEXT,
+                status TEXT,
+                audio_duration REAL,
+                analysis_time REAL,
+                result_files TEXT,
+                updated REAL
+            )"""
+        )
+        _CONNECTION.commit()
+        _CONNECTION_KEY = key
+
+    return _CONNECTION
+
+
+def close():
+    """Closes the connection of this process, if any."""
+    global _CONNECTION, _CONNECTION_KEY
+
+    if _CONNECTION is not None and _CONNECTION_KEY[1] == os.getpid():
+        _CONNECTION.close()
+
+    _CONNECTION = None
+    _CONNECTION_KEY = None
+
+
+def _get_file_state(fpath: str):
+    """Returns the absolute path, size and modification time of a file."""
+    stat = os.stat(fpath)
+
+    return os.path.abspath(fpath), stat.st_size, stat.st_mtime_ns
+
+
+def get_completed_results(fpath: str, result_file_names: dict[str, str]):
+    """Returns the result files of a file if they are complete and up to date.
+
+    Args:
+        fpath: Path to the audio file.
+        result_file_names: The result files the file would be analyzed into.
+
+    Returns:
+        The result files if the file and the parameters did not change since the file was
+        analyzed into the same result files, and all of them exist. None otherwise.
+    """
+    try:
+        path, size, mtime_ns = _get_file_state(fpath)
+        row = (
+            _get_connection()
+            .execute(
+                "SELECT size, mtime_ns, params_hash, status, result_files FROM files WHERE path = ?",
+                (path,),
+            )
+            .fetchone()
+        )
+    except (sqlite3.Error, OSError):
+        # Without a readable manifest the file is simply analyzed again
+        return None
+
+    if row is None or row[:4] != (size, mtime_ns, get_params_hash(), STATUS_DONE):
+        return None
+
+    result_files = json.loads(row[4])
+
+    if result_files != result_file_names or not all(os.path.exists(f) for f in result_files.values()):
+        return None
+
+    return result_files
+
+
+def record(
+    fpath: str,
+    status: str,
+    audio_duration: float | None = None,
+    analysis_time: float | None = None,
+    result_files: dict[str, str] | None = None,
+):
+    """Records the status of a file and commits it right away.
+
+    Args:
+        fpath: Path to the audio file.
+        status: One of STATUS_RUNNING, STATUS_DONE and STATUS_ERROR.
+        audio_duration: Duration of the audio file in seconds.
+        analysis_time: Duration of the analysis in seconds.
+        result_files: The result files of the file.
+    """
+    try:
+        path, size, mtime_ns = _get_file_state(fpath)
+    except OSError:
+        path, size, mtime_ns = os.path.abspath(fpath), None, None
+
+    connection = _get_connection()
+    connection.execute(
+        "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            path,
+            size,
+            mtime_ns,
+            get_params_hash(),
+            status,
+            audio_duration,
+            analysis_time,
+            json.dumps(result_files) if result_files is not None else None,
+            time.time(),
+        ),
+    )
+    connection.commit()
@@ -1,14 +1,29 @@
 """Module containing audio helper functions."""
 
+import io
+import shutil
+import subprocess
+from functools import lru_cache
+
 import librosa
 import numpy as np
 import soundfile as sf
-from scipy.signal import firwin, kaiserord, lfilter, find_peaks
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import butter, find_peaks, firwin, kaiserord, oaconvolve, sosfilt
 
 import birdnet_analyzer.config as cfg
 
 RANDOM = np.random.RandomState(cfg.RANDOM_SEED)
 
+# Number of samples filtered at a time by the in-place filters
+FILTER_BLOCK_SIZE = 1 << 20
+
+# Segments closer than this many seconds are read in one go
+READ_MERGE_GAP = 1.0
+
+# Seconds read around segments that are resampled, so the filter has no edges inside the segment
+RESAMPLE_MARGIN = 0.1
+
 
 def open_audio_file(path: str, sample_rate=48000, offset=0.0, duration=None, fmin=None, fmax=None, speed=1.0):
     """Open an audio file.
@@ -43,12 +58,236 @@ def open_audio_file(path: str, sample_rate=48000, offset=0.0, duration=None, fmi
 
     # Bandpass filter
     if fmin is not None and fmax is not None:
-        sig = bandpass(sig, rate, fmin, fmax)
-        # sig = bandpassKaiserFIR(sig, rate, fmin, fmax)
+        sig = bandpass(sig, rate, fmin, fmax, inplace=True)
+        # sig = bandpass_kaiser_fir(sig, rate, fmin, fmax, inplace=True)
 
     return sig, rate
 
 
+class AudioSource:
+    """An audio file that is opened once and read in consecutive windows.
+
+    Duration and native sample rate come from the file header. Formats supported by soundfile
+    are read with seeks, all others are decoded once as a stream with audioread, so reading
+    the windows of a file one after another never decodes anything twice.
+    Windows are read and processed like open_audio_file does.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._stream = None
+
+        try:
+            self._file = sf.SoundFile(path)
+            self.sample_rate = self._file.samplerate
+            self.duration = self._file.frames / self.sample_rate
+        except RuntimeError:
+            import audioread
+
+            self._file = audioread.audio_open(path)
+            self.sample_rate = self._file.samplerate
+            self.duration = self._file.duration
+            self._stream = iter(self._file)
+            self._channels = self._file.channels
+
+            # Decoded frames not read yet and the index of the first one
+            self._buffer = np.empty((0, self._channels), dtype="float32")
+            self._position = 0
+
+    def _read_stream(self, start, frames):
+        """Reads frames from the decoded stream, which can only move forward."""
+        if start < self._position:
+            raise ValueError(f"Cannot read {self.path} backwards.")
+
+        parts = [self._buffer]
+        first = self._position
+        end = first + len(self._buffer)
+
+        while end < start + frames:
+            block = next(self._stream, None)
+
+            if block is None:
+                break
+
+            data = librosa.util.buf_to_float(block, n_bytes=2, dtype="float32").reshape(-1, self._channels)
+
+            if end + len(data) <= start:
+                # Drop blocks before the window
+                parts, first = [], end + len(data)
+            else:
+                parts.append(data)
+
+            end += len(data)
+
+        data = np.concatenate(parts) if parts else self._buffer[:0]
+        window = data[start - first : start - first + frames]
+        self._buffer = data[start - first + len(window) :]
+        self._position = start + len(window)
+
+        return window
+
+    def read(self, offset=0.0, duration=None):
+        """Reads a window of the mono signal at the native sample rate.
+
+        Args:
+            offset: The starting offset in seconds.
+            duration: Maximum duration of the window in seconds, None reads to the end.
+
+        Returns:
+            The float32 signal of the window.
+        """
+        start = int(offset * self.sample_rate)
+
+        if self._stream is None:
+            if start != self._file.tell():
+                self._file.seek(min(start, self._file.frames))
+
+            frames = int(duration * self.sample_rate) if duration is not None else -1
+            data = self._file.read(frames, dtype="float32", always_2d=True)
+        else:
+            frames = int(duration * self.sample_rate) if duration is not None else np.iinfo(np.int64).max - start
+            data = self._read_stream(start, frames)
+
+        return data.mean(axis=1) if data.shape[1] > 1 else data[:, 0]
+
+    def read_signal(self, offset=0.0, duration=None, sample_rate=48000, fmin=None, fmax=None, speed=1.0):
+        """Reads a window and processes it like open_audio_file.
+
+        Args:
+            offset: The starting offset in seconds.
+            duration: Maximum duration of the window in seconds.
+            sample_rate: The sample rate at which the window should be processed.
+            fmin: Minimum frequency for bandpass filter.
+            fmax: Maximum frequency for bandpass filter.
+            speed: Speed factor for audio playback.
+
+        Returns:
+            Returns the audio time series and the sampling rate.
+        """
+        sig = self.read(offset, duration)
+        orig_sr = self.sample_rate if speed == 1.0 else int(self.sample_rate * speed)
+
+        if orig_sr != sample_rate:
+            sig = librosa.resample(sig, orig_sr=orig_sr, target_sr=sample_rate, res_type="kaiser_fast")
+
+        # Bandpass filter
+        if fmin is not None and fmax is not None:
+            sig = bandpass(sig, sample_rate, fmin, fmax, inplace=True)
+
+        return sig, sample_rate
+
+    def close(self):
+        """Closes the file."""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_windows_soundfile(path: str, windows, rate):
+    """Reads (start frame, number of frames) windows with soundfile seeks."""
+    sigs = []
+
+    with sf.SoundFile(path) as f:
+        for start, frames in windows:
+            f.seek(min(start, f.frames))
+            data = f.read(frames, dtype="float32", always_2d=True)
+            sigs.append(data.mean(axis=1) if data.shape[1] > 1 else data[:, 0])
+
+    return sigs
+
+
+def _read_windows_ffmpeg(path: str, windows, rate):
+    """Reads (start frame, number of frames) windows by letting ffmpeg seek in the compressed stream."""
+    sigs = []
+
+    for start, frames in windows:
+        # fmt: off
+        cmd = [
+            "ffmpeg", "-v", "error", "-ss", f"{start / rate:.6f}", "-i", path, "-t", f"{frames / rate:.6f}",
+            "-f", "f32le", "-ac", "1", "-ar", str(rate), "-",
+        ]
+        # fmt: on
+        output = subprocess.run(cmd, capture_output=True, check=True).stdout
+        sigs.append(np.frombuffer(output, dtype="float32")[:frames].copy())
+
+    return sigs
+
+
+def _read_windows_librosa(path: str, windows, rate):
+    """Decodes the whole file once and slices the (start frame, number of frames) windows."""
+    sig, _ = librosa.load(path, sr=None, mono=True)
+
+    return [sig[start : start + frames] for start, frames in windows]
+
+
+def read_audio_segments(path: str, segments, sample_rate=None, speed=1.0):
+    """Reads several segments of an audio file.
+
+    Segments that are close to each other are merged into one read window.
+    The windows are read with soundfile seeks, or with ffmpeg seeks if soundfile cannot open the file.
+    Without ffmpeg the file is decoded once with librosa. Only the read windows are resampled.
+
+    Args:
+        path: Path to the audio file.
+        segments: List of (offset, duration) tuples in seconds.
+        sample_rate: The sample rate of the returned segments. None keeps the native sample rate.
+        speed: Speed factor for audio playback, only applied if a sample rate is given.
+
+    Returns:
+        A list with the mono signal of every segment and the sampling rate.
+    """
+    try:
+        rate = sf.info(path).samplerate
+        read_windows = _read_windows_soundfile
+    except RuntimeError:
+        rate = get_sample_rate(path)
+        read_windows = _read_windows_ffmpeg if shutil.which("ffmpeg") else _read_windows_librosa
+
+    resample = bool(sample_rate) and (sample_rate != rate or speed != 1.0)
+    margin = int(RESAMPLE_MARGIN * rate) if resample else 0
+    frames = [(int(offset * rate), int(duration * rate)) for offset, duration in segments]
+
+    # Merge segments into read windows
+    windows = []
+    window_index = [0] * len(segments)
+
+    for i in sorted(range(len(frames)), key=lambda i: frames[i][0]):
+        start, end = max(0, frames[i][0] - margin), sum(frames[i]) + margin
+
+        if windows and start <= windows[-1][1] + int(READ_MERGE_GAP * rate):
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            windows.append([start, end])
+
+        window_index[i] = len(windows) - 1
+
+    window_sigs = read_windows(path, [(start, end - start) for start, end in windows], rate)
+
+    # Resample windows
+    ratio = 1.0
+
+    if resample:
+        orig_sr = int(rate * speed)
+        ratio = sample_rate / orig_sr
+        window_sigs = [
+            librosa.resample(sig, orig_sr=orig_sr, target_sr=sample_rate, res_type="kaiser_fast") for sig in window_sigs
+        ]
+        rate = sample_rate
+
+    # Cut segments from windows
+    sigs = []
+
+    for (start, length), w in zip(frames, window_index):
+        first = int(round((start - windows[w][0]) * ratio))
+        sigs.append(window_sigs[w][first : first + int(round(length * ratio))])
+
+    return sigs, rate
+
+
 def get_audio_file_length(path):
     """
     Get the length of an audio file in seconds.
@@ -64,6 +303,22 @@ def get_audio_file_length(path):
     return librosa.get_duration(filename=path, sr=None)
 
 
+def get_audio_file_info(path: str):
+    """
+    Get the length and native sample rate of an audio file.
+
+    Reads only the file header.
+
+    Args:
+        path (str): The file path to the audio file.
+
+    Returns:
+        tuple[float, int]: The duration in seconds and the sample rate of the audio file.
+    """
+    with AudioSource(path) as source:
+        return source.duration, source.sample_rate
+
+
 def get_sample_rate(path: str):
     """
     Get the sample rate of an audio file.
@@ -91,6 +346,22 @@ def save_signal(sig, fname: str, rate=48000):
     sf.write(fname, sig, rate, "PCM_16")
 
 
+def encode_signal(sig, rate=48000):
+    """Encodes a signal as WAV file in memory.
+
+    Args:
+        sig: The signal to be encoded.
+        rate: The sampling rate.
+
+    Returns:
+        The bytes of the WAV file.
+    """
+    buffer = io.BytesIO()
+    sf.write(buffer, sig, rate, "PCM_16", format="WAV")
+
+    return buffer.getvalue()
+
+
 def pad(sig, seconds, srate, amount=None):
     """Creates a noise vector with the given shape.
 
@@ -126,20 +397,19 @@ def pad(sig, seconds, srate, amount=None):
     return sig
 
 
-def split_signal(sig, rate, seconds, overlap, minlen, amount=None):
-    """Split signal with overlap.
+def _get_split_geometry(size, rate, seconds, overlap, minlen):
+    """Computes the chunk layout used by split_signal.
 
     Args:
-        sig: The original signal to be split.
+        size: Number of samples in the signal.
         rate: The sampling rate.
         seconds: The duration of a segment.
         overlap: The overlapping seconds of segments.
         minlen: Minimum length of a split.
 
     Returns:
-        A list of splits.
+        A tuple (chunksize, stepsize, number of chunks).
     """
-
     # Split signal to chunks of duration with overlap, whereas each chunk still has minimum duration of signal
     if rate is None or rate <= 0:
         rate = cfg.SAMPLE_RATE
@@ -160,34 +430,131 @@ def split_signal(sig, rate, seconds, overlap, minlen, amount=None):
     minsize = int(rate * minlen)
 
     # Start of last chunk
-    lastchunkpos = int((sig.size - chunksize + stepsize - 1) / stepsize) * stepsize
+    lastchunkpos = int((size - chunksize + stepsize - 1) / stepsize) * stepsize
     # Make sure at least one chunk is returned
     if lastchunkpos < 0:
         lastchunkpos = 0
     # Omit last chunk if minimum signal duration is underrun
-    elif sig.size - lastchunkpos < minsize:
+    elif size - lastchunkpos < minsize:
         lastchunkpos = lastchunkpos - stepsize
 
-    # Append noise or empty signal of chunk duration, so all splits have desired length
+    return chunksize, stepsize, max(0, lastchunkpos // stepsize + 1)
+
+
+def _get_split_padding(sig, chunksize, amount=None):
+    """Creates the noise or empty signal that is appended to the last chunks.
+
+    Args:
+        sig: The original signal to be split.
+        chunksize: Number of samples per chunk.
+        amount: The noise intensity.
+
+    Returns:
+        A numpy array of chunk length.
+    """
     if not cfg.USE_NOISE:
-        noise = np.zeros(shape=chunksize, dtype=sig.dtype)
+        return np.zeros(shape=chunksize, dtype=sig.dtype)
+
+    # Random noise intensity
+    if amount is None:
+        amount = RANDOM.uniform(0.1, 0.5)
+
+    # Create Gaussian noise
+    try:
+        return RANDOM.normal(loc=sig.min() * amount, scale=sig.max() * amount, size=chunksize).astype(sig.dtype)
+    except:
+        return np.zeros(shape=chunksize, dtype=sig.dtype)
+
+
+def split_signal(sig, rate, seconds, overlap, minlen, amount=None):
+    """Split signal with overlap.
+
+    The splits are a read-only strided view of the signal. Only if the last chunk
+    runs past the end of the signal, the signal is copied once with the missing
+    samples padded.
+
+    Args:
+        sig: The original signal to be split.
+        rate: The sampling rate.
+        seconds: The duration of a segment.
+        overlap: The overlapping seconds of segments.
+        minlen: Minimum length of a split.
+
+    Returns:
+        A numpy array of shape (number of splits, split length).
+    """
+    sig = np.asarray(sig)
+    chunksize, stepsize, num_chunks = _get_split_geometry(sig.size, rate, seconds, overlap, minlen)
+    padding = _get_split_padding(sig, chunksize, amount)
+
+    if num_chunks == 0:
+        return np.empty((0, chunksize), dtype=sig.dtype)
+
+    # Append noise or empty signal, so all splits have desired length
+    padsize = (num_chunks - 1) * stepsize + chunksize - sig.size
+
+    if padsize > 0:
+        data = np.empty(sig.size + padsize, dtype=sig.dtype)
+        data[: sig.size] = sig
+        data[sig.size :] = padding[:padsize]
     else:
-        # Random noise intensity
-        if amount is None:
-            amount = RANDOM.uniform(0.1, 0.5)
-        # Create Gaussian noise
-        try:
-            noise = RANDOM.normal(loc=min(sig) * amount, scale=max(sig) * amount, size=chunksize).astype(sig.dtype)
-        except:
-            noise = np.zeros(shape=chunksize, dtype=sig.dtype)
-    data = np.concatenate((sig, noise))
+        data = sig
 
     # Split signal with overlap
-    sig_splits = []
-    for i in range(0, 1 + lastchunkpos, stepsize):
-        sig_splits.append(data[i : i + chunksize])
+    return sliding_window_view(data, chunksize)[::stepsize][:num_chunks]
+
+
+def iter_signal_batches(sig, rate, seconds, overlap, minlen, batch_size, amount=None):
+    """Split signal with overlap and yield the splits in batches.
+
+    Yields the same splits as split_signal, but copies them batch by batch into a single
+    contiguous float32 buffer instead of padding the whole signal. The buffer is reused,
+    so every batch has to be consumed before the next one is requested.
+
+    Args:
+        sig: The original signal to be split.
+        rate: The sampling rate.
+        seconds: The duration of a segment.
+        overlap: The overlapping seconds of segments.
+        minlen: Minimum length of a split.
+        batch_size: Maximum number of splits per batch.
+        amount: The noise intensity.
+
+    Yields:
+        A float32 numpy array of shape (number of splits in batch, split length).
+    """
+    sig = np.asarray(sig)
+    chunksize, stepsize, num_chunks = _get_split_geometry(sig.size, rate, seconds, overlap, minlen)
+    padding = _get_split_padding(sig, chunksize, amount)
+
+    if num_chunks == 0:
+        return
+
+    # Chunks that lie completely within the signal
+    num_full = min(num_chunks, (sig.size - chunksize) // stepsize + 1) if sig.size >= chunksize else 0
+    frames = sliding_window_view(sig, chunksize)[::stepsize] if num_full else None
+
+    buffer = np.empty((min(batch_size, num_chunks), chunksize), dtype="float32")
+
+    for batch_start in range(0, num_chunks, batch_size):
+        batch_end = min(num_chunks, batch_start + batch_size)
+        batch = buffer[: batch_end - batch_start]
+
+        # Copy full chunks
+        full_end = min(batch_end, num_full)
+
+        if full_end > batch_start:
+            batch[: full_end - batch_start] = frames[batch_start:full_end]
 
-    return sig_splits
+        # Pad the remaining chunks
+        for i in range(max(batch_start, num_full), batch_end):
+            row = batch[i - batch_start]
+            pos = i * stepsize
+            n = max(0, sig.size - pos)
+            row[:n] = sig[pos:]
+            row[n:] = padding[: chunksize - n]
+
+        yield batch
 
 
 def crop_center(sig, rate, seconds):
@@ -278,48 +645,144 @@ def smart_crop_signal(sig, rate, sig_length, sig_overlap, sig_minlen):
     return peak_splits
 
 
-def bandpass(sig, rate, fmin, fmax, order=5):
+def _get_band(fmin, fmax):
+    """Returns the filter type needed for the given frequency range.
+
+    Args:
+        fmin (float): The minimum frequency.
+        fmax (float): The maximum frequency.
+
+    Returns:
+        str | None: "high", "low", "band" or None if no filtering is needed.
+    """
+    # Check if we have to bandpass at all
+    if fmin == cfg.SIG_FMIN and fmax == cfg.SIG_FMAX or fmin > fmax:
+        return None
+
+    # Highpass?
+    if fmin > cfg.SIG_FMIN and fmax == cfg.SIG_FMAX:
+        return "high"
+
+    # Lowpass?
+    if fmin == cfg.SIG_FMIN and fmax < cfg.SIG_FMAX:
+        return "low"
+
+    # Bandpass?
+    if fmin > cfg.SIG_FMIN and fmax < cfg.SIG_FMAX:
+        return "band"
+
+    return None
+
+
+@lru_cache(maxsize=32)
+def get_butter_sos(rate, fmin, fmax, order=5):
+    """
+    Designs a Butterworth filter as float32 second-order sections.
+
+    Results are cached, so the filter is designed only once per (rate, fmin, fmax, order).
+
+    Args:
+        rate (int): The sampling rate of the signal.
+        fmin (float): The minimum frequency for the filter.
+        fmax (float): The maximum frequency for the filter.
+        order (int, optional): The order of the filter. Default is 5.
+
+    Returns:
+        numpy.ndarray | None: The second-order sections or None if no filtering is needed.
+    """
+    btype = _get_band(fmin, fmax)
+
+    if btype is None:
+        return None
+
+    nyquist = 0.5 * rate
+    cutoff = {"high": fmin / nyquist, "low": fmax / nyquist, "band": [fmin / nyquist, fmax / nyquist]}[btype]
+    sos = butter(order, cutoff, btype=btype, output="sos")
+
+    return sos.astype("float32")
+
+
+@lru_cache(maxsize=32)
+def get_kaiser_fir_taps(rate, fmin, fmax, width=0.02, stopband_attenuation_db=100):
+    """
+    Designs a Kaiser window FIR filter with float32 taps.
+
+    Results are cached, so the filter is designed only once per set of arguments.
+
+    Args:
+        rate (int): The sample rate of the signal.
+        fmin (float): The minimum frequency of the filter.
+        fmax (float): The maximum frequency of the filter.
+        width (float, optional): The transition width of the filter. Default is 0.02.
+        stopband_attenuation_db (float, optional): The desired attenuation in the stopband, in decibels. Default is 100.
+
+    Returns:
+        numpy.ndarray | None: The filter taps or None if no filtering is needed.
+    """
+    btype = _get_band(fmin, fmax)
+
+    if btype is None:
+        return None
+
+    nyquist = 0.5 * rate
+
+    # Calculate the order and Kaiser parameter for the desired specifications.
+    N, beta = kaiserord(stopband_attenuation_db, width)
+
+    if btype == "high":
+        taps = firwin(N, fmin / nyquist, window=("kaiser", beta), pass_zero=False)
+    elif btype == "low":
+        taps = firwin(N, fmax / nyquist, window=("kaiser", beta), pass_zero=True)
+    else:
+        taps = firwin(N, [fmin / nyquist, fmax / nyquist], window=("kaiser", beta), pass_zero=False)
+
+    return taps.astype("float32")
+
+
+def _as_float32(sig, inplace):
+    """Returns the signal as float32 array, reusing its memory only if inplace is set and possible."""
+    sig = np.asarray(sig)
+
+    if inplace and sig.dtype == np.float32 and sig.flags.writeable:
+        return sig, True
+
+    return sig.astype("float32"), False
+
+
+def bandpass(sig, rate, fmin, fmax, order=5, inplace=False):
     """
     Apply a bandpass filter to the input signal.
 
+    The filter is applied as cascaded second-order sections in float32.
+
     Args:
         sig (numpy.ndarray): The input signal to be filtered.
         rate (int): The sampling rate of the input signal.
         fmin (float): The minimum frequency for the bandpass filter.
         fmax (float): The maximum frequency for the bandpass filter.
         order (int, optional): The order of the filter. Default is 5.
+        inplace (bool, optional): Overwrite the input signal block by block, if it is a writable float32 array.
 
     Returns:
         numpy.ndarray: The filtered signal as a float32 array.
     """
-    # Check if we have to bandpass at all
-    if fmin == cfg.SIG_FMIN and fmax == cfg.SIG_FMAX or fmin > fmax:
-        return sig
+    sos = get_butter_sos(rate, fmin, fmax, order)
 
-    from scipy.signal import butter, lfilter
+    if sos is None:
+        return sig
 
-    nyquist = 0.5 * rate
+    sig, inplace = _as_float32(sig, inplace)
 
-    # Highpass?
-    if fmin > cfg.SIG_FMIN and fmax == cfg.SIG_FMAX:
-        low = fmin / nyquist
-        b, a = butter(order, low, btype="high")
-        sig = lfilter(b, a, sig)
+    if not inplace:
+        return sosfilt(sos, sig)
 
-    # Lowpass?
-    elif fmin == cfg.SIG_FMIN and fmax < cfg.SIG_FMAX:
-        high = fmax / nyquist
-        b, a = butter(order, high, btype="low")
-        sig = lfilter(b, a, sig)
+    # Carry the filter state from block to block
+    zi = np.zeros((sos.shape[0], 2), dtype=np.float32)
 
-    # Bandpass?
-    elif fmin > cfg.SIG_FMIN and fmax < cfg.SIG_FMAX:
-        low = fmin / nyquist
-        high = fmax / nyquist
-        b, a = butter(order, [low, high], btype="band")
-        sig = lfilter(b, a, sig)
+    for i in range(0, len(sig), FILTER_BLOCK_SIZE):
+        sig[i : i + FILTER_BLOCK_SIZE], zi = sosfilt(sos, sig[i : i + FILTER_BLOCK_SIZE], zi=zi)
 
-    return sig.astype("float32")
+    return sig
 
 
 # Raven is using Kaiser window FIR filter, so we try to emulate it.
@@ -328,9 +791,12 @@ def bandpass(sig, rate, fmin, fmax, order=5):
 # the Nyquist frequency and a default stop band attenuation of 100 dB.
 # For a complete description of this method, see Discrete-Time Signal Processing
 # (Second Edition), by Alan Oppenheim, Ronald Schafer, and John Buck, Prentice Hall 1998, pp. 474-476.
-def bandpass_kaiser_fir(sig, rate, fmin, fmax, width=0.02, stopband_attenuation_db=100):
+def bandpass_kaiser_fir(sig, rate, fmin, fmax, width=0.02, stopband_attenuation_db=100, inplace=False):
     """
     Applies a bandpass filter to the given signal using a Kaiser window FIR filter.
+
+    The taps are long, so the filter is applied by FFT convolution.
+
     Args:
         sig (numpy.ndarray): The input signal to be filtered.
         rate (int): The sample rate of the input signal.
@@ -338,35 +804,28 @@ def bandpass_kaiser_fir(sig, rate, fmin, fmax, width=0.02, stopband_attenuation_
         fmax (float): The maximum frequency of the bandpass filter.
         width (float, optional): The transition width of the filter. Default is 0.02.
         stopband_attenuation_db (float, optional): The desired attenuation in the stopband, in decibels. Default is 100.
+        inplace (bool, optional): Overwrite the input signal block by block, if it is a writable float32 array.
     Returns:
         numpy.ndarray: The filtered signal as a float32 numpy array.
     """
-    # Check if we have to bandpass at all
-    if fmin == cfg.SIG_FMIN and fmax == cfg.SIG_FMAX or fmin > fmax:
-        return sig
+    taps = get_kaiser_fir_taps(rate, fmin, fmax, width, stopband_attenuation_db)
 
-    nyquist = 0.5 * rate
-
-    # Calculate the order and Kaiser parameter for the desired specifications.
-    N, beta = kaiserord(stopband_attenuation_db, width)
+    if taps is None:
+        return sig
 
-    # Highpass?
-    if fmin > cfg.SIG_FMIN and fmax == cfg.SIG_FMAX:
-        low = fmin / nyquist
-        taps = firwin(N, low, window=("kaiser", beta), pass_zero=False)
+    sig, inplace = _as_float32(sig, inplace)
 
-    # Lowpass?
-    elif fmin == cfg.SIG_FMIN and fmax < cfg.SIG_FMAX:
-        high = fmax / nyquist
-        taps = firwin(N, high, window=("kaiser", beta), pass_zero=True)
+    if not inplace:
+        # Apply the filter to the signal, keeping the causal part like lfilter does.
+        return oaconvolve(sig, taps)[: len(sig)]
 
-    # Bandpass?
-    elif fmin > cfg.SIG_FMIN and fmax < cfg.SIG_FMAX:
-        low = fmin / nyquist
-        high = fmax / nyquist
-        taps = firwin(N, [low, high], window=("kaiser", beta), pass_zero=False)
+    # Overlap-save: every block is convolved with the preceding len(taps) - 1 input samples
+    history = np.zeros(len(taps) - 1, dtype=np.float32)
 
-    # Apply the filter to the signal.
-    sig = lfilter(taps, 1.0, sig)
+    for i in range(0, len(sig), FILTER_BLOCK_SIZE):
+        block = sig[i : i + FILTER_BLOCK_SIZE]
+        x = np.concatenate((history, block))
+        history = x[len(x) - len(history) :].copy()
+        block[:] = oaconvolve(x, taps, mode="valid")
 
-    return sig.astype("float32")
+    return sig
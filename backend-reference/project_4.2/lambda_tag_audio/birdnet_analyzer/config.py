@@ -113,17 +113,26 @@ USE_NOISE: bool = False
 # Specifies the output format. 'table' denotes a Raven selection table,
 # 'audacity' denotes a TXT file with the same format as Audacity timeline labels
 # 'csv' denotes a generic CSV file with start, end, species and confidence.
+# 'parquet' denotes a Parquet file with typed columns (requires pyarrow).
 RESULT_TYPES: set[str] | list[str] = {"table"}
 OUTPUT_RAVEN_FILENAME: str = "BirdNET_SelectionTable.txt"  # this is for combined Raven selection tables only
 # OUTPUT_RTABLE_FILENAME: str = "BirdNET_RTable.csv"
 OUTPUT_KALEIDOSCOPE_FILENAME: str = "BirdNET_Kaleidoscope.csv"
 OUTPUT_CSV_FILENAME: str = "BirdNET_CombinedTable.csv"
+OUTPUT_PARQUET_FILENAME: str = "BirdNET_CombinedTable.parquet"
 
 # File name of the settings csv for batch analysis
 ANALYSIS_PARAMS_FILENAME: str = "BirdNET_analysis_params.csv"
 
-# Whether to skip existing results in the output path
-# If set to False, existing files will not be overwritten
+# File name of the manifest in the output path that keeps track of analyzed files
+# None disables the manifest, batch runs enable it with --manifest
+ANALYSIS_MANIFEST_FILENAME: str | None = None
+DEFAULT_ANALYSIS_MANIFEST_FILENAME: str = "BirdNET_analysis_manifest.sqlite"
+
+# Whether to skip files that have already been analyzed
+# With the manifest, files are only skipped if they and the settings did not change since,
+# without it, if all result files exist
+# If set to False, existing files will be overwritten
 SKIP_EXISTING_RESULTS: bool = False
 
 COMBINE_RESULTS: bool = False
@@ -183,7 +192,11 @@ TRAINED_MODEL_SAVE_MODE: str = "replace"
 
 # Cache settings
 TRAIN_CACHE_MODE: str | None = None
-TRAIN_CACHE_FILE: str = "train_cache.npz"
+TRAIN_CACHE_FILE: str = "train_cache.json"
+
+# Folder for per-file training embeddings, keyed by file content and
+# preprocessing settings. Unchanged files are not re-embedded. None disables it.
+TRAIN_EMBEDDING_CACHE_PATH: str | None = None
 
 # Use automatic Hyperparameter tuning
 AUTOTUNE: bool = False
@@ -221,6 +234,10 @@ TRANSLATED_LABELS: list[str] = []
 SPECIES_LIST: list[str] = []
 ERROR_LOG_FILE: str = os.path.join(SCRIPT_DIR, "error_log.txt")
 FILE_LIST = []
+
+# Path to a directory index file that keeps the listings of the input folder between runs
+# If None, the input folder is listed completely on every run
+DIRECTORY_INDEX_PATH: str | None = None
 FILE_STORAGE_PATH: str = ""
 
 # Path to custom trained classifier
@@ -0,0 +1,171 @@
+"""Module to find input files in large directory trees.
+
+Directories are listed with os.scandir in a pool of threads, one task per directory, and matching
+files are yielded as soon as their directory is listed. Listings can be kept in a directory index
+file, so a directory whose modification time did not change is not listed again on the next scan.
+"""
+
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import birdnet_analyzer.config as cfg
+
+# Directories listed at the same time, os.scandir releases the GIL
+SCAN_THREADS = 16
+# Bump when the index format changes, so old index files are not used anymore
+INDEX_VERSION = 1
+
+
+def _scan_directory(dir_path: str, cached: list | None):
+    """Lists a directory.
+
+    Args:
+        dir_path: Path to the directory.
+        cached: The listing from the directory index, or None.
+
+    Returns:
+        A tuple of the directory path and its listing [mtime_ns, file names, subdirectory names],
+        or None as listing if the directory cannot be read.
+        The cached listing is returned if the modification time of the directory did not change.
+    """
+    try:
+        mtime_ns = os.stat(dir_path).st_mtime_ns
+
+        if cached is not None and cached[0] == mtime_ns:
+            return dir_path, cached
+
+        files, subdirs = [], []
+
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+
+                # Like os.walk, symlinks to directories are not followed
+                if not is_dir:
+                    files.append(entry.name)
+                elif not entry.is_symlink():
+                    subdirs.append(entry.name)
+
+        return dir_path, [mtime_ns, files, subdirs]
+    except OSError:
+        return dir_path, None
+
+
+def load_index(index_path: str):
+    """Loads a directory index.
+
+    Args:
+        index_path: Path to the index file.
+
+    Returns:
+        A dictionary of absolute directory paths and their listings,
+        empty if the file does not exist or cannot be read.
+    """
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(index, dict) or index.get("version") != INDEX_VERSION:
+        return {}
+
+    return index["directories"]
+
+
+def save_index(index_path: str, directories: dict):
+    """Saves a directory index, replacing the file only when it is complete.
+
+    Args:
+        index_path: Path to the index file.
+        directories: A dictionary of absolute directory paths and their listings.
+    """
+    if os.path.dirname(index_path):
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": INDEX_VERSION, "directories": directories}, f)
+
+    os.replace(tmp_path, index_path)
+
+
+def iter_files(
+    path: str, filetypes: list[str], pattern: str = "", index_path: str | None = None, threads: int = SCAN_THREADS
+):
+    """Yields all files of the given filetypes in a directory tree as they are found.
+
+    Hidden files are skipped. The files are not yielded in any particular order.
+
+    Args:
+        path: The directory to be searched.
+        filetypes: A list of lowercase file extensions to be collected.
+        pattern: If set, only files with this string in their name are collected.
+        index_path: Path to a directory index file. If set, unchanged directories are not listed again
+            and the index is updated after a complete scan.
+        threads: Number of directories listed at the same time.
+
+    Yields:
+        Paths of the files, joined to the given path.
+    """
+    filetypes = set(filetypes)
+    index = load_index(index_path) if index_path else {}
+    directories = {}
+
+    executor = ThreadPoolExecutor(max_workers=threads)
+
+    def submit(dir_path):
+        return executor.submit(_scan_directory, dir_path, index.get(os.path.abspath(dir_path)))
+
+    try:
+        pending = {submit(path)}
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                dir_path, listing = future.result()
+
+                if listing is None:
+                    continue
+
+                directories[os.path.abspath(dir_path)] = listing
+                _, files, subdirs = listing
+
+                for name in subdirs:
+                    pending.add(submit(os.path.join(dir_path, name)))
+
+                for name in files:
+                    if (
+                        not name.startswith(".")
+                        and name.rsplit(".", 1)[-1].lower() in filetypes
+                        and (pattern in name or not pattern)
+                    ):
+                        yield os.path.join(dir_path, name)
+    finally:
+        # Stop listing directories if the caller stopped early
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if index_path:
+        try:
+            save_index(index_path, directories)
+        except OSError as ex:
+            print(f"Could not save directory index {index_path}: {ex}", flush=True)
+
+
+def iter_audio_files(path: str, index_path: str | None = None):
+    """Yields all audio files in a directory tree as they are found.
+
+    Args:
+        path: The directory to be searched.
+        index_path: Path to a directory index file, see iter_files.
+
+    Yields:
+        Paths of the audio files.
+    """
+    yield from iter_files(path, cfg.ALLOWED_FILETYPES, index_path=index_path)
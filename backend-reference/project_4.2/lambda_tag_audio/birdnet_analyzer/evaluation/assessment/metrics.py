@@ -1,10 +1,14 @@
 """
-Module containing functions to calculate various performance metrics using scikit-learn.
+Module containing functions to calculate various performance metrics with NumPy.
 
 This script includes implementations for calculating accuracy, precision, recall, F1 score,
 average precision, and AUROC for binary and multilabel classification tasks. It supports
 various averaging methods and thresholds for predictions.
 
+Thresholded metrics are derived from the confusion counts of all classes, and AP and AUROC
+from a single sort of all classes. The results follow scikit-learn's semantics, including
+zero_division=0 and its averaging methods.
+
 Functions:
     - calculate_accuracy: Computes accuracy for binary or multilabel classification.
     - calculate_recall: Computes recall for binary or multilabel classification.
@@ -12,19 +16,19 @@ Functions:
     - calculate_f1_score: Computes the F1 score for binary or multilabel classification.
     - calculate_average_precision: Computes the average precision score (AP).
     - calculate_auroc: Computes the Area Under the Receiver Operating Characteristic curve (AUROC).
+    - get_confusion_counts: Computes TP/FP/FN/TN counts per class for a single threshold.
+    - get_threshold_counts: Computes TP/FP/FN/TN counts per class for many thresholds from a single sort.
+    - get_metric_from_counts: Derives accuracy, precision, recall or F1 from confusion counts.
+    - get_score_histograms: Counts positive and negative samples per class in score bins.
+    - get_ranking_metric_from_histograms: Derives AP or AUROC from score histograms.
+
+Confusion counts and score histograms can be summed over chunks of samples, so metrics can be
+computed for datasets that do not fit into memory.
 """
 
-from typing import Literal, Optional
+from typing import Literal, Optional, Tuple
 
 import numpy as np
-from sklearn.metrics import (
-    accuracy_score,
-    average_precision_score,
-    f1_score,
-    precision_score,
-    recall_score,
-    roc_auc_score,
-)
 
 
 def calculate_accuracy(
@@ -61,53 +65,17 @@ def calculate_accuracy(
     if predictions.shape != labels.shape:
         raise ValueError("Predictions and labels must have the same shape.")
 
-    # Handle binary and multilabel tasks separately
-    if task == "binary":
-        # Binary classification: Binarize predictions and compute accuracy
-        y_pred = (predictions >= threshold).astype(int)
-        y_true = labels.astype(int)
-        acc = accuracy_score(y_true, y_pred)
-        acc = np.array([acc])
-
-    elif task == "multilabel":
-        # Multilabel classification: Handle based on the specified averaging method
-        y_pred = (predictions >= threshold).astype(int)
-        y_true = labels.astype(int)
-
-        if averaging_method == "micro":
-            # Micro-averaging: Overall accuracy across all labels
-            correct = (y_pred == y_true).sum()
-            total = y_true.size
-            acc = correct / total if total > 0 else np.nan
-            acc = np.array([acc])
-
-        elif averaging_method == "macro":
-            # Macro-averaging: Compute accuracy per class and take the mean
-            accuracies = [accuracy_score(y_true[:, i], y_pred[:, i]) for i in range(num_classes)]
-            acc = np.mean(accuracies)
-            acc = np.array([acc])
-
-        elif averaging_method == "weighted":
-            # Weighted averaging: Weight class accuracies by class prevalence
-            accuracies, weights = [], []
-            for i in range(num_classes):
-                accuracies.append(accuracy_score(y_true[:, i], y_pred[:, i]))
-                weights.append(np.sum(y_true[:, i]))
-            acc = np.average(accuracies, weights=weights) if sum(weights) > 0 else np.array([0.0])
-            acc = np.array([acc])
-
-        elif averaging_method in [None, "none"]:
-            # No averaging: Return accuracy per class
-            acc = np.array([accuracy_score(y_true[:, i], y_pred[:, i]) for i in range(num_classes)])
-
-        else:
-            # Unsupported averaging method
-            raise ValueError(f"Invalid averaging method: {averaging_method}")
-    else:
+    if task not in ("binary", "multilabel"):
         # Unsupported task type
         raise ValueError(f"Unsupported task type: {task}")
+    if task == "multilabel" and averaging_method not in ("micro", "macro", "weighted", "none", None):
+        # Unsupported averaging method
+        raise ValueError(f"Invalid averaging method: {averaging_method}")
+
+    # Confusion counts of all classes at once
+    tp, fp, fn, tn = get_confusion_counts(predictions, labels, threshold)
 
-    return acc
+    return np.atleast_1d(get_metric_from_counts("accuracy", tp, fp, fn, tn, task, averaging_method))
 
 
 def calculate_recall(
@@ -134,7 +102,7 @@ def calculate_recall(
     Raises:
         ValueError: If inputs are invalid or unsupported task type is specified.
     """
-    # Validate inputs for size, threshold, and shape
+    # Input validation for predictions, labels, and threshold
     if predictions.size == 0 or labels.size == 0:
         raise ValueError("Predictions and labels must not be empty.")
     if not 0 <= threshold <= 1:
@@ -142,29 +110,7 @@ def calculate_recall(
     if predictions.shape != labels.shape:
         raise ValueError("Predictions and labels must have the same shape.")
 
-    # Adjust averaging method for scikit-learn if none is specified
-    averaging = None if averaging_method == "none" else averaging_method
-
-    # Compute recall based on task type
-    if task == "binary":
-        averaging = averaging or "binary"
-        y_pred = (predictions >= threshold).astype(int)
-        y_true = labels.astype(int)
-        recall = recall_score(y_true, y_pred, average=averaging, zero_division=0)
-
-    elif task == "multilabel":
-        y_pred = (predictions >= threshold).astype(int)
-        y_true = labels.astype(int)
-        recall = recall_score(y_true, y_pred, average=averaging, zero_division=0)
-
-    else:
-        # Unsupported task type
-        raise ValueError(f"Unsupported task type: {task}")
-
-    # Ensure return type is consistent
-    if isinstance(recall, np.ndarray):
-        return recall
-    return np.array([recall])
+    return _calculate_thresholded_metric("recall", predictions, labels, task, threshold, averaging_method)
 
 
 def calculate_precision(
@@ -191,7 +137,7 @@ def calculate_precision(
     Raises:
         ValueError: If inputs are invalid or unsupported task type is specified.
     """
-    # Validate inputs for size, threshold, and shape
+    # Input validation for predictions, labels, and threshold
     if predictions.size == 0 or labels.size == 0:
         raise ValueError("Predictions and labels must not be empty.")
     if not 0 <= threshold <= 1:
@@ -199,29 +145,7 @@ def calculate_precision(
     if predictions.shape != labels.shape:
         raise ValueError("Predictions and labels must have the same shape.")
 
-    # Adjust averaging method for scikit-learn if none is specified
-    averaging = None if averaging_method == "none" else averaging_method
-
-    # Compute precision based on task type
-    if task == "binary":
-        averaging = averaging or "binary"
-        y_pred = (predictions >= threshold).astype(int)
-        y_true = labels.astype(int)
-        precision = precision_score(y_true, y_pred, average=averaging, zero_division=0)
-
-    elif task == "multilabel":
-        y_pred = (predictions >= threshold).astype(int)
-        y_true = labels.astype(int)
-        precision = precision_score(y_true, y_pred, average=averaging, zero_division=0)
-
-    else:
-        # Unsupported task type
-        raise ValueError(f"Unsupported task type: {task}")
-
-    # Ensure return type is consistent
-    if isinstance(precision, np.ndarray):
-        return precision
-    return np.array([precision])
+    return _calculate_thresholded_metric("precision", predictions, labels, task, threshold, averaging_method)
 
 
 def calculate_f1_score(
@@ -248,7 +172,7 @@ def calculate_f1_score(
     Raises:
         ValueError: If inputs are invalid or unsupported task type is specified.
     """
-    # Validate inputs for size, threshold, and shape
+    # Input validation for predictions, labels, and threshold
     if predictions.size == 0 or labels.size == 0:
         raise ValueError("Predictions and labels must not be empty.")
     if not 0 <= threshold <= 1:
@@ -256,29 +180,7 @@ def calculate_f1_score(
     if predictions.shape != labels.shape:
         raise ValueError("Predictions and labels must have the same shape.")
 
-    # Adjust averaging method for scikit-learn if none is specified
-    averaging = None if averaging_method == "none" else averaging_method
-
-    # Compute F1 score based on task type
-    if task == "binary":
-        averaging = averaging or "binary"
-        y_pred = (predictions >= threshold).astype(int)
-        y_true = labels.astype(int)
-        f1 = f1_score(y_true, y_pred, average=averaging, zero_division=0)
-
-    elif task == "multilabel":
-        y_pred = (predictions >= threshold).astype(int)
-        y_true = labels.astype(int)
-        f1 = f1_score(y_true, y_pred, average=averaging, zero_division=0)
-
-    else:
-        # Unsupported task type
-        raise ValueError(f"Unsupported task type: {task}")
-
-    # Ensure return type is consistent
-    if isinstance(f1, np.ndarray):
-        return f1
-    return np.array([f1])
+    return _calculate_thresholded_metric("f1", predictions, labels, task, threshold, averaging_method)
 
 
 def calculate_average_precision(
@@ -309,28 +211,11 @@ def calculate_average_precision(
     if predictions.shape != labels.shape:
         raise ValueError("Predictions and labels must have the same shape.")
 
-    # Adjust averaging method for scikit-learn if none is specified
-    averaging = None if averaging_method == "none" else averaging_method
-
-    # Compute average precision based on task type
-    if task == "binary":
-        y_true = labels.astype(int)
-        y_scores = predictions
-        ap = average_precision_score(y_true, y_scores, average=averaging)
-
-    elif task == "multilabel":
-        y_true = labels.astype(int)
-        y_scores = predictions
-        ap = average_precision_score(y_true, y_scores, average=averaging)
-
-    else:
+    if task not in ("binary", "multilabel"):
         # Unsupported task type
         raise ValueError(f"Unsupported task type for average precision: {task}")
 
-    # Ensure return type is consistent
-    if isinstance(ap, np.ndarray):
-        return ap
-    return np.array([ap])
+    return np.atleast_1d(_average_ranking_scores("ap", predictions, labels, averaging_method))
 
 
 def calculate_auroc(
@@ -361,35 +246,427 @@ def calculate_auroc(
     if predictions.shape != labels.shape:
         raise ValueError("Predictions and labels must have the same shape.")
 
-    # Adjust averaging method for scikit-learn if none is specified
+    if task not in ("binary", "multilabel"):
+        # Unsupported task type
+        raise ValueError(f"Unsupported task type: {task}")
+
+    # Classes with only one label present get NaN
+    return np.atleast_1d(_average_ranking_scores("auroc", predictions, labels, averaging_method))
+
+
+def get_threshold_counts(
+    predictions: np.ndarray,
+    labels: np.ndarray,
+    thresholds: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute the confusion counts of every class for any number of thresholds.
+
+    The scores of each class are sorted once. The number of samples below a threshold is found
+    with a binary search and the number of positives among them is read from cumulative sums,
+    so the cost per threshold does not depend on the number of samples.
+
+    Args:
+        predictions (np.ndarray): Model predictions as probabilities, shape (samples, classes).
+        labels (np.ndarray): True labels, shape (samples, classes).
+        thresholds (np.ndarray): Thresholds to binarize probabilities, a sample is positive if its score is >= threshold.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: TP, FP, FN and TN counts, each of shape (thresholds, classes).
+
+    Raises:
+        ValueError: If inputs are invalid.
+    """
+    if predictions.size == 0 or labels.size == 0:
+        raise ValueError("Predictions and labels must not be empty.")
+    if predictions.shape != labels.shape:
+        raise ValueError("Predictions and labels must have the same shape.")
+
+    predictions = predictions.reshape(len(predictions), -1)
+    labels = labels.reshape(len(labels), -1)
+    thresholds = np.atleast_1d(np.asarray(thresholds, dtype=np.float64))
+    num_samples, num_classes = predictions.shape
+
+    # Missing scores never pass a threshold
+    scores = np.where(np.isnan(predictions), -np.inf, predictions)
+
+    # Sort each class once and count positives from the lowest score upwards
+    order = np.argsort(scores, axis=0)
+    sorted_scores = np.take_along_axis(scores, order, axis=0)
+    positives_below = np.zeros((num_samples + 1, num_classes), dtype=np.int64)
+    np.cumsum(np.take_along_axis(labels.astype(np.int64), order, axis=0), axis=0, out=positives_below[1:])
+
+    num_below = np.empty((len(thresholds), num_classes), dtype=np.int64)
+
+    for i in range(num_classes):
+        num_below[:, i] = np.searchsorted(sorted_scores[:, i], thresholds, side="left")
+
+    num_positives = positives_below[-1]
+    tp = num_positives - np.take_along_axis(positives_below, num_below, axis=0)
+    fp = num_samples - num_below - tp
+    fn = num_positives - tp
+    tn = num_below - fn
+
+    return tp, fp, fn, tn
+
+
+def _divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """
+    Divide element-wise, returning 0 where the denominator is 0 (scikit-learn's zero_division=0).
+    """
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+
+    return np.divide(numerator, denominator, out=np.zeros(np.broadcast(numerator, denominator).shape), where=denominator != 0)
+
+
+def _score_from_counts(metric: str, tp: np.ndarray, fp: np.ndarray, fn: np.ndarray) -> np.ndarray:
+    """
+    Compute precision, recall or F1 from confusion counts.
+    """
+    if metric == "precision":
+        return _divide(tp, tp + fp)
+    if metric == "recall":
+        return _divide(tp, tp + fn)
+    if metric == "f1":
+        return _divide(2 * tp, 2 * tp + fp + fn)
+
+    raise ValueError(f"Unsupported metric: {metric}")
+
+
+def get_metric_from_counts(
+    metric: Literal["accuracy", "precision", "recall", "f1"],
+    tp: np.ndarray,
+    fp: np.ndarray,
+    fn: np.ndarray,
+    tn: np.ndarray,
+    task: Literal["binary", "multilabel"],
+    averaging_method: Optional[Literal["binary", "micro", "macro", "weighted", "none"]] = None,
+) -> np.ndarray:
+    """
+    Derive a thresholded metric from confusion counts.
+
+    The results are the same as those of the calculate_* functions for the threshold the
+    counts were computed with. Counts may have any number of leading dimensions, e.g. one
+    per threshold as returned by get_threshold_counts. For a single class without averaging,
+    the scores of the negative and the positive label are returned, like in scikit-learn only
+    those of the labels that occur in the labels or predictions. With leading dimensions the
+    scores of both labels are kept, so every threshold has the same shape.
+
+    Args:
+        metric (Literal["accuracy", "precision", "recall", "f1"]): Metric to compute.
+        tp (np.ndarray): True positives, shape (..., classes).
+        fp (np.ndarray): False positives, shape (..., classes).
+        fn (np.ndarray): False negatives, shape (..., classes).
+        tn (np.ndarray): True negatives, shape (..., classes).
+        task (Literal["binary", "multilabel"]): Type of classification task.
+        averaging_method (Optional[Literal["binary", "micro", "macro", "weighted", "none"]], optional):
+            Averaging method like in the calculate_* functions. Defaults to None.
+
+    Returns:
+        np.ndarray: Metric of shape (...,) when averaged or (..., classes) otherwise.
+
+    Raises:
+        ValueError: If the task, metric or averaging method is not supported.
+    """
+    tp, fp, fn, tn = (np.asarray(count, dtype=np.int64) for count in (tp, fp, fn, tn))
+    averaging = None if averaging_method == "none" else averaging_method
+
+    if task not in ("binary", "multilabel"):
+        raise ValueError(f"Unsupported task type: {task}")
+
+    if metric == "accuracy":
+        per_class = _divide(tp + tn, tp + fp + fn + tn)
+
+        if task == "binary" or averaging == "micro":
+            # Accuracy over all predictions
+            return _divide((tp + tn).sum(axis=-1), (tp + fp + fn + tn).sum(axis=-1))
+        if averaging == "macro":
+            return per_class.mean(axis=-1)
+        if averaging == "weighted":
+            support = tp + fn
+            return _divide((per_class * support).sum(axis=-1), support.sum(axis=-1))
+        if averaging is None:
+            return per_class
+
+        raise ValueError(f"Invalid averaging method: {averaging_method}")
+
+    if task == "binary":
+        averaging = averaging or "binary"
+
+    if averaging == "binary":
+        if tp.shape[-1] != 1:
+            raise ValueError("Binary averaging requires a single class.")
+
+        return _score_from_counts(metric, tp[..., 0], fp[..., 0], fn[..., 0])
+
+    if tp.shape[-1] == 1:
+        # scikit-learn treats a single column as a binary target and
+        # runs over the negative and the positive label
+        tp, fp, fn = (
+            np.concatenate([tn, tp], axis=-1),
+            np.concatenate([fn, fp], axis=-1),
+            np.concatenate([fp, fn], axis=-1),
+        )
+        present = (tp + fp + fn) > 0
+    else:
+        present = np.ones(tp.shape, dtype=bool)
+
+    if averaging == "micro":
+        return _score_from_counts(metric, tp.sum(axis=-1), fp.sum(axis=-1), fn.sum(axis=-1))
+
+    scores = _score_from_counts(metric, tp, fp, fn)
+
+    if averaging is None:
+        return scores[present] if present.ndim == 1 else scores
+    if averaging == "macro":
+        return _divide((scores * present).sum(axis=-1), present.sum(axis=-1))
+    if averaging == "weighted":
+        support = tp + fn
+        return _divide((scores * support).sum(axis=-1), support.sum(axis=-1))
+
+    raise ValueError(f"Invalid averaging method: {averaging_method}")
+
+
+def get_confusion_counts(
+    predictions: np.ndarray,
+    labels: np.ndarray,
+    threshold: float,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute the confusion counts of every class for a single threshold.
+
+    Args:
+        predictions (np.ndarray): Model predictions as probabilities, shape (samples, classes).
+        labels (np.ndarray): True labels, shape (samples, classes).
+        threshold (float): Threshold to binarize probabilities.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: TP, FP, FN and TN counts, each of shape (classes,).
+    """
+    y_pred = predictions.reshape(len(predictions), -1) >= threshold
+    y_true = labels.reshape(len(labels), -1).astype(bool)
+
+    tp = np.count_nonzero(y_pred & y_true, axis=0)
+    num_predicted = np.count_nonzero(y_pred, axis=0)
+    fn = np.count_nonzero(y_true, axis=0) - tp
+    fp = num_predicted - tp
+    tn = len(y_pred) - num_predicted - fn
+
+    return tp, fp, fn, tn
+
+
+def _calculate_thresholded_metric(
+    metric: str,
+    predictions: np.ndarray,
+    labels: np.ndarray,
+    task: str,
+    threshold: float,
+    averaging_method: Optional[str],
+) -> np.ndarray:
+    """
+    Compute precision, recall or F1 from the confusion counts, with scikit-learn's semantics.
+    """
+    if task not in ("binary", "multilabel"):
+        # Unsupported task type
+        raise ValueError(f"Unsupported task type: {task}")
+
+    if averaging_method == "samples":
+        if task != "multilabel" or predictions.ndim != 2 or predictions.shape[1] < 2:
+            raise ValueError("Samples averaging is only supported for multilabel tasks.")
+
+        # Average the metric of each sample
+        tp, fp, fn, _ = get_confusion_counts(predictions.T, labels.T, threshold)
+
+        return np.atleast_1d(_score_from_counts(metric, tp, fp, fn).mean())
+
+    tp, fp, fn, tn = get_confusion_counts(predictions, labels, threshold)
+
+    return np.atleast_1d(get_metric_from_counts(metric, tp, fp, fn, tn, task, averaging_method))
+
+
+def _get_ranking_scores(metric: str, predictions: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    """
+    Compute the average precision or AUROC of every column from a single sort.
+
+    Tied scores form one threshold, like in scikit-learn. AUROC is NaN for columns
+    where only one label is present.
+    """
+    # One contiguous row per column, so that sorting and scans run along memory
+    num_samples = len(predictions)
+    scores = np.ascontiguousarray(predictions.reshape(num_samples, -1).T)
+    labels = np.ascontiguousarray(labels.reshape(num_samples, -1).T).astype(bool)
+
+    # Sort all columns by descending score at once
+    order = np.argsort(-scores, axis=1)
+    sorted_scores = np.take_along_axis(scores, order, axis=1)
+    sorted_labels = np.take_along_axis(labels, order, axis=1)
+
+    # First and last sample of the group of tied scores each sample belongs to
+    rows = np.broadcast_to(np.arange(num_samples), scores.shape)
+    group_start = np.ones(scores.shape, dtype=bool)
+    group_start[:, 1:] = sorted_scores[:, 1:] != sorted_scores[:, :-1]
+    group_end = np.ones(scores.shape, dtype=bool)
+    group_end[:, :-1] = group_start[:, 1:]
+    first = np.maximum.accumulate(np.where(group_start, rows, 0), axis=1)
+    last = np.minimum.accumulate(np.where(group_end, rows, num_samples - 1)[:, ::-1], axis=1)[:, ::-1]
+
+    num_positives = np.count_nonzero(sorted_labels, axis=1)
+
+    if metric == "ap":
+        # Precision at each threshold, weighted by the positives it adds
+        precision = np.cumsum(sorted_labels, axis=1) / (rows + 1)
+        precision = np.take_along_axis(precision, last, axis=1)
+
+        return _divide(np.where(sorted_labels, precision, 0).sum(axis=1), num_positives)
+
+    # Mann-Whitney statistic with tied scores sharing their average rank
+    num_negatives = num_samples - num_positives
+    ranks = num_samples - (first + last) / 2
+    rank_sum = np.where(sorted_labels, ranks, 0).sum(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        auroc = (rank_sum - num_positives * (num_positives + 1) / 2) / (num_positives * num_negatives)
+
+    return np.where((num_positives > 0) & (num_negatives > 0), auroc, np.nan)
+
+
+def _average_ranking_scores(
+    metric: str,
+    predictions: np.ndarray,
+    labels: np.ndarray,
+    averaging_method: Optional[str],
+) -> np.ndarray:
+    """
+    Average the per-class AP or AUROC like scikit-learn's multilabel averaging.
+    """
+    averaging = None if averaging_method == "none" else averaging_method
+    predictions = predictions.reshape(len(predictions), -1)
+    labels = labels.reshape(len(labels), -1)
+
+    # A single column is a binary target, so there is nothing to average
+    if predictions.shape[1] == 1:
+        return _get_ranking_scores(metric, predictions, labels)[0]
+    if averaging == "micro":
+        return _get_ranking_scores(metric, predictions.reshape(-1, 1), labels.reshape(-1, 1))[0]
+    if averaging == "samples":
+        return _get_ranking_scores(metric, predictions.T, labels.T).mean()
+
+    scores = _get_ranking_scores(metric, predictions, labels)
+
+    if averaging is None:
+        return scores
+    if averaging == "macro":
+        return scores.mean()
+    if averaging == "weighted":
+        weights = np.count_nonzero(labels, axis=0)
+
+        if weights.sum() == 0:
+            return 0.0
+
+        # Classes without weight do not affect the average, even if their score is NaN
+        return np.average(np.where(weights > 0, scores, 0), weights=weights)
+
+    raise ValueError(f"Invalid averaging method: {averaging_method}")
+
+
+def get_score_histograms(
+    predictions: np.ndarray,
+    labels: np.ndarray,
+    num_bins: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Count the positive and negative samples of every class in equal-width score bins over [0, 1].
+
+    Args:
+        predictions (np.ndarray): Model predictions as probabilities, shape (samples, classes).
+        labels (np.ndarray): True labels, shape (samples, classes).
+        num_bins (int): Number of score bins.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Positive and negative counts, each of shape (classes, num_bins).
+    """
+    predictions = predictions.reshape(len(predictions), -1)
+    num_classes = predictions.shape[1]
+
+    bins = np.clip(np.nan_to_num(predictions, nan=0.0) * num_bins, 0, num_bins - 1).astype(np.int64)
+    bins += np.arange(num_classes) * num_bins
+    y_true = labels.reshape(len(labels), -1).astype(bool)
+
+    positives = np.bincount(bins[y_true], minlength=num_classes * num_bins)
+    negatives = np.bincount(bins[~y_true], minlength=num_classes * num_bins)
+
+    return positives.reshape(num_classes, num_bins), negatives.reshape(num_classes, num_bins)
+
+
+def get_ranking_metric_from_histograms(
+    metric: Literal["ap", "auroc"],
+    positives: np.ndarray,
+    negatives: np.ndarray,
+    averaging_method: Optional[Literal["micro", "macro", "weighted", "none"]] = None,
+) -> np.ndarray:
+    """
+    Derive AP or AUROC from score histograms.
+
+    Scores in the same bin are treated as tied, so the result approximates the exact metric
+    with a resolution of one bin width.
+
+    Args:
+        metric (Literal["ap", "auroc"]): Metric to compute.
+        positives (np.ndarray): Positive counts per class and bin, shape (classes, bins).
+        negatives (np.ndarray): Negative counts per class and bin, shape (classes, bins).
+        averaging_method (Optional[Literal["micro", "macro", "weighted", "none"]], optional):
+            Averaging method like in calculate_average_precision and calculate_auroc. Defaults to None.
+
+    Returns:
+        np.ndarray: Metric of shape () when averaged or (classes,) otherwise.
+
+    Raises:
+        ValueError: If the metric or averaging method is not supported.
+    """
+    if metric not in ("ap", "auroc"):
+        raise ValueError(f"Unsupported metric: {metric}")
+
     averaging = None if averaging_method == "none" else averaging_method
 
-    try:
-        # Compute AUROC based on task type
-        if task == "binary":
-            y_true = labels.astype(int)
-            y_scores = predictions
-            auroc = roc_auc_score(y_true, y_scores)
-
-        elif task == "multilabel":
-            y_true = labels.astype(int)
-            y_scores = predictions
-            auroc = roc_auc_score(y_true, y_scores, average=averaging)
-
-        else:
-            # Unsupported task type
-            raise ValueError(f"Unsupported task type: {task}")
-
-    except ValueError as e:
-        # Handle edge cases where AUROC cannot be computed
-        if "Only one class present in y_true" in str(e):
-            auroc = np.nan
-        elif "Number of classes in y_true" in str(e):
-            auroc = np.nan
-        else:
-            raise
-
-    # Ensure return type is consistent
-    if isinstance(auroc, np.ndarray):
-        return auroc
-    return np.array([auroc])
+    def get_scores(positives, negatives):
+        num_positives = positives.sum(axis=1)
+
+        if metric == "ap":
+            # Precision at each bin from the highest scores down, weighted by its positives
+            positives, negatives = positives[:, ::-1], negatives[:, ::-1]
+            precision = _divide(np.cumsum(positives, axis=1), np.cumsum(positives + negatives, axis=1))
+
+            return _divide((positives * precision).sum(axis=1), num_positives)
+
+        # Negatives scored below each positive, counting ties in the same bin as half
+        num_negatives = negatives.sum(axis=1)
+        negatives_below = np.cumsum(negatives, axis=1) - negatives / 2
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            auroc = (positives * negatives_below).sum(axis=1) / (num_positives * num_negatives)
+
+        return np.where((num_positives > 0) & (num_negatives > 0), auroc, np.nan)
+
+    # A single class is a binary target, so there is nothing to average
+    if len(positives) == 1:
+        return get_scores(positives, negatives)[0]
+    if averaging == "micro":
+        return get_scores(positives.sum(axis=0, keepdims=True), negatives.sum(axis=0, keepdims=True))[0]
+
+    scores = get_scores(positives, negatives)
+
+    if averaging is None:
+        return scores
+    if averaging == "macro":
+        return scores.mean()
+    if averaging == "weighted":
+        weights = positives.sum(axis=1)
+
+        if weights.sum() == 0:
+            return 0.0
+
+        # Classes without weight do not affect the average, even if their score is NaN
+        return np.average(np.where(weights > 0, scores, 0), weights=weights)
+
+    raise ValueError(f"Invalid averaging method: {averaging_method}")
@@ -6,7 +6,7 @@ It includes methods to compute metrics like precision, recall, F1 score, AUROC,
 as well as utilities for generating related plots.
 """
 
-from typing import Literal, Optional, Tuple
+from typing import Dict, Iterable, Literal, Optional, Tuple
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -23,6 +23,16 @@ class PerformanceAssessor:
     and generating visualizations for binary and multilabel classification tasks.
     """
 
+    # Row labels of the metrics DataFrame
+    METRIC_LABELS = {
+        "recall": "Recall",
+        "precision": "Precision",
+        "f1": "F1",
+        "ap": "AP",
+        "auroc": "AUROC",
+        "accuracy": "Accuracy",
+    }
+
     def __init__(
         self,
         num_classes: int,
@@ -127,10 +137,7 @@ class PerformanceAssessor:
             )
 
         # Determine the averaging method for metrics
-        if per_class_metrics and self.num_classes == 1:
-            averaging_method = "macro"
-        else:
-            averaging_method = None if per_class_metrics else "macro"
+        averaging_method = self._get_averaging_method(per_class_metrics)
 
         # Dictionary to store the results of each metric
         metrics_results = {}
@@ -191,6 +198,97 @@ class PerformanceAssessor:
                 )
                 metrics_results["Accuracy"] = np.atleast_1d(result)
 
+        return self._get_metrics_dataframe(metrics_results, per_class_metrics)
+
+    def calculate_metrics_from_chunks(
+        self,
+        chunks: Iterable[Tuple[np.ndarray, np.ndarray]],
+        per_class_metrics: bool = False,
+        num_bins: int = 1000,
+    ) -> pd.DataFrame:
+        """
+        Calculate the performance metrics from chunks of predictions and labels.
+
+        Only confusion counts and, for AP and AUROC, per-class score histograms are kept between
+        chunks, so memory does not grow with the number of samples. Thresholded metrics are the same
+        as those of calculate_metrics on the concatenated chunks. AP and AUROC treat scores within
+        one of `num_bins` equal-width bins as tied.
+
+        Args:
+            chunks (Iterable[Tuple[np.ndarray, np.ndarray]]): Pairs of 2D predictions and labels,
+                e.g. from DataProcessor.iter_tensor_chunks.
+            per_class_metrics (bool): If True, compute metrics for each class individually.
+            num_bins (int): Number of score bins for AP and AUROC.
+
+        Returns:
+            pd.DataFrame: A DataFrame containing the computed metrics.
+
+        Raises:
+            TypeError: If predictions or labels are not NumPy arrays.
+            ValueError: If a chunk has invalid shapes or no samples are given.
+        """
+        num_samples = 0
+        counts = np.zeros((4, self.num_classes), dtype=np.int64)
+        use_histograms = "ap" in self.metrics_list or "auroc" in self.metrics_list
+        positives = np.zeros((self.num_classes, num_bins), dtype=np.int64)
+        negatives = np.zeros((self.num_classes, num_bins), dtype=np.int64)
+
+        for predictions, labels in chunks:
+            # Validate that predictions and labels are NumPy arrays
+            if not isinstance(predictions, np.ndarray):
+                raise TypeError("predictions must be a NumPy array.")
+            if not isinstance(labels, np.ndarray):
+                raise TypeError("labels must be a NumPy array.")
+
+            # Ensure predictions and labels have the same shape
+            if predictions.shape != labels.shape:
+                raise ValueError("predictions and labels must have the same shape.")
+            if predictions.ndim != 2:
+                raise ValueError("predictions and labels must be 2-dimensional arrays.")
+            if predictions.shape[1] != self.num_classes:
+                raise ValueError(
+                    f"The number of columns in predictions ({predictions.shape[1]}) must match num_classes ({self.num_classes})."
+                )
+
+            num_samples += len(predictions)
+            counts += metrics.get_confusion_counts(predictions, labels, self.threshold)
+
+            if use_histograms:
+                chunk_positives, chunk_negatives = metrics.get_score_histograms(predictions, labels, num_bins)
+                positives += chunk_positives
+                negatives += chunk_negatives
+
+        if num_samples == 0:
+            raise ValueError("Predictions and labels must not be empty.")
+
+        # Determine the averaging method for metrics
+        averaging_method = self._get_averaging_method(per_class_metrics)
+
+        metrics_results = {}
+
+        for metric_name in self.metrics_list:
+            if metric_name in ("ap", "auroc"):
+                result = metrics.get_ranking_metric_from_histograms(metric_name, positives, negatives, averaging_method)
+            else:
+                result = metrics.get_metric_from_counts(metric_name, *counts, self.task, averaging_method)
+
+            metrics_results[self.METRIC_LABELS[metric_name]] = np.atleast_1d(result)
+
+        return self._get_metrics_dataframe(metrics_results, per_class_metrics)
+
+    def _get_averaging_method(self, per_class_metrics: bool) -> Optional[str]:
+        """
+        Returns the averaging method for overall or per-class metrics.
+        """
+        if per_class_metrics and self.num_classes == 1:
+            return "macro"
+
+        return None if per_class_metrics else "macro"
+
+    def _get_metrics_dataframe(self, metrics_results: Dict[str, np.ndarray], per_class_metrics: bool) -> pd.DataFrame:
+        """
+        Organizes metric results into a DataFrame with one row per metric.
+        """
         # Define column names for the DataFrame
         if per_class_metrics:
             columns = self.classes if self.classes else [f"Class {i}" for i in range(self.num_classes)]
@@ -234,6 +332,80 @@ class PerformanceAssessor:
 
         return fig
 
+    def calculate_metrics_across_thresholds(
+        self,
+        predictions: np.ndarray,
+        labels: np.ndarray,
+        thresholds: Optional[np.ndarray] = None,
+        per_class_metrics: bool = False,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Calculate the threshold-dependent metrics for many thresholds at once.
+
+        The scores of each class are sorted only once and the confusion counts for all thresholds
+        are derived from cumulative sums, so even fine-grained sweeps (e.g. 1000 thresholds) are cheap.
+        The values are the same as those of calculate_metrics with the respective threshold.
+
+        Args:
+            predictions (np.ndarray): Model output predictions as a 2D NumPy array (probabilities or logits).
+            labels (np.ndarray): Ground truth labels as a 2D NumPy array.
+            thresholds (Optional[np.ndarray]): Thresholds to evaluate. Defaults to 0.05 to 0.95 in steps of 0.05.
+            per_class_metrics (bool): If True, compute metrics for each class individually.
+
+        Returns:
+            Dict[str, np.ndarray]: Metric values per metric name in metrics_list (except 'ap' and 'auroc'),
+            of shape (thresholds,) or (thresholds, classes) if per_class_metrics is True.
+
+        Raises:
+            TypeError: If predictions or labels are not NumPy arrays.
+            ValueError: If predictions and labels have mismatched dimensions or invalid shapes.
+        """
+        # Validate that predictions and labels are NumPy arrays
+        if not isinstance(predictions, np.ndarray):
+            raise TypeError("predictions must be a NumPy array.")
+        if not isinstance(labels, np.ndarray):
+            raise TypeError("labels must be a NumPy array.")
+
+        # Ensure predictions and labels have the same shape
+        if predictions.shape != labels.shape:
+            raise ValueError("predictions and labels must have the same shape.")
+        if predictions.ndim != 2:
+            raise ValueError("predictions and labels must be 2-dimensional arrays.")
+        if predictions.shape[1] != self.num_classes:
+            raise ValueError(
+                f"The number of columns in predictions ({predictions.shape[1]}) must match num_classes ({self.num_classes})."
+            )
+
+        if thresholds is None:
+            thresholds = np.arange(0.05, 1.0, 0.05)
+
+        thresholds = np.atleast_1d(np.asarray(thresholds, dtype=np.float64))
+
+        if np.any((thresholds < 0) | (thresholds > 1)):
+            raise ValueError("Thresholds must be between 0 and 1.")
+
+        # Determine the averaging method for metrics
+        averaging_method = self._get_averaging_method(per_class_metrics)
+
+        # Confusion counts of every class for every threshold
+        tp, fp, fn, tn = metrics.get_threshold_counts(predictions, labels, thresholds)
+
+        metrics_results = {}
+
+        for metric_name in self.metrics_list:
+            if metric_name in ("ap", "auroc"):
+                continue
+
+            values = metrics.get_metric_from_counts(metric_name, tp, fp, fn, tn, self.task, averaging_method)
+
+            # Binary tasks are averaged over both labels, even per class
+            if per_class_metrics and values.ndim == 1:
+                values = values[:, np.newaxis]
+
+            metrics_results[metric_name] = values
+
+        return metrics_results
+
     def plot_metrics_all_thresholds(
         self,
         predictions: np.ndarray,
@@ -254,37 +426,27 @@ class PerformanceAssessor:
         Returns:
             None
         """
-        # Save the original threshold value to restore it later
-        original_threshold = self.threshold
-
         # Define a range of thresholds for analysis
         thresholds = np.arange(0.05, 1.0, 0.05)
 
         # Exclude metrics that are not threshold-dependent
         metrics_to_plot = [m for m in self.metrics_list if m not in ["auroc", "ap"]]
 
+        # Compute metrics for all thresholds in one sweep
+        metric_values = self.calculate_metrics_across_thresholds(
+            predictions, labels, thresholds, per_class_metrics=per_class_metrics
+        )
+
         if per_class_metrics:
             # Define class names for plotting
             class_names = list(self.classes) if self.classes else [f"Class {i}" for i in range(self.num_classes)]
 
-            # Initialize a dictionary to store metric values per class
+            # Collect metric values per class
             metric_values_dict_per_class = {
-                class_name: {metric: [] for metric in metrics_to_plot} for class_name in class_names
+                class_name: {metric: metric_values[metric][:, i].tolist() for metric in metrics_to_plot}
+                for i, class_name in enumerate(class_names)
             }
 
-            # Compute metrics for each threshold
-            for thresh in thresholds:
-                self.threshold = thresh
-                metrics_df = self.calculate_metrics(predictions, labels, per_class_metrics=True)
-                for metric_name in metrics_to_plot:
-                    metric_label = metric_name.capitalize() if metric_name != "f1" else "F1"
-                    for class_name in class_names:
-                        value = metrics_df.loc[metric_label, class_name]
-                        metric_values_dict_per_class[class_name][metric_name].append(value)
-
-            # Restore the original threshold
-            self.threshold = original_threshold
-
             # Plot metrics across thresholds per class
             fig = plotting.plot_metrics_across_thresholds_per_class(
                 thresholds,
@@ -294,20 +456,8 @@ class PerformanceAssessor:
                 self.colors,
             )
         else:
-            # Initialize a dictionary to store overall metric values
-            metric_values_dict = {metric_name: [] for metric_name in metrics_to_plot}
-
-            # Compute metrics for each threshold
-            for thresh in thresholds:
-                self.threshold = thresh
-                metrics_df = self.calculate_metrics(predictions, labels, per_class_metrics=False)
-                for metric_name in metrics_to_plot:
-                    metric_label = metric_name.capitalize() if metric_name != "f1" else "F1"
-                    value = metrics_df.loc[metric_label, "Overall"]
-                    metric_values_dict[metric_name].append(value)
-
-            # Restore the original threshold
-            self.threshold = original_threshold
+            # Collect overall metric values
+            metric_values_dict = {metric_name: metric_values[metric_name].tolist() for metric_name in metrics_to_plot}
 
             # Plot metrics across thresholds
             fig = plotting.plot_metrics_across_thresholds(
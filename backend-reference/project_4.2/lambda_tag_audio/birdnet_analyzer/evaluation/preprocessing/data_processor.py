@@ -5,9 +5,13 @@ This module defines the DataProcessor class, which processes prediction and anno
 aligns them with sampled time intervals, and generates tensors for further model training or evaluation.
 """
 
+import copy
 import os
 import warnings
-from typing import Dict, List, Optional, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -16,8 +20,27 @@ from birdnet_analyzer.evaluation.preprocessing.utils import (
     extract_recording_filename,
     extract_recording_filename_from_filename,
     read_and_concatenate_files_in_directory,
+    read_result_file,
 )
 
+# Recordings handed to a worker process at once
+RECORDINGS_PER_TASK = 64
+
+
+def _process_recordings(processor: "DataProcessor", recordings: List[Tuple[str, pd.DataFrame, pd.DataFrame]]):
+    """
+    Computes the sample blocks of several recordings in a worker process.
+
+    Args:
+        processor (DataProcessor): Processor holding the settings and classes, without the loaded data.
+        recordings (List[Tuple[str, pd.DataFrame, pd.DataFrame]]): Recording names with their
+            predictions and annotations.
+
+    Returns:
+        List: The result of `_get_recording_block` for each recording.
+    """
+    return [processor._get_recording_block(*recording) for recording in recordings]
+
 
 class DataProcessor:
     """
@@ -57,6 +80,9 @@ class DataProcessor:
         columns_predictions: Optional[Dict[str, str]] = None,
         columns_annotations: Optional[Dict[str, str]] = None,
         recording_duration: Optional[float] = None,
+        num_workers: Optional[int] = None,
+        in_memory: bool = True,
+        cache_dir: Optional[str] = None,
     ) -> None:
         """
         Initializes the DataProcessor by loading prediction and annotation data.
@@ -72,6 +98,13 @@ class DataProcessor:
             columns_predictions (Optional[Dict[str, str]], optional): Column name mappings for prediction files.
             columns_annotations (Optional[Dict[str, str]], optional): Column name mappings for annotation files.
             recording_duration (Optional[float], optional): User-specified recording duration in seconds. Defaults to None.
+            num_workers (Optional[int], optional): Number of worker processes for processing recordings.
+                Defaults to None, which uses all CPUs.
+            in_memory (bool, optional): Whether to build the samples DataFrame and tensors for all recordings.
+                If False, only the source tables are loaded and samples are produced in chunks
+                by `iter_tensor_chunks`. Defaults to True.
+            cache_dir (Optional[str], optional): Directory for cached tables of prediction and annotation folders.
+                Defaults to None, which disables the cache.
 
         Raises:
             ValueError: If any parameter is invalid (e.g., negative sample duration).
@@ -90,6 +123,8 @@ class DataProcessor:
         )
 
         self.recording_duration: Optional[float] = recording_duration
+        self.num_workers: int = num_workers or os.cpu_count() or 1
+        self.cache_dir: Optional[str] = cache_dir
 
         # Paths and filenames
         self.prediction_directory_path: str = prediction_directory_path
@@ -115,8 +150,10 @@ class DataProcessor:
 
         # Load and process data
         self.load_data()
-        self.process_data()
-        self.create_tensors()
+
+        if in_memory:
+            self.process_data()
+            self.create_tensors()
 
     def _validate_parameters(self) -> None:
         """
@@ -184,8 +221,12 @@ class DataProcessor:
         """
         if self.prediction_file_name is None or self.annotation_file_name is None:
             # Case: No specific files provided; load all files in directories.
-            self.predictions_df = read_and_concatenate_files_in_directory(self.prediction_directory_path)
-            self.annotations_df = read_and_concatenate_files_in_directory(self.annotation_directory_path)
+            self.predictions_df = read_and_concatenate_files_in_directory(
+                self.prediction_directory_path, self._get_column_dtypes(prediction=True), self.cache_dir
+            )
+            self.annotations_df = read_and_concatenate_files_in_directory(
+                self.annotation_directory_path, self._get_column_dtypes(prediction=False), self.cache_dir
+            )
 
             # Ensure 'source_file' column exists for traceability
             if "source_file" not in self.predictions_df.columns:
@@ -199,11 +240,7 @@ class DataProcessor:
             self.annotations_df = self._prepare_dataframe(self.annotations_df, prediction=False)
 
             # Apply class mapping to predictions if provided
-            if self.class_mapping:
-                class_col_pred = self.get_column_name("Class", prediction=True)
-                self.predictions_df[class_col_pred] = self.predictions_df[class_col_pred].apply(
-                    lambda x: self.class_mapping.get(x, x)
-                )
+            self._map_classes()
         else:
             # Case: Specific files are provided for predictions and annotations.
             # Ensure filenames correspond to the same recording (heuristic check).
@@ -217,8 +254,8 @@ class DataProcessor:
             annotation_file = os.path.join(self.annotation_directory_path, self.annotation_file_name)
 
             # Load files into DataFrames
-            self.predictions_df = pd.read_csv(prediction_file, sep="\t")
-            self.annotations_df = pd.read_csv(annotation_file, sep="\t")
+            self.predictions_df = read_result_file(prediction_file, self._get_column_dtypes(prediction=True))
+            self.annotations_df = read_result_file(annotation_file, self._get_column_dtypes(prediction=False))
 
             # Add 'source_file' column to identify origins
             self.predictions_df["source_file"] = self.prediction_file_name
@@ -229,11 +266,7 @@ class DataProcessor:
             self.annotations_df = self._prepare_dataframe(self.annotations_df, prediction=False)
 
             # Apply class mapping to predictions if provided
-            if self.class_mapping:
-                class_col_pred = self.get_column_name("Class", prediction=True)
-                self.predictions_df[class_col_pred] = self.predictions_df[class_col_pred].apply(
-                    lambda x: self.class_mapping.get(x, x)
-                )
+            self._map_classes()
 
         # Consolidate all unique classes from predictions and annotations
         class_col_pred = self.get_column_name("Class", prediction=True)
@@ -246,6 +279,46 @@ class DataProcessor:
         all_classes = {cls for cls in pred_classes.union(annot_classes) if pd.notna(cls)}
         self.classes = tuple(sorted(all_classes))
 
+    def _get_column_dtypes(self, prediction: bool) -> Dict[str, str]:
+        """
+        Returns the types of the known columns of prediction or annotation files.
+
+        Reading with explicit types skips type inference and makes class names strings
+        even if they look like numbers.
+
+        Args:
+            prediction (bool): Whether the types are for predictions or annotations.
+
+        Returns:
+            Dict[str, str]: Mapping of column names to pandas dtypes.
+        """
+        fields = ["Start Time", "End Time", "Duration"] + (["Confidence"] if prediction else [])
+        dtypes = {self.get_column_name(field, prediction=prediction): "float64" for field in fields}
+        dtypes[self.get_column_name("Class", prediction=prediction)] = "string"
+
+        return dtypes
+
+    def _map_classes(self) -> None:
+        """
+        Applies the class mapping to the predictions.
+
+        The class column is converted to a categorical, so the mapping is looked up once per
+        distinct class instead of once per row. Classes without a mapping are kept as they are.
+        """
+        class_col_pred = self.get_column_name("Class", prediction=True)
+
+        if not self.class_mapping or class_col_pred not in self.predictions_df.columns:
+            return
+
+        classes = self.predictions_df[class_col_pred].astype("category")
+        mapped_categories = [self.class_mapping.get(cls, cls) for cls in classes.cat.categories]
+        category_codes, categories = pd.factorize(np.array(mapped_categories, dtype=object))
+        codes = classes.cat.codes.to_numpy()
+
+        self.predictions_df[class_col_pred] = pd.Categorical.from_codes(
+            np.where(codes >= 0, category_codes[codes], -1), categories=categories
+        )
+
     def _prepare_dataframe(self, df: pd.DataFrame, prediction: bool) -> pd.DataFrame:
         """
         Prepares a DataFrame by adding a 'recording_filename' column.
@@ -281,27 +354,199 @@ class DataProcessor:
         Processes the loaded data, aligns predictions and annotations with sample intervals,
         and updates the samples DataFrame.
 
-        This method iterates through all recording filenames, processes each recording,
-        and aggregates the results into the `samples_df` attribute.
+        Predictions and annotations are grouped by recording filename in a single pass. The
+        recordings are processed in worker processes and their sample blocks are assembled
+        into the `samples_df` attribute once at the end.
+        """
+        recordings = self._get_recordings()
+        tasks = [recordings[i : i + RECORDINGS_PER_TASK] for i in range(0, len(recordings), RECORDINGS_PER_TASK)]
+        num_workers = min(self.num_workers, len(tasks))
+
+        if num_workers > 1:
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                results = executor.map(_process_recordings, repeat(self._get_worker_processor()), tasks)
+                blocks = [block for result in results for block in result]
+        else:
+            blocks = [self._get_recording_block(*recording) for recording in recordings]
+
+        self.samples_df = self._assemble_samples([block for block in blocks if block is not None])
+
+    def get_recording_filenames(self) -> List[str]:
         """
-        self.samples_df = pd.DataFrame()  # Initialize the samples DataFrame
+        Returns the sorted names of all recordings with predictions or annotations.
 
-        # Get the unique set of recording filenames from both predictions and annotations
-        recording_filenames = set(self.predictions_df["recording_filename"].unique()).union(
-            set(self.annotations_df["recording_filename"].unique())
+        Returns:
+            List[str]: Recording filenames.
+        """
+        return sorted(
+            set(self.predictions_df.get("recording_filename", ())).union(
+                self.annotations_df.get("recording_filename", ())
+            )
         )
 
-        # Process each recording
-        for recording_filename in recording_filenames:
-            # Filter predictions and annotations for the current recording
-            pred_df = self.predictions_df[self.predictions_df["recording_filename"] == recording_filename]
-            annot_df = self.annotations_df[self.annotations_df["recording_filename"] == recording_filename]
+    def _get_recordings(
+        self, selected_recordings: Optional[List[str]] = None
+    ) -> List[Tuple[str, pd.DataFrame, pd.DataFrame]]:
+        """
+        Splits the predictions and annotations by recording in a single pass.
+
+        Args:
+            selected_recordings (Optional[List[str]]): Recordings to include. Defaults to all.
+
+        Returns:
+            List[Tuple[str, pd.DataFrame, pd.DataFrame]]: Recording filenames, sorted, with their
+            predictions and annotations.
+        """
+        # Get the rows of each recording from both predictions and annotations
+        pred_groups = self.predictions_df.groupby("recording_filename", sort=False).indices
+        annot_groups = self.annotations_df.groupby("recording_filename", sort=False).indices
+        recording_filenames = set(pred_groups).union(annot_groups)
+
+        if selected_recordings is not None:
+            recording_filenames &= set(selected_recordings)
+
+        no_rows = np.array([], dtype=np.intp)
+
+        return [
+            (
+                recording_filename,
+                self.predictions_df.take(pred_groups.get(recording_filename, no_rows)),
+                self.annotations_df.take(annot_groups.get(recording_filename, no_rows)),
+            )
+            for recording_filename in sorted(recording_filenames)
+        ]
+
+    def _get_worker_processor(self) -> "DataProcessor":
+        """
+        Returns a shallow copy for worker processes, which only need the settings and not the loaded data.
+        """
+        processor = copy.copy(self)
+        processor.predictions_df = processor.annotations_df = processor.samples_df = pd.DataFrame()
+        processor.prediction_tensors = processor.label_tensors = np.array([])
+
+        return processor
+
+    def iter_tensor_chunks(
+        self,
+        selected_classes: Optional[List[str]] = None,
+        selected_recordings: Optional[List[str]] = None,
+        recordings_per_chunk: int = RECORDINGS_PER_TASK,
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Yields prediction and label tensors for a few recordings at a time.
+
+        Unlike `get_filtered_tensors`, this does not need the samples DataFrame, so memory only
+        depends on the chunk size and not on the number of recordings. Chunks are computed in
+        worker processes, with at most two chunks per worker in flight.
+
+        Args:
+            selected_classes (Optional[List[str]]): Class names to include. Defaults to all classes.
+            selected_recordings (Optional[List[str]]): Recording filenames to include. Defaults to all recordings.
+            recordings_per_chunk (int): Number of recordings per chunk.
+
+        Yields:
+            Tuple[np.ndarray, np.ndarray]: Predictions of shape (samples, classes) and the matching labels,
+            with the classes in the order returned by `select_classes`.
+
+        Raises:
+            ValueError: If no valid classes are selected or recordings_per_chunk is not positive.
+        """
+        if recordings_per_chunk <= 0:
+            raise ValueError("recordings_per_chunk must be positive.")
+
+        class_indices = [self.classes.index(cls) for cls in self.select_classes(selected_classes)]
+        recordings = self._get_recordings(selected_recordings)
+        tasks = [recordings[i : i + recordings_per_chunk] for i in range(0, len(recordings), recordings_per_chunk)]
+        num_workers = min(self.num_workers, len(tasks))
+
+        def iter_blocks():
+            if num_workers > 1:
+                processor = self._get_worker_processor()
+
+                with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                    pending = deque()
+
+                    for task in tasks:
+                        pending.append(executor.submit(_process_recordings, processor, task))
+
+                        if len(pending) >= 2 * num_workers:
+                            yield pending.popleft().result()
+
+                    while pending:
+                        yield pending.popleft().result()
+            else:
+                for task in tasks:
+                    yield _process_recordings(self, task)
+
+        for blocks in iter_blocks():
+            blocks = [block for block in blocks if block is not None]
+
+            if blocks:
+                predictions = np.concatenate([block[3][:, class_indices] for block in blocks]).astype(np.float32)
+                labels = np.concatenate([block[4][:, class_indices] for block in blocks])
+
+                yield predictions, labels
+
+    def _get_recording_block(
+        self, recording_filename: str, pred_df: pd.DataFrame, annot_df: pd.DataFrame
+    ) -> Optional[Tuple[str, np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Computes the sample intervals, confidences and annotations of a single recording as NumPy arrays.
+
+        Args:
+            recording_filename (str): The name of the recording.
+            pred_df (pd.DataFrame): Predictions DataFrame specific to the recording.
+            annot_df (pd.DataFrame): Annotations DataFrame specific to the recording.
+
+        Returns:
+            Optional[Tuple]: The recording filename, sample start and end times, and the
+            (samples, classes) confidence and annotation matrices. None if the duration is invalid.
+        """
+        file_duration = self.determine_file_duration(pred_df, annot_df)
+
+        if file_duration <= 0:
+            return None
+
+        start_times, end_times = self._get_sample_intervals(file_duration)
+        confidences = np.zeros((len(start_times), len(self.classes)), dtype=np.float64)
+        annotations = np.zeros((len(start_times), len(self.classes)), dtype=np.int64)
+
+        self._apply_predictions(pred_df, start_times, end_times, confidences)
+        self._apply_annotations(annot_df, start_times, end_times, annotations)
+
+        return recording_filename, start_times, end_times, confidences, annotations
+
+    def _assemble_samples(
+        self, blocks: List[Tuple[str, np.ndarray, np.ndarray, np.ndarray, np.ndarray]]
+    ) -> pd.DataFrame:
+        """
+        Builds the samples DataFrame from the sample blocks of all recordings.
+
+        Args:
+            blocks (List[Tuple]): Results of `_get_recording_block`.
+
+        Returns:
+            pd.DataFrame: One row per sample interval with a confidence and an annotation column per class.
+        """
+        if not blocks:
+            return pd.DataFrame()
+
+        filenames, start_times, end_times, confidences, annotations = zip(*blocks)
+        confidences = np.concatenate(confidences)
+        annotations = np.concatenate(annotations)
+
+        samples = {
+            "filename": np.repeat(filenames, [len(block_start) for block_start in start_times]),
+            "sample_index": np.concatenate([np.arange(len(block_start)) for block_start in start_times]),
+            "start_time": np.concatenate(start_times),
+            "end_time": np.concatenate(end_times),
+        }
 
-            # Generate sample intervals and annotations for the recording
-            samples_df = self.process_recording(recording_filename, pred_df, annot_df)
+        for i, label in enumerate(self.classes):
+            samples[f"{label}_confidence"] = confidences[:, i]
+            samples[f"{label}_annotation"] = annotations[:, i]
 
-            # Append the processed DataFrame to the overall samples DataFrame
-            self.samples_df = pd.concat([self.samples_df, samples_df], ignore_index=True)
+        return pd.DataFrame(samples)
 
     def process_recording(self, recording_filename: str, pred_df: pd.DataFrame, annot_df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -384,6 +629,23 @@ class DataProcessor:
 
         return duration
 
+    def _get_sample_intervals(self, file_duration: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Computes the start and end times of the sample intervals of a recording.
+
+        Args:
+            file_duration (float): The total duration of the recording in seconds.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Start and end times of all sample intervals.
+        """
+        # Generate start times for each sample interval
+        intervals = np.arange(0, file_duration, self.sample_duration)
+        if len(intervals) == 0:
+            intervals = np.array([0])
+
+        return intervals, np.minimum(intervals + self.sample_duration, file_duration)
+
     def initialize_samples(self, recording_filename: str, file_duration: float) -> pd.DataFrame:
         """
         Initializes a DataFrame of time-based sample intervals for the specified recording.
@@ -404,30 +666,112 @@ class DataProcessor:
             # Return an empty DataFrame if file duration is invalid
             return pd.DataFrame()
 
-        # Generate start times for each sample interval
-        intervals = np.arange(0, file_duration, self.sample_duration)
-        if len(intervals) == 0:
-            intervals = np.array([0])
+        start_times, end_times = self._get_sample_intervals(file_duration)
+        num_samples = len(start_times)
+
+        return self._assemble_samples(
+            [
+                (
+                    recording_filename,
+                    start_times,
+                    end_times,
+                    np.zeros((num_samples, len(self.classes)), dtype=np.float64),
+                    np.zeros((num_samples, len(self.classes)), dtype=np.int64),
+                )
+            ]
+        )
 
-        # Prepare sample structure
-        samples = {
-            "filename": recording_filename,
-            "sample_index": [],
-            "start_time": [],
-            "end_time": [],
-        }
+    def _get_overlapping_samples(
+        self, df: pd.DataFrame, start_times: np.ndarray, end_times: np.ndarray, prediction: bool
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Finds all (sample, class) cells covered by the rows of a predictions or annotations DataFrame.
 
-        for idx, start in enumerate(intervals):
-            samples["sample_index"].append(idx)
-            samples["start_time"].append(start)
-            samples["end_time"].append(min(start + self.sample_duration, file_duration))
+        A row covers a sample if they overlap by at least `min_overlap`. Since sample start and
+        end times are sorted, the covered samples of each row form a contiguous range that is
+        found with `searchsorted` instead of scanning all samples per row.
 
-        # Initialize confidence scores and annotations for each class
-        for label in self.classes:
-            samples[f"{label}_confidence"] = [0.0] * len(samples["sample_index"])  # Float values
-            samples[f"{label}_annotation"] = [0] * len(samples["sample_index"])  # Integer values
+        Args:
+            df (pd.DataFrame): Predictions or annotations of one recording.
+            start_times (np.ndarray): Sorted start times of the samples of the same recording.
+            end_times (np.ndarray): Sorted end times of the samples of the same recording.
+            prediction (bool): Whether `df` holds predictions (True) or annotations (False).
 
-        return pd.DataFrame(samples)
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Sample positions, class indices and the
+            position of the row in `df` for every covered cell.
+        """
+        class_col = self.get_column_name("Class", prediction=prediction)
+        start_time_col = self.get_column_name("Start Time", prediction=prediction)
+        end_time_col = self.get_column_name("End Time", prediction=prediction)
+
+        # Skip rows for classes not included in the predefined list
+        class_indices = pd.Index(self.classes).get_indexer(df[class_col])
+        begin_times = df[start_time_col].to_numpy(dtype=np.float64)
+        row_end_times = df[end_time_col].to_numpy(dtype=np.float64)
+        valid = (class_indices >= 0) & ~np.isnan(begin_times) & ~np.isnan(row_end_times)
+
+        # First sample ending late enough and first sample starting too late for each row
+        first = np.searchsorted(end_times, begin_times + self.min_overlap, side="left")
+        stop = np.searchsorted(start_times, row_end_times - self.min_overlap, side="right")
+        counts = np.where(valid, np.maximum(stop - first, 0), 0)
+
+        # Expand the ranges into one entry per covered cell
+        row_positions = np.repeat(np.arange(len(df)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        return first[row_positions] + offsets, class_indices[row_positions], row_positions
+
+    def _apply_predictions(
+        self, pred_df: pd.DataFrame, start_times: np.ndarray, end_times: np.ndarray, confidences: np.ndarray
+    ) -> None:
+        """
+        Scatters the prediction confidences into a (samples, classes) matrix, keeping the maximum per cell.
+
+        Args:
+            pred_df (pd.DataFrame): Predictions of one recording.
+            start_times (np.ndarray): Sorted start times of the samples of the same recording.
+            end_times (np.ndarray): Sorted end times of the samples of the same recording.
+            confidences (np.ndarray): Confidence matrix to update in place.
+        """
+        if pred_df.empty or not len(start_times):
+            return
+
+        confidence_col = self.get_column_name("Confidence", prediction=True)
+
+        sample_positions, class_indices, row_positions = self._get_overlapping_samples(
+            pred_df, start_times, end_times, prediction=True
+        )
+
+        if confidence_col in pred_df.columns:
+            row_confidences = pred_df[confidence_col].to_numpy(dtype=np.float64)[row_positions]
+        else:
+            row_confidences = np.zeros(len(row_positions))
+
+        # Keep the maximum confidence of all overlapping predictions, missing values never win
+        np.fmax.at(confidences, (sample_positions, class_indices), row_confidences)
+
+    def _apply_annotations(
+        self, annot_df: pd.DataFrame, start_times: np.ndarray, end_times: np.ndarray, annotations: np.ndarray
+    ) -> None:
+        """
+        Marks the annotated cells of a (samples, classes) matrix with 1.
+
+        Args:
+            annot_df (pd.DataFrame): Annotations of one recording.
+            start_times (np.ndarray): Sorted start times of the samples of the same recording.
+            end_times (np.ndarray): Sorted end times of the samples of the same recording.
+            annotations (np.ndarray): Annotation matrix to update in place.
+        """
+        if annot_df.empty or not len(start_times):
+            return
+
+        sample_positions, class_indices, _ = self._get_overlapping_samples(
+            annot_df, start_times, end_times, prediction=False
+        )
+
+        # Set annotation value to 1 for the overlapping samples
+        annotations[sample_positions, class_indices] = 1
 
     def update_samples_with_predictions(self, pred_df: pd.DataFrame, samples_df: pd.DataFrame) -> None:
         """
@@ -441,33 +785,16 @@ class DataProcessor:
             pred_df (pd.DataFrame): DataFrame containing prediction information.
             samples_df (pd.DataFrame): DataFrame of samples to be updated with confidence scores.
         """
-        # Retrieve the column names for predictions
-        class_col = self.get_column_name("Class", prediction=True)
-        start_time_col = self.get_column_name("Start Time", prediction=True)
-        end_time_col = self.get_column_name("End Time", prediction=True)
-        confidence_col = self.get_column_name("Confidence", prediction=True)
-
-        # Iterate through each prediction row
-        for _, row in pred_df.iterrows():
-            class_name = row[class_col]
-            if class_name not in self.classes:
-                continue  # Skip predictions for classes not included in the predefined list
-
-            # Extract start and end times, and confidence score
-            begin_time = row[start_time_col]
-            end_time = row[end_time_col]
-            confidence = row.get(confidence_col, 0.0)
+        if pred_df.empty or samples_df.empty:
+            return
 
-            # Identify samples that overlap with the prediction based on min_overlap
-            sample_indices = samples_df[
-                (samples_df["start_time"] <= end_time - self.min_overlap)
-                & (samples_df["end_time"] >= begin_time + self.min_overlap)
-            ].index
+        confidence_columns = [f"{label}_confidence" for label in self.classes]
+        confidences = samples_df[confidence_columns].to_numpy(dtype=np.float64, copy=True)
 
-            # Update the confidence scores for the overlapping samples
-            for i in sample_indices:
-                current_confidence = samples_df.loc[i, f"{class_name}_confidence"]
-                samples_df.loc[i, f"{class_name}_confidence"] = max(current_confidence, confidence)
+        self._apply_predictions(
+            pred_df, samples_df["start_time"].to_numpy(), samples_df["end_time"].to_numpy(), confidences
+        )
+        samples_df[confidence_columns] = confidences
 
     def update_samples_with_annotations(self, annot_df: pd.DataFrame, samples_df: pd.DataFrame) -> None:
         """
@@ -481,30 +808,16 @@ class DataProcessor:
             annot_df (pd.DataFrame): DataFrame containing annotation information.
             samples_df (pd.DataFrame): DataFrame of samples to be updated with annotations.
         """
-        # Retrieve the column names for annotations
-        class_col = self.get_column_name("Class", prediction=False)
-        start_time_col = self.get_column_name("Start Time", prediction=False)
-        end_time_col = self.get_column_name("End Time", prediction=False)
-
-        # Iterate through each annotation row
-        for _, row in annot_df.iterrows():
-            class_name = row[class_col]
-            if class_name not in self.classes:
-                continue  # Skip annotations for classes not included in the predefined list
-
-            # Extract start and end times
-            begin_time = row[start_time_col]
-            end_time = row[end_time_col]
+        if annot_df.empty or samples_df.empty:
+            return
 
-            # Identify samples that overlap with the annotation based on min_overlap
-            sample_indices = samples_df[
-                (samples_df["start_time"] <= end_time - self.min_overlap)
-                & (samples_df["end_time"] >= begin_time + self.min_overlap)
-            ].index
+        annotation_columns = [f"{label}_annotation" for label in self.classes]
+        annotations = samples_df[annotation_columns].to_numpy(dtype=np.int64, copy=True)
 
-            # Set annotation value to 1 for the overlapping samples
-            for i in sample_indices:
-                samples_df.loc[i, f"{class_name}_annotation"] = 1
+        self._apply_annotations(
+            annot_df, samples_df["start_time"].to_numpy(), samples_df["end_time"].to_numpy(), annotations
+        )
+        samples_df[annotation_columns] = annotations
 
     def create_tensors(self) -> None:
         """
@@ -617,12 +930,7 @@ class DataProcessor:
             raise ValueError("samples_df must contain a 'filename' column.")
 
         # Determine the classes to filter by
-        classes = (
-            self.classes if selected_classes is None else tuple(cls for cls in selected_classes if cls in self.classes)
-        )
-
-        if not classes:
-            raise ValueError("No valid classes selected.")
+        classes = self.select_classes(selected_classes)
 
         # Create a mask for filtering samples
         mask = pd.Series(True, index=self.samples_df.index)
@@ -652,3 +960,25 @@ class DataProcessor:
 
         # Return the tensors and the list of filtered classes
         return predictions, labels, classes
+
+    def select_classes(self, selected_classes: Optional[List[str]] = None) -> Tuple[str, ...]:
+        """
+        Returns the selected classes that are present in the data.
+
+        Args:
+            selected_classes (Optional[List[str]]): Class names to select. If None, all classes are selected.
+
+        Returns:
+            Tuple[str, ...]: The valid selected class names.
+
+        Raises:
+            ValueError: If none of the selected classes is valid.
+        """
+        classes = (
+            self.classes if selected_classes is None else tuple(cls for cls in selected_classes if cls in self.classes)
+        )
+
+        if not classes:
+            raise ValueError("No valid classes selected.")
+
+        return classes
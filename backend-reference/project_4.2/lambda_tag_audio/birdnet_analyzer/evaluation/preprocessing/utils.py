@@ -3,15 +3,32 @@ Utility Functions for Data Processing Tasks
 
 This module provides helper functions to handle common data processing tasks, such as:
 - Extracting recording filenames from file paths or filenames.
-- Reading and concatenating text files from a specified directory.
+- Reading and concatenating result files (text or Parquet) from a specified directory,
+  concurrently and optionally with a Parquet cache for unchanged directories.
 
 It is designed to work seamlessly with pandas and file system operations.
 """
 
+import codecs
+import hashlib
+import importlib.util
+import io
+import json
 import os
-from typing import List
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional
+
 import pandas as pd
 
+# Bump when the parsing changes, so old cache entries are not used anymore
+CACHE_VERSION = 1
+# Least recently used cache entries are removed once the cache grows beyond this size in bytes
+CACHE_MAX_SIZE = 1024**3
+# Files read concurrently, pandas releases the GIL while parsing
+READ_THREADS = 8
+
 
 def extract_recording_filename(path_column: pd.Series) -> pd.Series:
     """
@@ -47,52 +64,202 @@ def extract_recording_filename_from_filename(filename_series: pd.Series) -> pd.S
     return filename_series.apply(lambda x: x.split(".")[0] if isinstance(x, str) else x)
 
 
-def read_and_concatenate_files_in_directory(directory_path: str) -> pd.DataFrame:
+@lru_cache(maxsize=1)
+def _get_csv_engine() -> str:
+    """
+    Returns the fastest available pandas CSV parser engine.
+
+    Returns:
+        str: 'pyarrow' if pyarrow is installed, otherwise 'c'.
+    """
+    return "pyarrow" if importlib.util.find_spec("pyarrow") is not None else "c"
+
+
+def get_default_cache_dir() -> str:
+    """
+    Returns the per-user directory for cached result tables.
+
+    Returns:
+        str: 'birdnet_analyzer/evaluation' in %LOCALAPPDATA% on Windows, otherwise in $XDG_CACHE_HOME or ~/.cache.
+    """
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+
+    return os.path.join(base, "birdnet_analyzer", "evaluation")
+
+
+def _evict_cache_entries(cache_dir: str, max_size: int) -> None:
+    """
+    Removes the least recently used cache entries until the cache is not larger than max_size bytes.
+
+    Args:
+        cache_dir (str): Directory of the cached tables.
+        max_size (int): Maximum total size of the cached tables in bytes.
+    """
+    entries = []
+
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.name.endswith(".parquet") and entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+    total_size = sum(size for _, size, _ in entries)
+
+    # Oldest first, cache hits renew the modification time
+    for _, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+
+        try:
+            os.remove(path)
+            total_size -= size
+        except OSError:
+            pass
+
+
+def read_result_file(filepath: str, dtypes: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    Read a single result or annotation file into a DataFrame.
+
+    Parquet files are read directly with their stored column types. Any other file is read
+    as tab-separated text, falling back to 'latin-1' encoding if UTF-8 decoding fails.
+
+    Args:
+        filepath (str): Path to the file.
+        dtypes (Optional[Dict[str, str]]): Column types for text files. Columns that are missing
+            in the file are ignored, all others are inferred.
+
+    Returns:
+        pd.DataFrame: The file contents.
+    """
+    if filepath.endswith(".parquet"):
+        return pd.read_parquet(filepath)
+
+    with open(filepath, "rb") as f:
+        data = f.read()
+
+    # Check the encoding up front, the pyarrow parser does not fail on invalid UTF-8
+    try:
+        data.decode("utf-8")
+    except UnicodeDecodeError:
+        # Fallback to 'latin-1' encoding if UTF-8 fails
+        data = data.decode("latin-1").encode("utf-8")
+
+    if data.startswith(codecs.BOM_UTF8):
+        data = data[len(codecs.BOM_UTF8) :]
+
+    return pd.read_csv(io.BytesIO(data), sep="\t", encoding="utf-8", dtype=dtypes, engine=_get_csv_engine())
+
+
+def get_directory_fingerprint(
+    directory_path: str, filenames: List[str], dtypes: Optional[Dict[str, str]] = None
+) -> str:
+    """
+    Computes a fingerprint of result files that changes whenever one of them changes.
+
+    Args:
+        directory_path (str): Path to the directory containing the files.
+        filenames (List[str]): Names of the files in the directory.
+        dtypes (Optional[Dict[str, str]]): Column types the files are read with.
+
+    Returns:
+        str: Hex digest of the directory, file names, sizes, modification times and column types.
+    """
+    entries = []
+
+    for filename in filenames:
+        stat = os.stat(os.path.join(directory_path, filename))
+        entries.append([filename, stat.st_size, stat.st_mtime_ns])
+
+    key = [CACHE_VERSION, os.path.abspath(directory_path), entries, sorted((dtypes or {}).items())]
+
+    return hashlib.sha1(json.dumps(key).encode("utf-8")).hexdigest()
+
+
+def read_and_concatenate_files_in_directory(
+    directory_path: str,
+    dtypes: Optional[Dict[str, str]] = None,
+    cache_dir: Optional[str] = None,
+    cache_max_size: int = CACHE_MAX_SIZE,
+) -> pd.DataFrame:
     """
-    Read and concatenate all .txt files in a directory into a single DataFrame.
+    Read and concatenate all .txt and .parquet files in a directory into a single DataFrame.
 
-    This function scans the specified directory for all .txt files, reads each file into a DataFrame,
+    This function scans the specified directory for all .txt and .parquet files, reads them concurrently,
     appends a 'source_file' column containing the filename, and concatenates all DataFrames into one.
     If the files have inconsistent columns, a ValueError is raised.
 
+    With a cache directory, the result is cached as a Parquet file named after the directory
+    fingerprint, so reading an unchanged directory again only loads the cache. The directory
+    should only be writable by the current user, e.g. the one of get_default_cache_dir.
+
     Args:
-        directory_path (str): Path to the directory containing the .txt files.
+        directory_path (str): Path to the directory containing the files.
+        dtypes (Optional[Dict[str, str]]): Column types for text files.
+        cache_dir (Optional[str]): Directory for cached tables. Defaults to None, which disables the cache.
+        cache_max_size (int): Maximum size of the cache in bytes, least recently used tables are removed first.
 
     Returns:
-        pd.DataFrame: A concatenated DataFrame containing the data from all .txt files,
+        pd.DataFrame: A concatenated DataFrame containing the data from all files,
         or an empty DataFrame if no files are found.
 
     Raises:
         ValueError: If the columns in the files are inconsistent.
     """
-    df_list: List[pd.DataFrame] = []  # List to hold individual DataFrames
-    columns_set = None  # To ensure consistency in column names
-
-    # Iterate through each file in the directory
-    for filename in os.listdir(directory_path):
-        if filename.endswith(".txt"):
-            filepath = os.path.join(directory_path, filename)  # Construct the full file path
-
-            try:
-                # Attempt to read the file as a tab-separated values file with UTF-8 encoding
-                df = pd.read_csv(filepath, sep="\t", encoding="utf-8")
-            except UnicodeDecodeError:
-                # Fallback to 'latin-1' encoding if UTF-8 fails
-                df = pd.read_csv(filepath, sep="\t", encoding="latin-1")
-
-            # Check for column consistency across files
-            if columns_set is None:
-                columns_set = set(df.columns)  # Initialize with the first file's columns
-            elif set(df.columns) != columns_set:
-                raise ValueError(f"File {filename} has different columns than the previous files.")
-
-            # Add a column to indicate the source file for traceability
-            df["source_file"] = filename
-
-            # Append the DataFrame to the list
-            df_list.append(df)
-
-    # Concatenate all DataFrames if any were processed, else return an empty DataFrame
-    if df_list:
-        return pd.concat(df_list, ignore_index=True)
-    return pd.DataFrame()  # Return an empty DataFrame if no .txt files were found
+    filenames = sorted(
+        filename
+        for filename in os.listdir(directory_path)
+        if filename.endswith(".txt") or filename.endswith(".parquet")
+    )
+
+    if not filenames:
+        return pd.DataFrame()  # Return an empty DataFrame if no files were found
+
+    cache_path = None
+
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, get_directory_fingerprint(directory_path, filenames, dtypes) + ".parquet")
+
+        try:
+            result = pd.read_parquet(cache_path)
+            os.utime(cache_path)
+
+            return result
+        except (OSError, ImportError, ValueError):
+            pass
+
+    with ThreadPoolExecutor(max_workers=READ_THREADS) as executor:
+        df_list: List[pd.DataFrame] = list(
+            executor.map(lambda filename: read_result_file(os.path.join(directory_path, filename), dtypes), filenames)
+        )
+
+    # Check for column consistency across files
+    columns_set = set(df_list[0].columns)
+
+    for filename, df in zip(filenames, df_list):
+        if set(df.columns) != columns_set:
+            raise ValueError(f"File {filename} has different columns than the previous files.")
+
+        # Add a column to indicate the source file for traceability
+        df["source_file"] = filename
+
+    result = pd.concat(df_list, ignore_index=True)
+
+    if cache_path:
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+
+        try:
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+            result.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, cache_path)
+            _evict_cache_entries(cache_dir, cache_max_size)
+        except (OSError, ImportError, TypeError, ValueError) as e:
+            warnings.warn(f"Could not cache {directory_path}: {e}")
+
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    return result
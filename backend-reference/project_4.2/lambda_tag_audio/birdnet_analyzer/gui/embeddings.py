@@ -144,19 +144,23 @@ def run_search(db_path, query_path, max_samples, score_fn, crop_mode, crop_overl
 
 
 def run_export(export_state):
-    import birdnet_analyzer.audio as audio
+    from birdnet_analyzer.search.utils import export_segments
 
     if len(export_state.items()) > 0:
         export_folder = gu.select_folder(state_key="embeddings-search-export-folder")
 
         if export_folder:
+            segments = []
+
             for index, file in export_state.items():
                 filebasename = os.path.basename(file[0])
                 filebasename = os.path.splitext(filebasename)[0]
-                dest = os.path.join(export_folder, f"{file[4]:.5f}_{filebasename}_{file[1]}_{file[1] + file[2]}.wav")
                 # @mamau: Missing audio speed?
-                sig, rate = audio.open_audio_file(file[0], offset=file[1], duration=file[2], sample_rate=None)
-                audio.save_signal(sig, dest, rate)
+                segments.append(
+                    (file[0], file[1], file[2], f"{file[4]:.5f}_{filebasename}_{file[1]}_{file[1] + file[2]}.wav")
+                )
+
+            export_segments(segments, export_folder)
 
         gr.Info(f"{loc.localize('embeddings-search-export-finish-info')} {export_folder}")
     else:
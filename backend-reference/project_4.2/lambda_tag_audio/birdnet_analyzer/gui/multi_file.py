@@ -9,6 +9,7 @@ OUTPUT_TYPE_MAP = {
     "Audacity": "audacity",
     "CSV": "csv",
     "Kaleidoscope": "kaleidoscope",
+    "Parquet": "parquet",
 }
 
 
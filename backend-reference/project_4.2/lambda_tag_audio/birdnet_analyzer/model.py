@@ -1162,9 +1162,12 @@ def predict(sample):
         load_model()
 
     if PBMODEL is None:
-        # Reshape input tensor
-        INTERPRETER.resize_tensor_input(INPUT_LAYER_INDEX, [len(sample), *sample[0].shape])
-        INTERPRETER.allocate_tensors()
+        # Reshape input tensor, only needed when the batch shape changes
+        input_shape = [len(sample), *sample[0].shape]
+
+        if list(INTERPRETER.get_input_details()[0]["shape"]) != input_shape:
+            INTERPRETER.resize_tensor_input(INPUT_LAYER_INDEX, input_shape)
+            INTERPRETER.allocate_tensors()
 
         # Make a prediction (Audio only for now)
         INTERPRETER.set_tensor(INPUT_LAYER_INDEX, np.array(sample, dtype="float32"))
@@ -1231,12 +1234,15 @@ def embeddings(sample):
     if INTERPRETER is None:
         load_model(False)
 
-    # Reshape input tensor
-    INTERPRETER.resize_tensor_input(INPUT_LAYER_INDEX, [len(sample), *sample[0].shape])
-    INTERPRETER.allocate_tensors()
+    # Reshape input tensor, only needed when the batch shape changes
+    input_shape = [len(sample), *sample[0].shape]
+
+    if list(INTERPRETER.get_input_details()[0]["shape"]) != input_shape:
+        INTERPRETER.resize_tensor_input(INPUT_LAYER_INDEX, input_shape)
+        INTERPRETER.allocate_tensors()
 
     # Extract feature embeddings
-    INTERPRETER.set_tensor(INPUT_LAYER_INDEX, np.array(sample, dtype="float32"))
+    INTERPRETER.set_tensor(INPUT_LAYER_INDEX, np.asarray(sample, dtype="float32"))
     INTERPRETER.invoke()
     features = INTERPRETER.get_tensor(OUTPUT_LAYER_INDEX)
 
@@ -23,8 +23,9 @@ def train(
     upsampling_mode: Literal["repeat", "mean", "smote"] = "repeat",
     model_format: Literal["tflite", "raven", "both"] = "tflite",
     model_save_mode: Literal["replace", "append"] = "replace",
-    cache_mode: Literal["load", "save"] | None = None,
-    cache_file: str = "train_cache.npz",
+    cache_mode: Literal["load", "save", "append"] | None = None,
+    cache_file: str = "train_cache.json",
+    embedding_cache: str | None = None,
     threads: int = 1,
     fmin: float = 0.0,
     fmax: float = 15000.0,
@@ -56,8 +57,9 @@ def train(
         upsampling_mode (Literal["repeat", "mean", "smote"], optional): Mode for upsampling. Defaults to "repeat".
         model_format (Literal["tflite", "raven", "both"], optional): Format to save the trained model. Defaults to "tflite".
         model_save_mode (Literal["replace", "append"], optional): Save mode for the model. Defaults to "replace".
-        cache_mode (Literal["load", "save"] | None, optional): Cache mode for training data. Defaults to None.
-        cache_file (str, optional): Path to the cache file. Defaults to "train_cache.npz".
+        cache_mode (Literal["load", "save", "append"] | None, optional): Cache mode for training data. Defaults to None.
+        cache_file (str, optional): Path to the cache header file. Defaults to "train_cache.json".
+        embedding_cache (str | None, optional): Folder for the per-file embedding cache. Defaults to None.
         threads (int, optional): Number of CPU threads to use. Defaults to 1.
         fmin (float, optional): Minimum frequency for bandpass filtering. Defaults to 0.0.
         fmax (float, optional): Maximum frequency for bandpass filtering. Defaults to 15000.0.
@@ -97,6 +99,7 @@ def train(
     cfg.TRAINED_MODEL_SAVE_MODE = model_save_mode
     cfg.TRAIN_CACHE_MODE = cache_mode
     cfg.TRAIN_CACHE_FILE = cache_file
+    cfg.TRAIN_EMBEDDING_CACHE_PATH = embedding_cache
     cfg.TFLITE_THREADS = 1
     cfg.CPU_THREADS = threads
 
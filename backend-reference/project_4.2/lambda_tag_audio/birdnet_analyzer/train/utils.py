@@ -4,8 +4,11 @@ Can be used to train a custom classifier with new training data.
 """
 
 import csv
+import hashlib
+import json
 import os
-from functools import partial
+from collections import deque
+from multiprocessing import resource_tracker, shared_memory
 from multiprocessing.pool import Pool
 
 import numpy as np
@@ -16,6 +19,16 @@ import birdnet_analyzer.config as cfg
 import birdnet_analyzer.model as model
 import birdnet_analyzer.utils as utils
 
+# Crops per interpreter invocation, the last batch is zero-padded
+EMBEDDING_BATCH_SIZE = 16
+# Processes running the model while the other workers decode audio
+INFERENCE_WORKERS = 2
+# Files decoded ahead per decode worker and batches queued per inference worker
+DECODE_FILES_PER_WORKER = 4
+BATCHES_PER_INFERENCE_WORKER = 2
+
+INFERENCE_BATCH: np.ndarray = None
+
 
 def save_sample_counts(labels, y_train):
     """
@@ -45,21 +58,71 @@ def save_sample_counts(labels, y_train):
             writer.writerow([label, count])
 
 
-def _load_audio_file(f, label_vector, config):
-    """Load an audio file and extract features.
+def get_embedding_cache_path(f):
+    """Returns the path of the cached embeddings for a training file.
+
+    The key is the hash of the file content combined with all settings that
+    change the embeddings, so renamed or moved files hit the cache and edited
+    files or changed settings miss it.
+
     Args:
         f: Path to the audio file.
-        label_vector: The label vector for the file.
+
     Returns:
-        A tuple of (x_train, y_train).
+        The path of the .npy file in cfg.TRAIN_EMBEDDING_CACHE_PATH.
     """
+    with open(f, "rb") as fh:
+        digest = hashlib.file_digest(fh, "sha256")
 
-    x_train = []
-    y_train = []
+    digest.update(json.dumps(utils.get_preprocessing_params(), sort_keys=True).encode())
+    key = digest.hexdigest()
 
-    # restore config in case we're on Windows to be thread save
-    cfg.set_config(config)
+    return os.path.join(cfg.TRAIN_EMBEDDING_CACHE_PATH, key[:2], key + ".npy")
+
+
+def load_cached_embeddings(path):
+    """Opens cached embeddings memory-mapped.
+
+    Args:
+        path: Path of the cache entry.
+
+    Returns:
+        The (n, d) embeddings or None if there is no valid entry.
+    """
+    try:
+        return np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+
+
+def save_cached_embeddings(path, embeddings):
+    """Writes embeddings to the cache.
+
+    The file is written under a temporary name and then moved into place,
+    so concurrent workers never see a partial entry.
+
+    Args:
+        path: Path of the cache entry.
+        embeddings: The (n, d) embeddings.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    with open(tmp_path, "wb") as fh:
+        np.save(fh, np.asarray(embeddings, dtype=np.float32))
 
+    os.replace(tmp_path, path)
+
+
+def _get_training_crops(f):
+    """Loads a training file and crops it according to cfg.SAMPLE_CROP_MODE.
+
+    Args:
+        f: Path to the audio file.
+
+    Returns:
+        A (n, samples) float32 array of crops or None if the file could not be loaded.
+    """
     # Try to load the audio file
     try:
         # Load audio
@@ -76,7 +139,7 @@ def _load_audio_file(f, label_vector, config):
         # Print Error
         print(f"\t Error when loading file {f}", flush=True)
         print(f"\t {e}", flush=True)
-        return np.array([]), np.array([])
+        return None
 
     # Crop training samples
     if cfg.SAMPLE_CROP_MODE == "center":
@@ -89,18 +152,256 @@ def _load_audio_file(f, label_vector, config):
     else:
         sig_splits = audio.split_signal(sig, rate, cfg.SIG_LENGTH, cfg.SIG_OVERLAP, cfg.SIG_MINLEN)
 
-    # Get feature embeddings
-    batch_size = 1  # turns out that batch size 1 is the fastest, probably because of having to resize the model input when the number of samples in a batch changes
-    for i in range(0, len(sig_splits), batch_size):
-        batch_sig = sig_splits[i : i + batch_size]
-        batch_label = [label_vector] * len(batch_sig)
-        embeddings = model.embeddings(batch_sig)
+    # Batches have a fixed shape, so short crops are padded like crop_center does
+    return np.array([audio.pad(split, cfg.SIG_LENGTH, rate, 0.5) for split in sig_splits], dtype=np.float32)
 
-        # Add to training data
-        x_train.extend(embeddings)
-        y_train.extend(batch_label)
 
-    return x_train, y_train
+def _init_decode_worker(config):
+    """Initializes a decode worker of the training data loader.
+
+    Args:
+        config: The config of the main process.
+    """
+    # restore config in case we're on Windows to be thread save
+    cfg.set_config(config)
+
+
+def _decode_training_file(f):
+    """Loads the crops of a training file into shared memory.
+
+    Files with cached embeddings are not decoded at all.
+
+    Args:
+        f: Path to the audio file.
+
+    Returns:
+        A tuple of (cached embeddings or None, shared memory name or None, number of crops, cache path,
+        crops or None). The crops are only returned on Windows, where they are not put into shared memory.
+    """
+    # Embeddings only depend on the file content, labels are applied afterwards
+    cache_path = None
+
+    if cfg.TRAIN_EMBEDDING_CACHE_PATH:
+        try:
+            cache_path = get_embedding_cache_path(f)
+        except OSError:
+            cache_path = None
+        else:
+            cached = load_cached_embeddings(cache_path)
+
+            if cached is not None:
+                return np.array(cached), None, len(cached), None, None
+
+    crops = _get_training_crops(f)
+
+    if crops is None or not len(crops):
+        return None, None, 0, None, None
+
+    # On Windows a block is freed when its last handle is closed,
+    # so the main process has to create it and keep it open until it is unlinked
+    if os.name == "nt":
+        return None, None, len(crops), cache_path, crops
+
+    shm = _create_shared_memory(crops)
+    shm.close()
+
+    return None, shm.name, len(crops), cache_path, None
+
+
+def _create_shared_memory(crops):
+    """Copies crops into a new shared memory block.
+
+    Args:
+        crops: Array of crops.
+
+    Returns:
+        The open shared memory block.
+    """
+    shm = shared_memory.SharedMemory(create=True, size=crops.nbytes)
+    np.ndarray(crops.shape, dtype=np.float32, buffer=shm.buf)[:] = crops
+
+    return shm
+
+
+def _init_inference_worker(config, threads):
+    """Initializes an inference worker of the training data loader.
+
+    Allocates the fixed-size input batch once. The model is loaded by the first batch,
+    a failing initializer would make the pool respawn workers forever.
+
+    Args:
+        config: The config of the main process.
+        threads: Number of TFLite threads for this worker.
+    """
+    global INFERENCE_BATCH
+
+    cfg.set_config(config)
+    cfg.TFLITE_THREADS = threads
+
+    INFERENCE_BATCH = np.zeros((EMBEDDING_BATCH_SIZE, int(cfg.SIG_LENGTH * cfg.SAMPLE_RATE)), dtype=np.float32)
+
+
+def _embed_batch(parts):
+    """Computes the embeddings of crops stored in shared memory.
+
+    The crops are copied into a batch of EMBEDDING_BATCH_SIZE rows and the
+    remainder is zero-padded, so the interpreter never has to be resized.
+
+    Args:
+        parts: A list of (shared memory name, first crop, end crop).
+
+    Returns:
+        The embeddings of all crops in order.
+    """
+    num_samples = INFERENCE_BATCH.shape[1]
+    pos = 0
+
+    for name, start, stop in parts:
+        shm = shared_memory.SharedMemory(name=name)
+
+        try:
+            crops = np.ndarray(
+                (stop - start, num_samples), dtype=np.float32, buffer=shm.buf, offset=start * num_samples * 4
+            )
+            INFERENCE_BATCH[pos : pos + stop - start] = crops
+            del crops
+        finally:
+            shm.close()
+
+        pos += stop - start
+
+    INFERENCE_BATCH[pos:] = 0
+
+    return np.array(model.embeddings(INFERENCE_BATCH)[:pos])
+
+
+def _iter_training_embeddings(files, decode_pool, inference_pool, num_inference_workers):
+    """Extracts the embeddings of training files.
+
+    Files are decoded and cropped in the decode pool. Their crops are packed
+    into fixed-size batches across file boundaries and embedded in the
+    inference pool. Only a few files and batches are in flight at any time.
+
+    Args:
+        files: Paths of the audio files.
+        decode_pool: Pool initialized with _init_decode_worker.
+        inference_pool: Pool initialized with _init_inference_worker.
+        num_inference_workers: Number of processes in the inference pool.
+
+    Yields:
+        A tuple of (path, embeddings) per file in input order. Embeddings are None if the file could not be loaded.
+    """
+    files = iter(files)
+    decoding = deque()
+    records = deque()
+    running = deque()
+    batch = []
+    batch_size = 0
+
+    def decode_next():
+        f = next(files, None)
+
+        if f is not None:
+            decoding.append((f, decode_pool.apply_async(_decode_training_file, (f,))))
+
+    def submit_batch():
+        parts = [(record["shm"], start, stop) for record, start, stop in batch]
+        running.append((inference_pool.apply_async(_embed_batch, (parts,)), list(batch)))
+        batch.clear()
+
+    def finish_batch():
+        task, parts = running.popleft()
+        embeddings = task.get()
+        pos = 0
+
+        for record, start, stop in parts:
+            record["chunks"].append(embeddings[pos : pos + stop - start])
+            record["done"] += stop - start
+            pos += stop - start
+
+    for _ in range(DECODE_FILES_PER_WORKER * cfg.CPU_THREADS):
+        decode_next()
+
+    try:
+        while decoding or records:
+            if decoding:
+                f, task = decoding.popleft()
+                embeddings, name, num_crops, cache_path, crops = task.get()
+                decode_next()
+                handle = None
+
+                if crops is not None:
+                    handle = _create_shared_memory(crops)
+                    name = handle.name
+                    del crops
+
+                record = {"path": f, "embeddings": embeddings, "shm": name, "n": num_crops, "cache": cache_path}
+                record["handle"] = handle
+                record["chunks"] = []
+                record["done"] = 0 if name else num_crops
+                records.append(record)
+
+                start = 0
+
+                while name and start < num_crops:
+                    stop = min(num_crops, start + EMBEDDING_BATCH_SIZE - batch_size)
+                    batch.append((record, start, stop))
+                    batch_size += stop - start
+                    start = stop
+
+                    if batch_size == EMBEDDING_BATCH_SIZE:
+                        submit_batch()
+                        batch_size = 0
+
+                        while len(running) > BATCHES_PER_INFERENCE_WORKER * num_inference_workers:
+                            finish_batch()
+            else:
+                # No more files, flush the last partial batch
+                if batch:
+                    submit_batch()
+                    batch_size = 0
+
+                while running:
+                    finish_batch()
+
+            while running and running[0][0].ready():
+                finish_batch()
+
+            while records and records[0]["done"] == records[0]["n"]:
+                record = records.popleft()
+
+                if record["shm"]:
+                    _unlink_shared_memory(record["shm"], record["handle"])
+                    record["shm"] = record["handle"] = None
+                    record["embeddings"] = np.concatenate(record["chunks"])
+
+                    if record["cache"]:
+                        try:
+                            save_cached_embeddings(record["cache"], record["embeddings"])
+                        except OSError as e:
+                            print(f"\t Error when caching embeddings of {record['path']}", flush=True)
+                            print(f"\t {e}", flush=True)
+
+                yield record["path"], record["embeddings"]
+    finally:
+        for record in records:
+            if record["shm"]:
+                _unlink_shared_memory(record["shm"], record["handle"])
+
+
+def _unlink_shared_memory(name, shm=None):
+    """Frees a shared memory block of the training data loader.
+
+    Args:
+        name: Name of the block.
+        shm: The open block, if this process created it.
+    """
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=name)
+
+    shm.close()
+    shm.unlink()
+
 
 def _load_training_data(cache_mode=None, cache_file="", progress_callback=None):
     """Loads the data for training.
@@ -110,9 +411,11 @@ def _load_training_data(cache_mode=None, cache_file="", progress_callback=None):
     These directories should contain all the training data for each label.
 
     If a cache file is provided, the training data is loaded from there.
+    In 'append' mode the training data is added to the cache and the whole
+    cache is used for training.
 
     Args:
-        cache_mode: Cache mode. Can be 'load' or 'save'. Defaults to None.
+        cache_mode: Cache mode. Can be 'load', 'save' or 'append'. Defaults to None.
         cache_file: Path to cache file.
 
     Returns:
@@ -193,63 +496,73 @@ def _load_training_data(cache_mode=None, cache_file="", progress_callback=None):
         y = []
         folders = list(sorted(utils.list_subdirectories(data_path)))
 
-        for folder in folders:
-            if folder not in allowed_folders:
-                print(f"Skipping folder {folder} because it is not in the training data.", flush=True)
-                continue
-
-            # Get label vector
-            label_vector = np.zeros((len(valid_labels),), dtype="float32")
-            folder_labels = folder.split(",")
-
-            for label in folder_labels:
-                if label.lower() not in cfg.NON_EVENT_CLASSES and not label.startswith("-"):
-                    label_vector[valid_labels.index(label)] = 1
-                elif (
-                    label.startswith("-") and label[1:] in valid_labels
-                ):  # Negative labels need to be contained in the valid labels
-                    label_vector[valid_labels.index(label[1:])] = -1
-
-            # Get list of files
-            # Filter files that start with '.' because macOS seems to them for temp files.
-            files = filter(
-                os.path.isfile,
-                (
-                    os.path.join(data_path, folder, f)
-                    for f in sorted(os.listdir(os.path.join(data_path, folder)))
-                    if not f.startswith(".") and f.rsplit(".", 1)[-1].lower() in cfg.ALLOWED_FILETYPES
-                ),
-            )
-
-            # Load files using thread pool
-            with Pool(cfg.CPU_THREADS) as p:
-                tasks = []
+        # Decode in all workers, run the model in a few workers with more threads each
+        num_inference_workers = max(1, min(INFERENCE_WORKERS, cfg.CPU_THREADS))
+        inference_threads = max(cfg.TFLITE_THREADS, cfg.CPU_THREADS // num_inference_workers)
+
+        # Workers have to share our resource tracker, otherwise each of them
+        # would clean up the shared memory it created when it exits
+        resource_tracker.ensure_running()
+        decode_pool = Pool(cfg.CPU_THREADS, initializer=_init_decode_worker, initargs=(cfg.get_config(),))
+        inference_pool = Pool(
+            num_inference_workers,
+            initializer=_init_inference_worker,
+            initargs=(cfg.get_config(), inference_threads),
+        )
 
-                for f in files:
-                    task = p.apply_async(
-                        partial(_load_audio_file, f=f, label_vector=label_vector, config=cfg.get_config())
+        with decode_pool, inference_pool:
+            for folder in folders:
+                if folder not in allowed_folders:
+                    print(f"Skipping folder {folder} because it is not in the training data.", flush=True)
+                    continue
+
+                # Get label vector
+                label_vector = np.zeros((len(valid_labels),), dtype="float32")
+                folder_labels = folder.split(",")
+
+                for label in folder_labels:
+                    if label.lower() not in cfg.NON_EVENT_CLASSES and not label.startswith("-"):
+                        label_vector[valid_labels.index(label)] = 1
+                    elif (
+                        label.startswith("-") and label[1:] in valid_labels
+                    ):  # Negative labels need to be contained in the valid labels
+                        label_vector[valid_labels.index(label[1:])] = -1
+
+                # Get list of files
+                # Filter files that start with '.' because macOS seems to them for temp files.
+                files = list(
+                    filter(
+                        os.path.isfile,
+                        (
+                            os.path.join(data_path, folder, f)
+                            for f in sorted(os.listdir(os.path.join(data_path, folder)))
+                            if not f.startswith(".") and f.rsplit(".", 1)[-1].lower() in cfg.ALLOWED_FILETYPES
+                        ),
                     )
-                    tasks.append(task)
+                )
 
-                # Wait for tasks to complete and monitor progress with tqdm
+                # Monitor progress with tqdm
                 num_files_processed = 0
 
-                with tqdm.tqdm(total=len(tasks), desc=f" - loading '{folder}'", unit="f") as progress_bar:
-                    for task in tasks:
-                        result = task.get()
-                        # Make sure result is not empty
+                with tqdm.tqdm(total=len(files), desc=f" - loading '{folder}'", unit="f") as progress_bar:
+                    for _, embeddings in _iter_training_embeddings(
+                        files, decode_pool, inference_pool, num_inference_workers
+                    ):
                         # Empty results might be caused by errors when loading the audio file
-                        # TODO: We should check for embeddings size in result, otherwise we can't add them to the training data
-                        if len(result[0]) > 0:
-                            x += result[0]
-                            y += result[1]
+                        if embeddings is not None and len(embeddings) > 0:
+                            x.append(embeddings)
+                            y.append(np.tile(label_vector, (len(embeddings), 1)))
 
                         num_files_processed += 1
                         progress_bar.update(1)
 
                         if progress_callback:
-                            progress_callback(num_files_processed, len(tasks), folder)
-        return np.array(x, dtype="float32"), np.array(y, dtype="float32")
+                            progress_callback(num_files_processed, len(files), folder)
+
+        if not x:
+            return np.array([], dtype="float32"), np.array([], dtype="float32")
+
+        return np.concatenate(x).astype("float32", copy=False), np.concatenate(y)
 
     x_train, y_train = load_data(cfg.TRAIN_DATA_PATH, train_folders)
 
@@ -272,6 +585,13 @@ def _load_training_data(cache_mode=None, cache_file="", progress_callback=None):
         except Exception as e:
             print(f"\t...error saving cache: {e}", flush=True)
 
+    elif cache_mode == "append":
+        print(f"\t...appending training data to cache: {cache_file}", flush=True)
+        utils.save_to_cache(cache_file, x_train, y_train, x_test, y_test, valid_labels, append=True)
+        x_train, y_train, x_test, y_test, valid_labels, cfg.BINARY_CLASSIFICATION, cfg.MULTI_LABEL = (
+            utils.load_from_cache(cache_file)
+        )
+
     # Return only the valid labels for further use
     return x_train, y_train, x_test, y_test, valid_labels
 
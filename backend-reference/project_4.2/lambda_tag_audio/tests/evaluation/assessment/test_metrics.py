@@ -0,0 +1,156 @@
+"""Checks that the metrics match those of scikit-learn."""
+
+import numpy as np
+import pytest
+from sklearn.metrics import (
+    accuracy_score,
+    average_precision_score,
+    f1_score,
+    precision_score,
+    recall_score,
+    roc_auc_score,
+)
+
+from birdnet_analyzer.evaluation.assessment import metrics
+
+THRESHOLDED = {
+    "recall": (metrics.calculate_recall, recall_score),
+    "precision": (metrics.calculate_precision, precision_score),
+    "f1": (metrics.calculate_f1_score, f1_score),
+}
+
+
+def make_case(seed: int, num_samples: int, num_classes: int):
+    """Returns random predictions and labels, with some classes that never occur."""
+    rng = np.random.default_rng(seed)
+    labels = (rng.random((num_samples, num_classes)) < 0.3).astype(int)
+    labels[:, ::4] = 0
+
+    # Quantized scores, so there are ties
+    predictions = np.round(np.clip(0.5 * labels + 0.6 * rng.random((num_samples, num_classes)), 0, 1), 1)
+
+    return predictions, labels
+
+
+def as_array(value):
+    return np.atleast_1d(np.asarray(value, dtype=np.float64))
+
+
+@pytest.mark.parametrize("metric", THRESHOLDED)
+@pytest.mark.parametrize("averaging", [None, "micro", "macro", "weighted", "samples"])
+@pytest.mark.parametrize("threshold", [0.0, 0.3, 0.5, 1.0])
+@pytest.mark.parametrize("seed", range(3))
+def test_thresholded_multilabel(metric, averaging, threshold, seed):
+    predictions, labels = make_case(seed, 50, 6)
+    ours, reference = THRESHOLDED[metric]
+
+    expected = reference(labels, (predictions >= threshold).astype(int), average=averaging, zero_division=0)
+
+    np.testing.assert_allclose(ours(predictions, labels, "multilabel", threshold, averaging), as_array(expected))
+
+
+@pytest.mark.parametrize("metric", THRESHOLDED)
+@pytest.mark.parametrize("averaging", [None, "binary", "micro", "macro", "weighted"])
+@pytest.mark.parametrize(
+    "predictions, labels",
+    [
+        ([0.9, 0.8, 0.7], [1, 1, 1]),
+        ([0.1, 0.2, 0.3], [0, 0, 0]),
+        ([0.9, 0.8, 0.7], [0, 0, 0]),
+        ([0.1, 0.2, 0.3], [1, 1, 1]),
+        ([0.9, 0.2, 0.7, 0.4], [1, 0, 0, 1]),
+    ],
+)
+def test_thresholded_single_column(metric, averaging, predictions, labels):
+    predictions = np.array(predictions)[:, np.newaxis]
+    labels = np.array(labels)[:, np.newaxis]
+    ours, reference = THRESHOLDED[metric]
+
+    expected = reference(labels, (predictions >= 0.5).astype(int), average=averaging, zero_division=0)
+    task = "binary" if averaging == "binary" else "multilabel"
+
+    np.testing.assert_allclose(ours(predictions, labels, task, 0.5, averaging), as_array(expected))
+
+
+def test_single_column_only_returns_present_labels():
+    predictions = np.array([[0.9], [0.8], [0.7]])
+
+    np.testing.assert_allclose(metrics.calculate_recall(predictions, np.ones((3, 1)), "multilabel", 0.5, None), [1.0])
+    np.testing.assert_allclose(metrics.calculate_recall(1 - predictions, np.zeros((3, 1)), "multilabel", 0.5, None), [1.0])
+
+
+@pytest.mark.parametrize("averaging", [None, "micro", "macro", "weighted"])
+@pytest.mark.parametrize("seed", range(3))
+def test_accuracy(averaging, seed):
+    predictions, labels = make_case(seed, 50, 6)
+    y_pred = (predictions >= 0.5).astype(int)
+
+    per_class = np.array([accuracy_score(labels[:, i], y_pred[:, i]) for i in range(labels.shape[1])])
+
+    if averaging is None:
+        expected = per_class
+    elif averaging == "micro":
+        expected = (y_pred == labels).mean()
+    elif averaging == "macro":
+        expected = per_class.mean()
+    else:
+        expected = np.average(per_class, weights=labels.sum(axis=0))
+
+    result = metrics.calculate_accuracy(predictions, labels, "multilabel", labels.shape[1], 0.5, averaging)
+
+    np.testing.assert_allclose(result, as_array(expected))
+    np.testing.assert_allclose(
+        metrics.calculate_accuracy(predictions[:, 1], labels[:, 1], "binary", 1, 0.5),
+        [accuracy_score(labels[:, 1], y_pred[:, 1])],
+    )
+
+
+@pytest.mark.parametrize("averaging", [None, "micro", "macro", "weighted", "samples"])
+@pytest.mark.parametrize("seed", range(3))
+def test_average_precision(averaging, seed):
+    predictions, labels = make_case(seed, 50, 6)
+    labels[0] = 1
+
+    expected = average_precision_score(labels, predictions, average=averaging)
+
+    np.testing.assert_allclose(
+        metrics.calculate_average_precision(predictions, labels, "multilabel", averaging), as_array(expected)
+    )
+
+
+@pytest.mark.parametrize("averaging", [None, "macro", "weighted", "samples"])
+@pytest.mark.parametrize("seed", range(3))
+def test_auroc(averaging, seed):
+    predictions, labels = make_case(seed, 50, 6)
+    labels[0] = 1
+    labels[1] = 0
+
+    expected = roc_auc_score(labels, predictions, average=averaging)
+
+    np.testing.assert_allclose(metrics.calculate_auroc(predictions, labels, "multilabel", averaging), as_array(expected))
+    np.testing.assert_allclose(
+        metrics.calculate_auroc(predictions[:, 1], labels[:, 1], "binary"),
+        [roc_auc_score(labels[:, 1], predictions[:, 1])],
+    )
+
+
+def test_auroc_single_label_is_nan():
+    predictions = np.array([0.9, 0.2, 0.7])
+
+    assert np.isnan(metrics.calculate_auroc(predictions, np.ones(3), "binary")).all()
+
+
+@pytest.mark.parametrize("metric", THRESHOLDED)
+@pytest.mark.parametrize("averaging", [None, "micro", "macro", "weighted"])
+def test_threshold_counts_match_single_thresholds(metric, averaging):
+    predictions, labels = make_case(0, 50, 6)
+    thresholds = np.array([0.0, 0.25, 0.5, 0.75, 1.0])
+    ours, _ = THRESHOLDED[metric]
+
+    counts = metrics.get_threshold_counts(predictions, labels, thresholds)
+    values = metrics.get_metric_from_counts(metric, *counts, "multilabel", averaging)
+
+    for i, threshold in enumerate(thresholds):
+        np.testing.assert_allclose(
+            np.atleast_1d(values[i]), ours(predictions, labels, "multilabel", threshold, averaging)
+        )